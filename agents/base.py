@@ -64,18 +64,26 @@ class BaseAgent(abc.ABC):
         `pacai.agents` or `pacai.student` package.
         """
 
+        agentClass = BaseAgent.getAgentClass(name)
+        return agentClass(index = index, **args)
+
+    @staticmethod
+    def getAgentClass(name):
+        """
+        Get the class of an agent by name (see `BaseAgent.loadAgent`) without creating one.
+        """
+
         if (name.startswith('pacai.')):
             # This name looks like a fully qualified name, load it directly.
-            agentClass = reflection.qualifiedImport(name)
-            return agentClass(index = index, **args)
+            return reflection.qualifiedImport(name)
         else:
             # This is probably just a class name.
-            return BaseAgent._loadAgentByName(name, index, args)
+            return BaseAgent._getAgentClassByName(name)
 
     @staticmethod
-    def _loadAgentByName(className, index, args = {}):
+    def _getAgentClassByName(className):
         """
-        Create an agent of the given class with the given index and args.
+        Find the agent class with the given name.
         This will search the `pacai.agents` package as well as the `pacai.student` package
         for an agent with the given class name.
         """
@@ -102,7 +110,7 @@ class BaseAgent(abc.ABC):
         # Now that the agent classes have been loaded, just look for subclasses.
         for subclass in reflection.getAllDescendents(BaseAgent):
             if (subclass.__name__ == className):
-                return subclass(index = index, **args)
+                return subclass
 
         raise LookupError('Could not find an agent with the name: ' + className)
 
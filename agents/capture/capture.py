@@ -34,13 +34,25 @@ class CaptureAgent(BaseAgent):
     def registerInitialState(self, gameState):
         """
         This method handles the initial setup of the agent and populates useful fields,
-        such as the team the agent is on and the `pacai.core.distanceCalculator.Distancer`.
+        such as the team the agent is on and the maze distances
+        (see `CaptureAgent.createDistancer`).
         """
 
         self.red = gameState.isOnRedTeam(self.index)
-        self.distancer = distanceCalculator.Distancer(gameState.getInitialLayout())
+        self.distancer = self.createDistancer(gameState)
 
-        self.distancer.getMazeDistances()
+    def createDistancer(self, gameState):
+        """
+        Create the maze distance calculator for the game's layout.
+        By default, this is a `pacai.core.distanceCalculator.Distancer`.
+        Subclasses can override this to supply any object with a `getDistance(pos1, pos2)` method
+        (e.g. a precomputed distance table).
+        """
+
+        distancer = distanceCalculator.Distancer(gameState.getInitialLayout())
+        distancer.getMazeDistances()
+
+        return distancer
 
     def final(self, gameState):
         self.observationHistory = []
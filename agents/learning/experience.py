@@ -0,0 +1,214 @@
+"""
+Experience replay for `pacai.agents.learning.reinforcement.ReinforcementAgent`.
+
+An `ExperienceReplay` is a ring buffer of the most recent (state, action, nextState, reward)
+transitions: once it is full, every new transition overwrites the oldest one.
+Everything but the states is kept in compact arrays that are allocated up front
+(actions as one byte codes, rewards as doubles),
+while states are only kept as references to the (already existing) state objects.
+
+Transitions are sampled uniformly,
+or with `prioritized` set, in proportion to their priority:
+`(abs(TD error) + PRIORITY_OFFSET) ** priorityExponent`.
+Priorities are kept in a `SumTree`, so both sampling and updating a priority are O(log capacity).
+New transitions get the largest priority seen so far, so they are likely to be replayed soon.
+Since prioritized sampling replays some transitions much more often than others,
+each sampled transition also gets an importance-sampling weight (see `getImportanceWeights`)
+that its update should be scaled by.
+"""
+
+import array
+import random
+
+# Keeps transitions with no TD error from never being sampled again.
+PRIORITY_OFFSET = 0.01
+
+# How strongly priorities follow TD errors (0 is uniform, 1 is proportional).
+DEFAULT_PRIORITY_EXPONENT = 0.6
+
+# Action codes are stored as unsigned bytes.
+MAX_ACTIONS = 256
+
+class SumTree(object):
+    """
+    A fixed number of non-negative priorities in a binary tree where every node holds
+    the sum of its children, so that the leaves can be sampled in proportion to their priority.
+    The tree is a flat array, with node i having children 2i and 2i + 1,
+    and the priority of item i at node `capacity + i`.
+    """
+
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._nodes = array.array('d', [0.0]) * (2 * capacity)
+
+    def getTotal(self):
+        return self._nodes[1]
+
+    def getPriority(self, index):
+        return self._nodes[self._capacity + index]
+
+    def update(self, index, priority):
+        node = self._capacity + index
+        self._nodes[node] = priority
+
+        # Sums are recomputed (instead of adjusted) so that rounding errors never build up.
+        node //= 2
+        while (node >= 1):
+            self._nodes[node] = self._nodes[2 * node] + self._nodes[2 * node + 1]
+            node //= 2
+
+    def find(self, value):
+        """
+        Find the item where the running sum of priorities passes the value
+        (which should be in [0, total)).
+        """
+
+        node = 1
+        while (node < self._capacity):
+            left = 2 * node
+            if (value < self._nodes[left] or self._nodes[left + 1] == 0.0):
+                node = left
+            else:
+                value -= self._nodes[left]
+                node = left + 1
+
+        return node - self._capacity
+
+class ExperienceReplay(object):
+    """
+    A ring buffer of transitions that can be sampled (uniformly or by priority).
+    """
+
+    def __init__(self, capacity, prioritized = False,
+            priorityExponent = DEFAULT_PRIORITY_EXPONENT):
+        if (capacity < 1):
+            raise ValueError('Experience replay needs a capacity of at least one transition.')
+
+        self._capacity = capacity
+        self._size = 0
+        self._next = 0
+
+        self._states = [None] * capacity
+        self._nextStates = [None] * capacity
+        self._actionCodes = array.array('B', [0]) * capacity
+        self._rewards = array.array('d', [0.0]) * capacity
+
+        # The action of each code.
+        self._actions = []
+        self._codes = {}
+
+        self._priorities = None
+        self._priorityExponent = priorityExponent
+        self._maxPriority = 1.0
+
+        if (prioritized):
+            self._priorities = SumTree(capacity)
+
+    def getCapacity(self):
+        return self._capacity
+
+    def getSize(self):
+        return self._size
+
+    def isPrioritized(self):
+        return self._priorities is not None
+
+    def add(self, state, action, nextState, reward):
+        """
+        Store a transition (overwriting the oldest one when full).
+        Returns the index of the transition.
+        """
+
+        index = self._next
+
+        self._states[index] = state
+        self._nextStates[index] = nextState
+        self._actionCodes[index] = self._getActionCode(action)
+        self._rewards[index] = reward
+
+        if (self._priorities is not None):
+            self._priorities.update(index, self._maxPriority)
+
+        self._next = (self._next + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+        return index
+
+    def get(self, index):
+        """
+        Get a stored transition: (state, action, nextState, reward).
+        """
+
+        return (self._states[index], self._actions[self._actionCodes[index]],
+                self._nextStates[index], self._rewards[index])
+
+    def sample(self, batchSize):
+        """
+        Get the indexes of `batchSize` transitions (sampled with replacement).
+        Prioritized buffers split the total priority into `batchSize` equal ranges
+        and sample one transition from each, which spreads out the batch.
+        """
+
+        if (self._size == 0):
+            return []
+
+        if (self._priorities is None):
+            return [random.randrange(self._size) for i in range(batchSize)]
+
+        total = self._priorities.getTotal()
+        rangeSize = total / batchSize
+
+        indexes = []
+        for i in range(batchSize):
+            value = min((i + random.random()) * rangeSize, total)
+            indexes.append(min(self._priorities.find(value), self._size - 1))
+
+        return indexes
+
+    def getImportanceWeights(self, indexes):
+        """
+        Get the importance-sampling weight of each sampled transition,
+        `1 / (size * P(transition))` scaled so that the largest weight in the batch is one.
+        Scaling updates by these weights makes up for how often each transition is sampled.
+        Transitions sampled uniformly all have a weight of one.
+        """
+
+        if (self._priorities is None or len(indexes) == 0):
+            return [1.0] * len(indexes)
+
+        total = self._priorities.getTotal()
+        weights = [total / (self._size * self._priorities.getPriority(index))
+                for index in indexes]
+
+        maxWeight = max(weights)
+        return [weight / maxWeight for weight in weights]
+
+    def updatePriorities(self, indexes, errors):
+        """
+        Set the priorities of transitions from their latest TD errors.
+        Does nothing for buffers that are not prioritized.
+        """
+
+        if (self._priorities is None):
+            return
+
+        for (index, error) in zip(indexes, errors):
+            priority = (abs(error) + PRIORITY_OFFSET) ** self._priorityExponent
+
+            self._priorities.update(index, priority)
+            self._maxPriority = max(self._maxPriority, priority)
+
+    def _getActionCode(self, action):
+        code = self._codes.get(action)
+        if (code is not None):
+            return code
+
+        if (len(self._actions) >= MAX_ACTIONS):
+            raise ValueError('Experience replay can only store %d distinct actions.'
+                    % (MAX_ACTIONS))
+
+        code = len(self._actions)
+        self._codes[action] = code
+        self._actions.append(action)
+
+        return code
@@ -2,6 +2,7 @@ import abc
 import logging
 import time
 
+from pacai.agents.learning import experience
 from pacai.agents.learning.value import ValueEstimationAgent
 
 class ReinforcementAgent(ValueEstimationAgent):
@@ -12,10 +13,23 @@ class ReinforcementAgent(ValueEstimationAgent):
     The environment will call `ReinforcementAgent.observeTransition`,
     which will then call `ReinforcementAgent.update` (which you should override).
     Use `ReinforcementAgent.getLegalActions` to know which actions are available in a state.
+
+    With a `replayCapacity`, the most recent transitions are also kept for experience replay
+    (see `pacai.agents.learning.experience`).
+    While training, a batch of `replayBatchSize` stored transitions is replayed
+    (through `ReinforcementAgent.updateBatch`) every `replayInterval` steps,
+    on top of the usual update for every new transition.
+    So every simulated step can be learned from many times.
+
+    While `experience` is a list, transitions are only recorded into it
+    (see `ReinforcementAgent.encodeTransition`) instead of being learned from.
+    This is how the actors of distributed training (see `pacai.bin.training`) collect experience
+    for a learner to apply (see `ReinforcementAgent.updateEncoded`).
     """
 
     def __init__(self, index, actionFn = None, numTraining = 100, epsilon = 0.5,
-            alpha = 0.5, gamma = 1, **kwargs):
+            alpha = 0.5, gamma = 1, replayBatchSize = 32, replayCapacity = 0,
+            replayInterval = 1, replayPrioritized = False, **kwargs):
         """
         Args:
             actionFn: A function which takes a state and returns the list of legal actions.
@@ -23,6 +37,10 @@ class ReinforcementAgent(ValueEstimationAgent):
             epsilon: The exploration rate.
             gamma: The discount factor.
             numTraining: The number of training episodes.
+            replayBatchSize: The number of transitions replayed at a time.
+            replayCapacity: The number of transitions kept for replay (0 turns replay off).
+            replayInterval: The number of steps between replays.
+            replayPrioritized: Replay transitions by their TD error (instead of uniformly).
         """
         super().__init__(index)
 
@@ -38,6 +56,17 @@ class ReinforcementAgent(ValueEstimationAgent):
         self.alpha = float(alpha)
         self.discountRate = float(gamma)
 
+        self.replay = None
+        if (int(replayCapacity) > 0):
+            prioritized = (str(replayPrioritized).lower() in ('1', 'true'))
+            self.replay = experience.ExperienceReplay(int(replayCapacity), prioritized)
+
+        self.replayBatchSize = int(replayBatchSize)
+        self.replayInterval = max(1, int(replayInterval))
+        self.numSteps = 0
+
+        self.experience = None
+
     @abc.abstractmethod
     def update(self, state, action, nextState, reward):
         """
@@ -46,6 +75,48 @@ class ReinforcementAgent(ValueEstimationAgent):
 
         pass
 
+    def updateBatch(self, transitions, weights):
+        """
+        Learn from a batch of (state, action, nextState, reward) transitions
+        (replayed from experience).
+        Each update should be scaled by the transition's weight (in [0, 1]).
+        Returns the TD error of each transition (from before its update).
+        By default, this is just `ReinforcementAgent.update` on each transition in turn
+        (with the learning rate scaled by the weight),
+        agents that can learn from a whole batch at once should override it.
+        """
+
+        alpha = self.alpha
+
+        errors = []
+        for ((state, action, nextState, reward), weight) in zip(transitions, weights):
+            target = reward + self.getDiscountRate() * self.getValue(nextState)
+            errors.append(target - self.getQValue(state, action))
+
+            self.alpha = alpha * weight
+            self.update(state, action, nextState, reward)
+
+        self.alpha = alpha
+
+        return errors
+
+    def encodeTransition(self, state, action, nextState, reward):
+        """
+        Encode a transition (for `ReinforcementAgent.updateEncoded`, possibly in another process).
+        By default, this is just the transition itself,
+        agents can override it with something more compact
+        (that also has everything needed for the update already computed).
+        """
+
+        return (state, action, nextState, reward)
+
+    def updateEncoded(self, encoded):
+        """
+        Learn from a transition encoded by `ReinforcementAgent.encodeTransition`.
+        """
+
+        self.update(*encoded)
+
     def getAlpha(self):
         return self.alpha
 
@@ -74,8 +145,36 @@ class ReinforcementAgent(ValueEstimationAgent):
         """
 
         self.episodeRewards += deltaReward
+
+        if (self.experience is not None):
+            self.experience.append(self.encodeTransition(state, action, nextState, deltaReward))
+            return
+
         self.update(state, action, nextState, deltaReward)
 
+        if (self.replay is None):
+            return
+
+        self.replay.add(state, action, nextState, deltaReward)
+        self.numSteps += 1
+
+        if (self.isInTraining() and self.numSteps % self.replayInterval == 0
+                and self.replay.getSize() >= self.replayBatchSize):
+            self.replayExperience()
+
+    def replayExperience(self):
+        """
+        Learn from a batch of stored transitions
+        (and re-prioritize them by their TD errors).
+        """
+
+        indexes = self.replay.sample(self.replayBatchSize)
+        transitions = [self.replay.get(index) for index in indexes]
+
+        errors = self.updateBatch(transitions, self.replay.getImportanceWeights(indexes))
+
+        self.replay.updatePriorities(indexes, errors)
+
     def startEpisode(self):
         """
         Called by environment when a new episode is starting.
@@ -1,3 +1,4 @@
+import functools
 import logging
 import time
 
@@ -13,12 +14,16 @@ class SearchAgent(BaseAgent):
 
     As a default, this agent runs `pacai.student.search.depthFirstSearch` on a
     `pacai.core.search.position.PositionSearchProblem` to find location (1, 1).
+
+    Search functions with a node budget (e.g. `pacai.student.search.memoryBoundedAStarSearch`)
+    get `maxNodes` (if it is given).
     """
 
     def __init__(self, index,
             fn = 'pacai.student.search.depthFirstSearch',
             prob = 'pacai.core.search.position.PositionSearchProblem',
             heuristic = 'pacai.core.search.heuristic.null',
+            maxNodes = None,
             **kwargs):
         super().__init__(index)
 
@@ -27,7 +32,7 @@ class SearchAgent(BaseAgent):
         logging.info('[SearchAgent] using problem type %s.' % (prob))
 
         # Get the search function from the name and heuristic.
-        self.searchFunction = self._fetchSearchFunction(fn, heuristic)
+        self.searchFunction = self._fetchSearchFunction(fn, heuristic, maxNodes)
 
         # The actions the search produced.
         self._actions = []
@@ -76,18 +81,29 @@ class SearchAgent(BaseAgent):
 
         return action
 
-    def _fetchSearchFunction(self, functionName, heuristicName):
+    def _fetchSearchFunction(self, functionName, heuristicName, maxNodes = None):
         """
         Get the specified search function by name.
         If that function also takes a heurisitc (i.e. has a parameter called "heuristic"),
         then return a lambda that binds the heuristic to the function.
+        A node budget (`maxNodes`) is bound the same way.
         """
 
         # Locate the function.
         function = reflection.qualifiedImport(functionName)
+        parameterNames = function.__code__.co_varnames
+
+        # Bind the node budget.
+        if (maxNodes is not None):
+            if ('maxNodes' not in parameterNames):
+                raise ValueError('The search function %s does not take a node budget (maxNodes).'
+                        % (functionName))
+
+            logging.info('[SearchAgent] using a budget of %d nodes.' % (int(maxNodes)))
+            function = functools.partial(function, maxNodes = int(maxNodes))
 
         # Check if the function has a heuristic.
-        if 'heuristic' not in function.__code__.co_varnames:
+        if 'heuristic' not in parameterNames:
             logging.info('[SearchAgent] using function %s.' % (functionName))
             return function
 
@@ -58,11 +58,21 @@ def getParser(description, name):
 
     parser.add_argument('--record', dest = 'record',
             action = 'store', type = str, default = None,
-            help = 'writes the moves of a game to the named pickle file (default: %(default)s)')
+            help = 'appends the moves of each game to the named replay file'
+                + ' (default: %(default)s)')
 
     parser.add_argument('--replay', dest = 'replay',
             action = 'store', type = str, default = None,
-            help = 'load a recorded pickle game file to replay (default: %(default)s)')
+            help = 'load a replay file and replay its games (default: %(default)s)')
+
+    parser.add_argument('--replay-game', dest = 'replayGame',
+            action = 'store', type = int, default = None,
+            help = 'only replay the game at this index (from zero) in the replay file'
+                + ' (default: all games)')
+
+    parser.add_argument('--replay-turn', dest = 'replayTurn',
+            action = 'store', type = int, default = 0,
+            help = 'start replaying each game after this many moves (default: %(default)s)')
 
     parser.add_argument('--sprites', dest = 'spritesPath',
             action = 'store', type = str, default = view.DEFAULT_SPRITES,
@@ -7,12 +7,12 @@ On your opponents side of the map, you are a pacman and can eat food and capsule
 
 import logging
 import os
-import pickle
 import random
 import sys
 
 from pacai.agents import keyboard
 from pacai.agents.capture.dummy import DummyAgent
+from pacai.bin import replay
 from pacai.bin.arguments import getParser
 from pacai.core.actions import Actions
 from pacai.core.distance import manhattan
@@ -619,19 +619,7 @@ def readCommand(argv):
         args['agents'][index] = agent
 
     # Choose a layout.
-    if options.layout.startswith('RANDOM'):
-        layoutSeed = None
-        if (options.layout != 'RANDOM'):
-            layoutSeed = int(options.layout[6:])
-
-        args['layout'] = Layout(generateMaze(layoutSeed).split('\n'))
-    elif options.layout.lower().find('capture') == -1:
-        raise ValueError('You must use a capture layout with capture.py.')
-    else:
-        args['layout'] = getLayout(options.layout)
-
-    if (args['layout'] is None):
-        raise ValueError('The layout ' + options.layout + ' cannot be found.')
+    args['layout'] = loadCaptureLayout(options.layout)
 
     args['length'] = options.maxMoves
     args['numGames'] = options.numGames
@@ -639,9 +627,32 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['replay'] = options.replay
+    args['replayGameIndex'] = options.replayGame
+    args['replayTurn'] = options.replayTurn
 
     return args
 
+def loadCaptureLayout(name):
+    """
+    Load a capture layout by name, or generate a random one for RANDOM<seed> (or just RANDOM).
+    """
+
+    if name.startswith('RANDOM'):
+        layoutSeed = None
+        if (name != 'RANDOM'):
+            layoutSeed = int(name[6:])
+
+        layout = Layout(generateMaze(layoutSeed).split('\n'))
+    elif name.lower().find('capture') == -1:
+        raise ValueError('You must use a capture layout with capture.py.')
+    else:
+        layout = getLayout(name)
+
+    if (layout is None):
+        raise ValueError('The layout ' + name + ' cannot be found.')
+
+    return layout
+
 def loadAgents(isRed, agentModule, textgraphics, args):
     """
     Calls agent factories and returns lists of agents.
@@ -660,18 +671,25 @@ def loadAgents(isRed, agentModule, textgraphics, args):
 
     return createTeamFunction(indices[0], indices[1], isRed, **args)
 
-def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamName):
-    agents = [DummyAgent(index) for index in range(len(agents))]
+def replayGame(recordedGame, display, startTurn = 0):
+    """
+    Show a `pacai.bin.replay.ReplayGame`, starting from the state after `startTurn` moves.
+    """
+
+    info = recordedGame.getInfo()
+
+    layout = recordedGame.getLayout()
+    numAgents = recordedGame.getState(0).getNumAgents()
+    agents = [DummyAgent(index) for index in range(numAgents)]
     rules = CaptureRules()
-    game = rules.newGame(layout, agents, display, length, False)
-    state = game.state
-    display.redTeam = redTeamName
-    display.blueTeam = blueTeamName
-    display.initialize(state)
-
-    for action in actions:
-        # Execute the action
-        state = state.generateSuccessor(*action)
+    game = rules.newGame(layout, agents, display, info['length'], False)
+    display.redTeam = info['redTeamName']
+    display.blueTeam = info['blueTeamName']
+
+    states = recordedGame.getStates(startTurn)
+    display.initialize(next(states))
+
+    for state in states:
         # Change the display
         display.update(state)
         # Allow for game specific conditions (winning, losing, etc.)
@@ -689,6 +707,15 @@ def runGames(layout, agents, display, length, numGames, record, numTraining,
         logging.info('Playing %d training games.' % numTraining)
         nullView = CaptureNullView()
 
+    # Every game is appended to the same replay file.
+    recorder = None
+    if (record):
+        path = 'replay'
+        if (isinstance(record, str)):
+            path = record
+
+        recorder = replay.ReplayWriter(path)
+
     for i in range(numGames):
         isTraining = (i < numTraining)
 
@@ -698,33 +725,30 @@ def runGames(layout, agents, display, length, numGames, record, numTraining,
         else:
             gameDisplay = display
 
+        # Recorded games are snapshotted as they are played.
+        if (recorder is not None):
+            gameDisplay = recorder.getSnapshotView(gameDisplay, replay.GAME_CAPTURE)
+
         g = rules.newGame(layout, agents, gameDisplay, length, catchExceptions)
         g.run()
 
         if (not isTraining):
             games.append(g)
 
-        g.record = None
-        if record:
-            components = {
-                'layout': layout,
-                'agents': [agent.__class__.__name__ for agent in agents],
-                'actions': g.moveHistory,
+        if (recorder is not None):
+            info = {
                 'length': length,
                 'redTeamName': redTeamName,
-                'blueTeamName': blueTeamName
+                'blueTeamName': blueTeamName,
             }
 
-            path = 'replay'
-            if (isinstance(record, str)):
-                path = record
-
-            g.record = pickle.dumps(components)
-            with open(path, 'wb') as file:
-                file.write(g.record)
-
+            recorder.writeGame(replay.GAME_CAPTURE, layout, g.moveHistory, info,
+                    snapshots = gameDisplay.getSnapshots())
             logging.info("Game recorded to: '%s'." % (path))
 
+    if (recorder is not None):
+        recorder.close()
+
     if (numGames > 0):
         scores = [game.state.getScore() for game in games]
         redWinRate = [s > 0 for s in scores].count(True) / float(len(scores))
@@ -754,14 +778,17 @@ def main(argv):
 
     # Special case: recorded games don't use the runGames method.
     if (options['replay'] is not None):
-        logging.info('Replaying recorded game %s.' % options['replay'])
+        logging.info('Replaying recorded games %s.' % options['replay'])
 
-        recorded = None
         with open(options['replay'], 'rb') as file:
-            recorded = pickle.load(file)
+            for (i, recordedGame) in enumerate(replay.ReplayReader(file)):
+                if (options['replayGameIndex'] is not None and i != options['replayGameIndex']):
+                    continue
+
+                if (recordedGame.getGameType() != replay.GAME_CAPTURE):
+                    raise ValueError('Recorded game %d is not a capture game.' % (i))
 
-        recorded['display'] = options['display']
-        replayGame(**recorded)
+                replayGame(recordedGame, options['display'], options['replayTurn'])
 
         return
 
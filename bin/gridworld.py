@@ -8,7 +8,10 @@ import textwrap
 from pacai.agents.learning.reinforcement import ReinforcementAgent
 from pacai.core.environment import Environment
 from pacai.core.mdp import MarkovDecisionProcess
+from pacai.student import planners
 from pacai.student.qlearningAgents import QLearningAgent
+from pacai.student.qlearningAgents import QTABLE_ARRAY
+from pacai.student.qlearningAgents import QTABLE_COUNTER
 from pacai.student.valueIterationAgent import ValueIterationAgent
 from pacai.ui.gridworld.text import TextGridworldDisplay
 from pacai.ui.gridworld.utils import wait_for_keys
@@ -446,10 +449,29 @@ def parseOptions(argv):
             action = 'store_true', default = False,
             help = 'generate no graphics (default: %(default)s)')
 
+    parser.add_argument('--planner', dest = 'planner',
+            action = 'store', type = str, default = planners.PLANNER_SYNC,
+            choices = planners.PLANNERS,
+            help = 'how value iteration backs up states (default %(default)s)')
+
+    parser.add_argument('--q-table', dest = 'qTable',
+            action = 'store', type = str, default = QTABLE_COUNTER,
+            choices = [QTABLE_COUNTER, QTABLE_ARRAY],
+            help = 'where q-learning keeps its q-values (default %(default)s)')
+
     parser.add_argument('--text-graphics', dest = 'textGraphics',
             action = 'store_true', default = False,
             help = 'display output as text only (default: %(default)s)')
 
+    parser.add_argument('--tolerance', dest = 'tolerance',
+            action = 'store', type = float, default = 0.0,
+            help = 'stop value iteration early once no value changes by more than this'
+                + ' (default %(default)s)')
+
+    parser.add_argument('--vectorized', dest = 'vectorized',
+            action = 'store_true', default = False,
+            help = 'run value iteration on arrays with NumPy (default %(default)s)')
+
     parser.add_argument('--window-size', dest = 'gridSize',
             action = 'store', type = int, default = 150,
             help = 'request a window width of X pixels *per grid cell* (default %(default)s)')
@@ -517,13 +539,17 @@ def main(argv):
 
     a = None
     if (opts.agent == 'value'):
-        a = ValueIterationAgent(0, mdp, opts.discount, opts.iters)
+        a = ValueIterationAgent(0, mdp, opts.discount, opts.iters,
+                vectorized = opts.vectorized, tolerance = opts.tolerance, planner = opts.planner)
+        logging.info('Value iteration (%s): %d backups, residual %g.' %
+                (opts.planner, a.numBackups, a.residual))
     elif (opts.agent == 'q'):
         qLearnOpts = {
             'gamma': opts.discount,
             'alpha': opts.learningRate,
             'epsilon': opts.epsilon,
             'actionFn': lambda state: mdp.getPossibleActions(state),
+            'qTable': opts.qTable,
         }
         a = QLearningAgent(0, **qLearnOpts)
     elif (opts.agent == 'random'):
@@ -561,7 +587,8 @@ def main(argv):
     if (not opts.manual and opts.agent == 'value'):
         if (opts.valueSteps):
             for i in range(opts.iters):
-                tempAgent = ValueIterationAgent(0, mdp, opts.discount, i)
+                tempAgent = ValueIterationAgent(0, mdp, opts.discount, i,
+                        vectorized = opts.vectorized, planner = opts.planner)
                 display.displayValues(tempAgent, message = 'VALUES AFTER ' + str(i) + ' ITERATIONS')
                 display.pause()
 
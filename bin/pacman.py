@@ -7,15 +7,21 @@ Use WASD (or the arrow keys) to move.
 Have fun!
 """
 
+import csv
+import inspect
+import json
 import logging
+import multiprocessing
 import os
-import pickle
 import random
 import sys
+import time
 
 from pacai.agents.base import BaseAgent
 from pacai.agents.ghost.random import RandomGhost
 from pacai.agents.greedy import GreedyAgent
+from pacai.bin import replay
+from pacai.bin import training
 from pacai.bin.arguments import getParser
 from pacai.core.actions import Actions
 from pacai.core.directions import Directions
@@ -40,6 +46,55 @@ BOARD_CLEAR_POINTS = 500  # Points for clearning all the food from the board.
 GHOST_POINTS = 200  # Points for eating a ghost.
 LOSE_POINTS = -500  # Points for getting eatten.
 
+BATCH_RESULT_FIELDS = ['game', 'seed', 'score', 'win', 'moves', 'time']
+BATCH_CHUNK_SIZE = 4  # Games handed to a batch worker at a time.
+BATCH_LOG_INTERVAL = 100  # Games between batch progress messages.
+
+# The random keys used for Zobrist hashing (see PacmanGameState.getZobristHash),
+# keyed by the feature they stand for.
+# The keys come from their own generator, so hashing never disturbs the (seeded) game randomness.
+_zobristRandom = random.Random(0)
+_zobristKeys = {}
+
+def _zobristKey(feature):
+    if (feature not in _zobristKeys):
+        _zobristKeys[feature] = _zobristRandom.getrandbits(64)
+
+    return _zobristKeys[feature]
+
+def _agentZobristKey(agentIndex, agentState):
+    return _zobristKey(('agent', agentIndex, agentState.getPosition(),
+            agentState.getDirection(), agentState.getScaredTimer()))
+
+def _updateZobristHash(zobristHash, oldAgentStates, newAgentStates, agentIndexes,
+        eatenFood, eatenCapsule):
+    """
+    Update a Zobrist hash for a move that changed (at most) the given agents,
+    and ate the given food and capsule (positions, or None).
+    """
+
+    for index in agentIndexes:
+        oldKey = _agentZobristKey(index, oldAgentStates[index])
+        newKey = _agentZobristKey(index, newAgentStates[index])
+        zobristHash ^= (oldKey ^ newKey)
+
+    return zobristHash ^ _foodZobristDelta(eatenFood, eatenCapsule)
+
+def _foodZobristDelta(eatenFood, eatenCapsule):
+    """
+    Get the change in a Zobrist hash from eating the given food and capsule (positions, or None).
+    """
+
+    delta = 0
+
+    if (eatenFood is not None):
+        delta ^= _zobristKey(('food', eatenFood[0], eatenFood[1]))
+
+    if (eatenCapsule is not None):
+        delta ^= _zobristKey(('capsule', eatenCapsule[0], eatenCapsule[1]))
+
+    return delta
+
 class PacmanGameState(AbstractGameState):
     """
     A game state specific to pacman.
@@ -49,6 +104,16 @@ class PacmanGameState(AbstractGameState):
     def __init__(self, layout):
         super().__init__(layout)
 
+        self._zobristHash = None
+        self._foodZobristHash = None
+
+        # Undo entries for makeMove(), created on the first call.
+        self._undoStack = None
+
+        # If makeMove() has made private copies of the food and capsules (that it edits in place).
+        self._ownsFood = False
+        self._ownsCapsules = False
+
     # Override
     def generateSuccessor(self, agentIndex, action):
         """
@@ -60,10 +125,186 @@ class PacmanGameState(AbstractGameState):
             raise RuntimeError("Can't generate successors of a terminal state.")
 
         successor = self._initSuccessor()
+        successor._undoStack = None
+        successor._ownsFood = False
+        successor._ownsCapsules = False
+
+        # makeMove() edits owned food and capsules in place, so they can't be shared.
+        if (self._ownsFood):
+            successor._food = self._food.copy()
+            successor._foodCopied = True
+
+        if (self._ownsCapsules):
+            successor._capsules = self._capsules.copy()
+            successor._capsulesCopied = True
+
         successor._applySuccessorAction(agentIndex, action)
 
+        # Only keep the Zobrist hashes up to date once someone has asked for them.
+        successor._zobristHash = None
+        successor._foodZobristHash = None
+
+        if (self._zobristHash is not None or self._foodZobristHash is not None):
+            eatenFood, eatenCapsule = self._eatenBy(successor, agentIndex)
+
+            if (self._zobristHash is not None):
+                successor._zobristHash = _updateZobristHash(self._zobristHash,
+                        self._agentStates, successor._agentStates,
+                        range(len(self._agentStates)), eatenFood, eatenCapsule)
+
+            if (self._foodZobristHash is not None):
+                successor._foodZobristHash = (self._foodZobristHash
+                        ^ _foodZobristDelta(eatenFood, eatenCapsule))
+
         return successor
 
+    def makeMove(self, agentIndex, action):
+        """
+        Apply the action to this state in place (instead of creating a successor)
+        and remember how to take it back with unmakeMove().
+        Moves must be unmade in the reverse order they were made.
+
+        This is much cheaper than generateSuccessor() since nothing but the
+        agent states the move can touch is copied,
+        which makes it a good fit for tree searches:
+        ```
+        for action in state.getLegalActions(agentIndex):
+            state.makeMove(agentIndex, action)
+            score = search(state)
+            state.unmakeMove()
+        ```
+
+        Food and capsules are copy-on-write:
+        the first time a move eats from food (or capsules) shared with another state,
+        this state gets its own copy, which it then keeps and edits in place.
+        makeMove() never changes any other state,
+        and successors of a state with its own copy get their own copy as well.
+        """
+
+        if (self.isOver()):
+            raise RuntimeError("Can't make a move from a terminal state.")
+
+        eatenFood = None
+        eatenCapsule = None
+        changedAgents = [agentIndex]
+
+        if (agentIndex == PACMAN_AGENT_INDEX):
+            x, y = nearestPoint(self._pacmanTarget(action))
+
+            if (self.hasFood(x, y)):
+                eatenFood = (x, y)
+                if (not self._ownsFood):
+                    self._food = self._food.copy()
+                    self._foodCopied = True
+                    self._ownsFood = True
+            elif (self.hasCapsule(x, y)):
+                eatenCapsule = (x, y, self._capsules.index((x, y)))
+                if (not self._ownsCapsules):
+                    self._capsules = self._capsules.copy()
+                    self._capsulesCopied = True
+                    self._ownsCapsules = True
+
+            changedAgents = self._pacmanChangedAgents(action, eatenCapsule is not None)
+
+        if (self._undoStack is None):
+            self._undoStack = []
+
+        # Everything but the agent states, food, and capsules is a plain value,
+        # so a shallow copy of the attributes is enough to restore them.
+        saved = dict(self.__dict__)
+
+        self._agentStates = list(self._agentStates)
+        for index in changedAgents:
+            self._agentStates[index] = self._agentStates[index].copy()
+
+        try:
+            self._applySuccessorAction(agentIndex, action)
+        except Exception:
+            self.__dict__ = saved
+            raise
+
+        if (saved['_zobristHash'] is not None):
+            self._zobristHash = _updateZobristHash(saved['_zobristHash'],
+                    saved['_agentStates'], self._agentStates, changedAgents,
+                    eatenFood, eatenCapsule)
+
+        if (saved['_foodZobristHash'] is not None):
+            self._foodZobristHash = (saved['_foodZobristHash']
+                    ^ _foodZobristDelta(eatenFood, eatenCapsule))
+
+        self._undoStack.append((saved, eatenFood, eatenCapsule))
+
+    def unmakeMove(self):
+        """
+        Take back the last move made with makeMove().
+        """
+
+        if (not self._undoStack):
+            raise RuntimeError('There are no moves to unmake.')
+
+        saved, eatenFood, eatenCapsule = self._undoStack.pop()
+        self.__dict__ = saved
+
+        if (eatenFood is not None):
+            x, y = eatenFood
+            self._food[x][y] = True
+
+        if (eatenCapsule is not None):
+            x, y, index = eatenCapsule
+            self._capsules.insert(index, (x, y))
+
+    def getZobristHash(self):
+        """
+        Get a 64-bit Zobrist hash of the agents (position, direction, scared timer),
+        food, and capsules.
+
+        This is much cheaper than hashing the full state.
+        The first call computes the hash from scratch,
+        after that the hash of every successor is updated incrementally from its parent.
+        Note that the score is not part of the hash.
+        """
+
+        if (self._zobristHash is None):
+            zobristHash = self.getFoodZobristHash()
+
+            for (agentIndex, agentState) in enumerate(self._agentStates):
+                zobristHash ^= _agentZobristKey(agentIndex, agentState)
+
+            self._zobristHash = zobristHash
+
+        return self._zobristHash
+
+    def getFoodZobristHash(self):
+        """
+        Get a 64-bit Zobrist hash of just the food and capsules.
+        States with the same food and capsules have the same hash, wherever the agents are,
+        which makes this a good key for anything computed from the food alone.
+        Like `PacmanGameState.getZobristHash`, it is kept up to date incrementally.
+        """
+
+        if (self._foodZobristHash is None):
+            foodHash = 0
+
+            for (x, y) in self.getFood().asList():
+                foodHash ^= _zobristKey(('food', x, y))
+
+            for (x, y) in self.getCapsules():
+                foodHash ^= _zobristKey(('capsule', x, y))
+
+            self._foodZobristHash = foodHash
+
+        return self._foodZobristHash
+
+    @staticmethod
+    def getFoodZobristDelta(food = None, capsule = None):
+        """
+        Get the change in `PacmanGameState.getFoodZobristHash` from eating the given food
+        and capsule (positions, or None).
+        E.g. the food hash before pacman ate a food is the hash after it xor this.
+        """
+
+        return _foodZobristDelta(food, capsule)
+
     # Override
     def getLegalActions(self, agentIndex = PACMAN_AGENT_INDEX):
         if (self.isOver()):
@@ -118,6 +359,50 @@ class PacmanGameState(AbstractGameState):
 
         return self._agentStates[PACMAN_AGENT_INDEX]
 
+    def _pacmanChangedAgents(self, action, eatsCapsule):
+        """
+        Get the indexes of the agents that pacman taking the action may change:
+        pacman, every ghost if a capsule is eaten, and any ghost pacman may collide with.
+        """
+
+        if (eatsCapsule):
+            return range(self.getNumAgents())
+
+        target = self._pacmanTarget(action)
+
+        changedAgents = [PACMAN_AGENT_INDEX]
+        for index in self.getGhostIndexes():
+            if (GhostRules.canKill(target, self._agentStates[index].getPosition())):
+                changedAgents.append(index)
+
+        return changedAgents
+
+    def _pacmanTarget(self, action):
+        x, y = self.getPacmanPosition()
+        dx, dy = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
+        return (x + dx, y + dy)
+
+    def _eatenBy(self, successor, agentIndex):
+        """
+        Get the food and capsule (positions, or None) eaten between the context state (self)
+        and a successor.
+        Food and capsules can only disappear from under pacman.
+        """
+
+        eatenFood = None
+        eatenCapsule = None
+
+        if (agentIndex == PACMAN_AGENT_INDEX):
+            x, y = nearestPoint(successor.getPacmanPosition())
+
+            if (self.hasFood(x, y) and not successor.hasFood(x, y)):
+                eatenFood = (x, y)
+
+            if (self.hasCapsule(x, y) and not successor.hasCapsule(x, y)):
+                eatenCapsule = (x, y)
+
+        return eatenFood, eatenCapsule
+
     def _applySuccessorAction(self, agentIndex, action):
         """
         Apply the action to the context state (self).
@@ -370,6 +655,27 @@ def parseAgentArgs(str):
 
     return opts
 
+def _takesAgentOption(agentClass, option):
+    """
+    Check if an agent class takes an option:
+    its constructor declares it, or passes its extra options on to a base class that does.
+    """
+
+    for cls in agentClass.__mro__:
+        if ('__init__' not in cls.__dict__):
+            continue
+
+        parameters = inspect.signature(cls.__init__).parameters
+        if (option in parameters):
+            return True
+
+        takesKeywords = any([parameter.kind == inspect.Parameter.VAR_KEYWORD
+                for parameter in parameters.values()])
+        if (not takesKeywords):
+            return False
+
+    return False
+
 def readCommand(argv):
     """
     Processes the command used to run pacman from the command line.
@@ -385,6 +691,14 @@ def readCommand(argv):
             - Starts an interactive game.
         (2) python -m pacai.bin.pacman --layout smallClassic
             - Starts an interactive game on a smaller board.
+        (3) python -m pacai.bin.pacman --pacman GreedyAgent --num-games 10000 \\
+                --seed 4 --batch-output results.jsonl --num-workers 8
+            - Plays 10000 headless games on 8 processes, writing each result to a file.
+        (4) python -m pacai.bin.pacman --pacman ApproximateQAgent --num-training 5000 \\
+                --num-games 5010 --seed 4 --num-workers 8 --checkpoint weights.ckpt \\
+                --agent-args extractor=pacai.student.vectorFeatures.VectorSimpleExtractor
+            - Trains on 5000 games played by 8 actor processes (saving the weights as it goes),
+              then plays 10 games with the learned weights.
     """
 
     parser = getParser(description, os.path.basename(__file__))
@@ -415,6 +729,27 @@ def readCommand(argv):
             help = 'maximum time limit (seconds) an agent can spend computing per game '
                 + '(default: %(default)s)')
 
+    parser.add_argument('--batch-output', dest = 'batchOutput',
+            action = 'store', type = str, default = None,
+            help = 'play the games headless as a batch, streaming one result per game\n'
+                + 'to this file (.csv for CSV, anything else for JSON lines)'
+                + ' (default: %(default)s)')
+
+    parser.add_argument('--num-workers', dest = 'numWorkers',
+            action = 'store', type = int, default = 1,
+            help = 'number of processes to play batch games (or training games) on\n'
+                + '(default: %(default)s)')
+
+    parser.add_argument('--checkpoint', dest = 'checkpoint',
+            action = 'store', type = str, default = None,
+            help = 'save the learned weights to this file during distributed training\n'
+                + '(training resumes from the file if it exists) (default: %(default)s)')
+
+    parser.add_argument('--sync-interval', dest = 'syncInterval',
+            action = 'store', type = int, default = training.DEFAULT_SYNC_INTERVAL,
+            help = 'number of distributed training games between weight syncs\n'
+                + '(default: %(default)s)')
+
     options, otherjunk = parser.parse_known_args(argv)
     args = dict()
 
@@ -442,12 +777,41 @@ def readCommand(argv):
     if (args['layout'] is None):
         raise ValueError('The layout ' + options.layout + ' cannot be found.')
 
+    # Batch games are always headless.
+    if (options.batchOutput is not None):
+        if (options.replay is not None or options.record or options.numTraining > 0):
+            raise ValueError('Batch games cannot be recorded, replayed, or used for training.')
+
+        options.nullGraphics = True
+
+    # Training is distributed over processes when there is more than one, or to checkpoint.
+    distributedTraining = (options.numTraining > 0
+            and (options.numWorkers > 1 or options.checkpoint is not None))
+
+    if (distributedTraining and (options.replay is not None or options.record)):
+        raise ValueError('Distributed training games cannot be recorded or replayed.')
+
+    if (options.checkpoint is not None and not distributedTraining):
+        raise ValueError('Checkpoints are only saved by distributed training (--num-training).')
+
     # Choose a Pacman agent.
     noKeyboard = (options.replay is None and (options.textGraphics or options.nullGraphics))
     if (noKeyboard and ('KeyboardAgent' in options.pacman)):
         raise ValueError('Keyboard agents require graphics.')
 
     agentOpts = parseAgentArgs(options.agentArgs)
+
+    # Actors only record transitions, so the learner has nothing to replay.
+    if (distributedTraining and int(agentOpts.get('replayCapacity', 0)) > 0):
+        raise ValueError('Distributed training does not support experience replay'
+                + ' (replayCapacity).')
+
+    # Let timed agents (the ones that take a moveTimeout) know how long they have for each move.
+    pacmanClass = BaseAgent.getAgentClass(options.pacman)
+    if ('moveTimeout' not in agentOpts and _takesAgentOption(pacmanClass, 'moveTimeout')):
+        agentOpts['moveTimeout'] = ClassicGameRules(options.timeout).getMoveTimeout(
+                PACMAN_AGENT_INDEX)
+
     if options.numTraining > 0:
         args['numTraining'] = options.numTraining
         if 'numTraining' not in agentOpts:
@@ -480,15 +844,35 @@ def readCommand(argv):
 
     args['catchExceptions'] = options.catchExceptions
     args['gameToReplay'] = options.replay
+    args['replayGameIndex'] = options.replayGame
+    args['replayTurn'] = options.replayTurn
     args['ghosts'] = [BaseAgent.loadAgent(options.ghost, i + 1) for i in range(options.numGhosts)]
     args['numGames'] = options.numGames
     args['pacman'] = BaseAgent.loadAgent(options.pacman, PACMAN_AGENT_INDEX, agentOpts)
     args['record'] = options.record
     args['timeout'] = options.timeout
 
+    # Batch games build their own agents (in each worker), so they need the agent names.
+    args['batchOutput'] = options.batchOutput
+    args['numWorkers'] = options.numWorkers
+    args['seed'] = seed
+    args['pacmanName'] = options.pacman
+    args['pacmanArgs'] = agentOpts
+    args['ghostName'] = options.ghost
+    args['numGhosts'] = options.numGhosts
+
+    args['distributedTraining'] = distributedTraining
+    args['checkpoint'] = options.checkpoint
+    args['syncInterval'] = options.syncInterval
+
     return args
 
-def replayGame(layout, actions, display):
+def replayGame(recordedGame, display, startTurn = 0):
+    """
+    Show a `pacai.bin.replay.ReplayGame`, starting from the state after `startTurn` moves.
+    """
+
+    layout = recordedGame.getLayout()
     rules = ClassicGameRules()
 
     agents = []
@@ -496,13 +880,11 @@ def replayGame(layout, actions, display):
     agents += [RandomGhost(i + 1) for i in range(layout.getNumGhosts())]
 
     game = rules.newGame(layout, agents[PACMAN_AGENT_INDEX], agents[1:], display)
-    state = game.state
-    display.initialize(state)
 
-    for action in actions:
-        # Execute the action
-        state = state.generateSuccessor(*action)
+    states = recordedGame.getStates(startTurn)
+    display.initialize(next(states))
 
+    for state in states:
         # Change the display
         display.update(state)
 
@@ -521,6 +903,15 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
         logging.info('Playing %d training games.' % numTraining)
         nullView = PacmanNullView()
 
+    # Every game is appended to the same replay file.
+    recorder = None
+    if (record):
+        path = 'pacman.replay'
+        if (isinstance(record, str)):
+            path = record
+
+        recorder = replay.ReplayWriter(path)
+
     for i in range(numGames):
         isTraining = (i < numTraining)
 
@@ -530,20 +921,22 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
         else:
             gameDisplay = display
 
+        # Recorded games are snapshotted as they are played.
+        if (recorder is not None):
+            gameDisplay = recorder.getSnapshotView(gameDisplay, replay.GAME_PACMAN)
+
         game = rules.newGame(layout, pacman, ghosts, gameDisplay, catchExceptions)
         game.run()
 
         if (not isTraining):
             games.append(game)
 
-        if (record):
-            path = 'pacman.replay'
-            if (isinstance(record, str)):
-                path = record
+        if (recorder is not None):
+            recorder.writeGame(replay.GAME_PACMAN, layout, game.moveHistory,
+                    snapshots = gameDisplay.getSnapshots())
 
-            components = {'layout': layout, 'actions': game.moveHistory}
-            with open(path, 'wb') as file:
-                pickle.dump(components, file)
+    if (recorder is not None):
+        recorder.close()
 
     if ((numGames - numTraining) > 0):
         scores = [game.state.getScore() for game in games]
@@ -556,6 +949,155 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
 
     return games
 
+def runBatch(layout, pacmanName, pacmanArgs, ghostName, numGhosts, numGames, seed,
+        batchOutput, numWorkers = 1, catchExceptions = False, timeout = 30, **kwargs):
+    """
+    Play headless games, sharded across a pool of `numWorkers` processes.
+
+    Every game gets its own seed (derived from `seed`) and freshly loaded agents,
+    so the result of a game does not depend on which worker played it or in what order.
+    Each result (game number, seed, score, win, moves, and wall time) is written to `batchOutput`
+    as soon as the game finishes, and only running totals are kept in memory.
+    Returns the totals.
+    """
+
+    seedGenerator = random.Random(seed)
+    tasks = [(i, seedGenerator.getrandbits(32)) for i in range(numGames)]
+
+    config = {
+        'layout': layout,
+        'pacmanName': pacmanName,
+        'pacmanArgs': pacmanArgs,
+        'ghostName': ghostName,
+        'numGhosts': numGhosts,
+        'catchExceptions': catchExceptions,
+        'timeout': timeout,
+    }
+
+    totals = {
+        'games': 0,
+        'wins': 0,
+        'totalScore': 0.0,
+        'minScore': None,
+        'maxScore': None,
+        'totalMoves': 0,
+        'totalTime': 0.0,
+    }
+
+    pool = None
+    if (numWorkers > 1):
+        pool = multiprocessing.Pool(numWorkers, initializer = _initBatchWorker,
+                initargs = (config,))
+        results = pool.imap_unordered(_playBatchGame, tasks, chunksize = BATCH_CHUNK_SIZE)
+    else:
+        _initBatchWorker(config)
+        results = map(_playBatchGame, tasks)
+
+    startTime = time.time()
+
+    try:
+        with open(batchOutput, 'w', newline = '') as file:
+            writer = _BatchResultWriter(file, batchOutput.endswith('.csv'))
+
+            for result in results:
+                writer.write(result)
+                _updateBatchTotals(totals, result)
+
+                if (totals['games'] % BATCH_LOG_INTERVAL == 0):
+                    logging.info('Played %d/%d games (%.1f games/sec).' % (totals['games'],
+                            numGames, totals['games'] / max(time.time() - startTime, 1e-9)))
+    except BaseException:
+        # Don't wait for the games that are still running.
+        if (pool is not None):
+            pool.terminate()
+            pool.join()
+
+        raise
+
+    if (pool is not None):
+        pool.close()
+        pool.join()
+
+    if (totals['games'] > 0):
+        winRate = totals['wins'] / float(totals['games'])
+        logging.info('Average Score: %s', totals['totalScore'] / totals['games'])
+        logging.info('Score Range:   %s to %s', totals['minScore'], totals['maxScore'])
+        logging.info('Win Rate:      %d/%d (%.2f)' % (totals['wins'], totals['games'], winRate))
+        logging.info('Average Moves: %.1f', totals['totalMoves'] / totals['games'])
+        logging.info('Results:       %s', batchOutput)
+
+    return totals
+
+class _BatchResultWriter(object):
+    """
+    Writes batch game results as JSON lines or CSV, flushing after every game.
+    """
+
+    def __init__(self, file, isCSV):
+        self._file = file
+        self._csvWriter = None
+
+        if (isCSV):
+            self._csvWriter = csv.DictWriter(file, fieldnames = BATCH_RESULT_FIELDS)
+            self._csvWriter.writeheader()
+
+    def write(self, result):
+        if (self._csvWriter is not None):
+            self._csvWriter.writerow(result)
+        else:
+            self._file.write(json.dumps(result) + '\n')
+
+        self._file.flush()
+
+def _updateBatchTotals(totals, result):
+    score = result['score']
+
+    totals['games'] += 1
+    totals['wins'] += int(result['win'])
+    totals['totalScore'] += score
+    totals['totalMoves'] += result['moves']
+    totals['totalTime'] += result['time']
+
+    if (totals['minScore'] is None or score < totals['minScore']):
+        totals['minScore'] = score
+
+    if (totals['maxScore'] is None or score > totals['maxScore']):
+        totals['maxScore'] = score
+
+# The configuration of the batch games played in this process (set by _initBatchWorker).
+_batchConfig = None
+
+def _initBatchWorker(config):
+    global _batchConfig
+    _batchConfig = config
+
+def _playBatchGame(task):
+    gameIndex, seed = task
+    config = _batchConfig
+
+    random.seed(seed)
+
+    layout = config['layout']
+    pacman = BaseAgent.loadAgent(config['pacmanName'], PACMAN_AGENT_INDEX,
+            dict(config['pacmanArgs']))
+    ghosts = [BaseAgent.loadAgent(config['ghostName'], i + 1)
+            for i in range(config['numGhosts'])]
+
+    rules = ClassicGameRules(config['timeout'])
+    game = rules.newGame(layout, pacman, ghosts, PacmanNullView(), config['catchExceptions'])
+
+    startTime = time.time()
+    game.run()
+
+    return {
+        'game': gameIndex,
+        'seed': seed,
+        'score': game.state.getScore(),
+        'win': game.state.isWin(),
+        'moves': len(game.moveHistory),
+        'time': time.time() - startTime,
+    }
+
 def main(argv):
     """
     Entry point for a pacman game.
@@ -569,17 +1111,30 @@ def main(argv):
 
     # Special case: recorded games don't use the runGames method.
     if (args['gameToReplay'] is not None):
-        logging.info('Replaying recorded game %s.' % args['gameToReplay'])
+        logging.info('Replaying recorded games %s.' % args['gameToReplay'])
 
-        recorded = None
         with open(args['gameToReplay'], 'rb') as file:
-            recorded = pickle.load(file)
+            for (i, recordedGame) in enumerate(replay.ReplayReader(file)):
+                if (args['replayGameIndex'] is not None and i != args['replayGameIndex']):
+                    continue
 
-        recorded['display'] = args['display']
-        replayGame(**recorded)
+                if (recordedGame.getGameType() != replay.GAME_PACMAN):
+                    raise ValueError('Recorded game %d is not a pacman game.' % (i))
+
+                replayGame(recordedGame, args['display'], args['replayTurn'])
 
         return
 
+    if (args['batchOutput'] is not None):
+        return runBatch(**args)
+
+    # Distributed training only leaves the test games to play here.
+    if (args['distributedTraining']):
+        training.runTraining(**args)
+
+        args['numGames'] -= args['numTraining']
+        args['numTraining'] = 0
+
     return runGames(**args)
 
 if __name__ == '__main__':
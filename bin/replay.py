@@ -0,0 +1,646 @@
+"""
+A compact, streamable file format for recorded games.
+
+A replay file starts with a header (`REPLAY_MAGIC` followed by a version byte),
+and then holds any number of records.
+Each record is a type byte, a varint payload length, and the payload.
+Records are only ever appended, so one file can collect every game of many runs.
+
+There are two kinds of records:
+ - Layout records hold the text of a layout (and its number of ghosts) under a short hash.
+   Each layout is written once per file.
+ - Game records hold the hash of their layout, some JSON info (team names, game length, ...),
+   and the moves of the game.
+   Each move (agent index and action) is a single varint, so a move almost always takes one byte.
+   After the moves comes a snapshot of the state every `snapshotInterval` moves:
+   the position, direction, and scared timer of each agent, the food (as a bitset),
+   the capsules, the score, and the time left (in capture).
+
+Snapshots are taken from the live states of a game as it is played
+(by wrapping the game's view in a `SnapshotView`),
+and only go through the public accessors of the states.
+
+Nothing is ever unpickled when reading a replay.
+States are rebuilt from the closest snapshot before the wanted turn (or the start of the layout)
+by playing the moves since then.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+from pacai.core.layout import Layout
+
+REPLAY_MAGIC = b'PACREPLAY'
+REPLAY_VERSION = 1
+
+RECORD_LAYOUT = 1
+RECORD_GAME = 2
+
+GAME_PACMAN = 'pacman'
+GAME_CAPTURE = 'capture'
+
+# The position of each action is its code in a move.
+ACTIONS = [Directions.STOP, Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+ACTION_CODES = {action: code for (code, action) in enumerate(ACTIONS)}
+
+LAYOUT_HASH_SIZE = 8
+DEFAULT_SNAPSHOT_INTERVAL = 100
+
+class ReplayWriter(object):
+    """
+    Appends games to a replay file, creating the file if it does not exist.
+    A record that was only partially written (by an interrupted run) is dropped before appending.
+    """
+
+    def __init__(self, path, snapshotInterval = DEFAULT_SNAPSHOT_INTERVAL):
+        self._snapshotInterval = max(1, snapshotInterval)
+        self._layoutHashes = set()
+
+        end = 0
+        if (os.path.isfile(path) and os.path.getsize(path) > 0):
+            with open(path, 'rb') as file:
+                end = self._scan(file)
+
+        self._file = open(path, 'ab')
+
+        if (end == 0):
+            self._file.truncate(0)
+            self._file.write(REPLAY_MAGIC + bytes([REPLAY_VERSION]))
+        elif (end < os.path.getsize(path)):
+            logging.warning("Dropping a partial record at the end of replay file '%s'." % (path))
+            self._file.truncate(end)
+
+        self._file.flush()
+
+    def getSnapshotView(self, view, gameType):
+        """
+        Wrap the view of a game that will be written,
+        so that the game is snapshotted as it is played (see `SnapshotView`).
+        """
+
+        return SnapshotView(view, gameType, self._snapshotInterval)
+
+    def writeGame(self, gameType, layout, moveHistory, info = None, snapshots = None):
+        """
+        Append a game (`GAME_PACMAN` or `GAME_CAPTURE`) played on the layout.
+        `moveHistory` is the (agentIndex, action) of every move (see `pacai.core.game.Game`).
+        `snapshots` are the snapshots taken while the game was played
+        (see `SnapshotView.getSnapshots`).
+        A game without snapshots is always replayed from its start.
+        """
+
+        if (snapshots is None):
+            snapshots = []
+
+        if (info is None):
+            info = {}
+
+        info = dict(info)
+        info['type'] = gameType
+
+        layoutText = '\n'.join(layout.layoutText)
+        numGhosts = layout.getNumGhosts()
+        layoutHash = _getLayoutHash(layoutText, numGhosts)
+
+        data = bytearray()
+
+        if (layoutHash not in self._layoutHashes):
+            payload = layoutHash + _encodeVarint(numGhosts) + layoutText.encode('utf-8')
+            data += _encodeRecord(RECORD_LAYOUT, payload)
+            self._layoutHashes.add(layoutHash)
+
+        infoData = json.dumps(info, sort_keys = True).encode('utf-8')
+
+        # A crashed move can be in the history without ever having been shown.
+        snapshots = [(turn, data) for (turn, data) in snapshots if (turn <= len(moveHistory))]
+        snapshotTurns = set([turn for (turn, data) in snapshots])
+
+        moves = bytearray()
+
+        # The offset of the next move after every snapshot turn.
+        snapshotOffsets = {}
+
+        for (i, (agentIndex, action)) in enumerate(moveHistory):
+            if (action not in ACTION_CODES):
+                raise ValueError('Cannot record the unknown action: %s.' % (action))
+
+            moves += _encodeVarint(agentIndex * len(ACTIONS) + ACTION_CODES[action])
+
+            if ((i + 1) in snapshotTurns):
+                snapshotOffsets[i + 1] = len(moves)
+
+        payload = bytearray(layoutHash)
+        payload += _encodeVarint(len(infoData))
+        payload += infoData
+        payload += _encodeVarint(len(moveHistory))
+        payload += _encodeVarint(len(moves))
+        payload += moves
+
+        payload += _encodeVarint(len(snapshots))
+
+        for (turn, stateData) in snapshots:
+            snapshot = _encodeVarint(snapshotOffsets.get(turn, 0)) + stateData
+
+            payload += _encodeVarint(turn)
+            payload += _encodeVarint(len(snapshot))
+            payload += snapshot
+
+        data += _encodeRecord(RECORD_GAME, payload)
+
+        # A single write per game keeps a record from being split between two runs.
+        self._file.write(data)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _scan(self, file):
+        """
+        Collect the layouts already in the file.
+        Returns the offset just past the last complete record.
+        """
+
+        reader = ReplayReader(file)
+
+        end = file.tell()
+        for (recordType, offset, length) in reader.records():
+            if (recordType == RECORD_LAYOUT):
+                file.seek(offset)
+                self._layoutHashes.add(file.read(LAYOUT_HASH_SIZE))
+
+            end = offset + length
+
+        return end
+
+class SnapshotView(object):
+    """
+    Wraps the view of a game that is being recorded.
+    Every `snapshotInterval` moves, the live state the view is shown is snapshotted
+    (so the writer never has to play the game again).
+    Everything else is passed on to the wrapped view.
+    """
+
+    def __init__(self, view, gameType, snapshotInterval = DEFAULT_SNAPSHOT_INTERVAL):
+        self._view = view
+        self._gameType = gameType
+        self._snapshotInterval = max(1, snapshotInterval)
+
+        self._turn = 0
+        self._snapshots = []
+
+    def initialize(self, state):
+        self._turn = 0
+        self._snapshots = []
+
+        self._view.initialize(state)
+
+    def update(self, state, *args, **kwargs):
+        # The game shows the view every state it moves to, once per move.
+        self._turn += 1
+        if (self._turn % self._snapshotInterval == 0):
+            self._snapshots.append((self._turn, _encodeSnapshot(state, self._gameType)))
+
+        self._view.update(state, *args, **kwargs)
+
+    def getSnapshots(self):
+        """
+        Get the snapshots taken so far, as (turn, snapshot data) in order of turn.
+        """
+
+        return list(self._snapshots)
+
+    def __getattr__(self, name):
+        return getattr(self._view, name)
+
+class ReplayReader(object):
+    """
+    Reads games from an open (binary) replay file, one record at a time.
+    Iterating over the reader gives a `ReplayGame` for each game in the file.
+    """
+
+    def __init__(self, file):
+        self._file = file
+
+        # {hash: (layout text, number of ghosts)}, the layouts are only built when used.
+        self._layoutTexts = {}
+        self._layouts = {}
+
+        header = file.read(len(REPLAY_MAGIC) + 1)
+        if (len(header) != len(REPLAY_MAGIC) + 1 or header[:-1] != REPLAY_MAGIC):
+            raise ValueError('Not a replay file (or a replay from an older version of pacai).')
+
+        if (header[-1] != REPLAY_VERSION):
+            raise ValueError('Unsupported replay version: %d.' % (header[-1]))
+
+    def __iter__(self):
+        for (recordType, offset, length) in self.records():
+            self._file.seek(offset)
+            payload = self._file.read(length)
+
+            if (recordType == RECORD_LAYOUT):
+                layoutHash = payload[:LAYOUT_HASH_SIZE]
+                numGhosts, start = _decodeVarint(payload, LAYOUT_HASH_SIZE)
+                self._layoutTexts[layoutHash] = (payload[start:].decode('utf-8'), numGhosts)
+            elif (recordType == RECORD_GAME):
+                yield self._readGame(payload)
+
+    def records(self):
+        """
+        Walk the records from the current position of the file, without reading their payloads.
+        Yields a tuple for each record: (type, payload offset, payload length).
+        A partially written last record is ignored.
+        """
+
+        while (True):
+            recordType = self._file.read(1)
+            if (len(recordType) == 0):
+                return
+
+            length = _readVarint(self._file)
+            offset = self._file.tell()
+
+            self._file.seek(0, os.SEEK_END)
+            if (length is None or offset + length > self._file.tell()):
+                logging.warning('Ignoring a partial record at the end of a replay file.')
+                return
+
+            yield (recordType[0], offset, length)
+
+            self._file.seek(offset + length)
+
+    def _readGame(self, payload):
+        layoutHash = payload[:LAYOUT_HASH_SIZE]
+        if (layoutHash not in self._layoutTexts):
+            raise ValueError('A replayed game references a layout that is not in the file.')
+
+        infoLength, offset = _decodeVarint(payload, LAYOUT_HASH_SIZE)
+        info = json.loads(payload[offset:(offset + infoLength)].decode('utf-8'))
+        numMoves, offset = _decodeVarint(payload, offset + infoLength)
+        movesLength, movesOffset = _decodeVarint(payload, offset)
+
+        # Only index the snapshots here, they are decoded when a state is asked for.
+        snapshots = []
+        numSnapshots, offset = _decodeVarint(payload, movesOffset + movesLength)
+        for i in range(numSnapshots):
+            turn, offset = _decodeVarint(payload, offset)
+            length, offset = _decodeVarint(payload, offset)
+
+            snapshots.append((turn, offset))
+            offset += length
+
+        return ReplayGame(self._getLayout(layoutHash), info, numMoves, payload, movesOffset,
+                snapshots)
+
+    def _getLayout(self, layoutHash):
+        if (layoutHash not in self._layouts):
+            layoutText, numGhosts = self._layoutTexts[layoutHash]
+            self._layouts[layoutHash] = Layout(layoutText.split('\n'), maxGhosts = numGhosts)
+
+        return self._layouts[layoutHash]
+
+class ReplayGame(object):
+    """
+    A single recorded game.
+    Moves are decoded (and states rebuilt) only as they are asked for.
+    """
+
+    def __init__(self, layout, info, numMoves, data, movesOffset, snapshots = None):
+        self._layout = layout
+        self._info = info
+        self._numMoves = numMoves
+        self._data = data
+        self._movesOffset = movesOffset
+
+        # [(turn, offset of the snapshot of the state after `turn` moves)], in order of turn.
+        if (snapshots is None):
+            snapshots = []
+
+        self._snapshots = snapshots
+
+    def getGameType(self):
+        return self._info['type']
+
+    def getInfo(self):
+        return self._info
+
+    def getLayout(self):
+        return self._layout
+
+    def getNumMoves(self):
+        return self._numMoves
+
+    def getMoves(self, start = 0):
+        """
+        Get an iterator over the (agentIndex, action) moves, starting with move number `start`.
+        """
+
+        offset = self._movesOffset
+        for i in range(start):
+            offset = _skipVarint(self._data, offset)
+
+        for (offset, move) in self._iterMoves(start, offset):
+            yield move
+
+    def getState(self, turn):
+        """
+        Get the state after `turn` moves.
+        """
+
+        return next(self.getStates(turn))
+
+    def getStates(self, start = 0):
+        """
+        Get an iterator over the states of the game, starting with the state after `start` moves.
+        """
+
+        if (start < 0 or start > self._numMoves):
+            raise ValueError('Turn %d is outside of the game (0 - %d).' % (start, self._numMoves))
+
+        turn, offset, state = self._getSnapshot(start)
+
+        if (turn == start):
+            yield state
+
+        for (offset, (agentIndex, action)) in self._iterMoves(turn, offset):
+            state = state.generateSuccessor(agentIndex, action)
+            turn += 1
+
+            if (turn >= start):
+                yield state
+
+    def _getSnapshot(self, turn):
+        """
+        Rebuild the state from the last snapshot before a turn
+        (or the start of the game if there is none).
+        A rebuilt state is only ever used to play moves from,
+        so every state that is handed out comes from the start of the game or a move
+        (with everything a move sets, like the last agent to move).
+        Returns a tuple: (snapshot turn, offset of the next move, state).
+        """
+
+        index = bisect.bisect_left(self._snapshots, (turn, -1)) - 1
+        if (index < 0):
+            return 0, self._movesOffset, self._newState()
+
+        snapshotTurn, offset = self._snapshots[index]
+        offset, state = self._decodeSnapshot(offset)
+
+        return snapshotTurn, self._movesOffset + offset, state
+
+    def _decodeSnapshot(self, offset):
+        """
+        Rebuild the state of a snapshot (see `_encodeSnapshot`) through the state's public methods.
+        Returns a tuple: (offset of the next move from the start of the moves, state).
+        """
+
+        data = self._data
+
+        movesOffset, offset = _decodeVarint(data, offset)
+        score, offset = _decodeVarint(data, offset)
+        flags, offset = _decodeVarint(data, offset)
+
+        timeleft = None
+        if (self.getGameType() == GAME_CAPTURE):
+            timeleft, offset = _decodeVarint(data, offset)
+
+        state = self._newState(timeleft)
+        state.addScore(_unzigzag(score) - state.getScore())
+
+        for agentIndex in range(state.getNumAgents()):
+            x, offset = _decodeVarint(data, offset)
+            y, offset = _decodeVarint(data, offset)
+            direction, offset = _decodeVarint(data, offset)
+            isPacman, offset = _decodeVarint(data, offset)
+            scaredTimer, offset = _decodeVarint(data, offset)
+
+            agentState = state.getAgentState(agentIndex)
+            _placeAgent(agentState, (_decodeHalf(x), _decodeHalf(y)), ACTIONS[direction])
+            agentState.setIsPacman(bool(isPacman))
+            agentState.setScaredTimer(scaredTimer)
+
+        # Food and capsules are only ever eaten,
+        # so eating the missing ones keeps the state's own bookkeeping (e.g. food per side) right.
+        food = state.getFood()
+        width = food.getWidth()
+        height = food.getHeight()
+
+        size = (width * height + 7) // 8
+        bits = int.from_bytes(data[offset:(offset + size)], 'little')
+        offset += size
+
+        eatenFood = []
+        for x in range(width):
+            for y in range(height):
+                if (food[x][y] and not (bits >> (x * height + y)) & 1):
+                    eatenFood.append((x, y))
+
+        for (x, y) in eatenFood:
+            state.eatFood(x, y)
+
+        capsules = set()
+        numCapsules, offset = _decodeVarint(data, offset)
+        for i in range(numCapsules):
+            x, offset = _decodeVarint(data, offset)
+            y, offset = _decodeVarint(data, offset)
+            capsules.add((x, y))
+
+        for capsule in [capsule for capsule in state.getCapsules() if capsule not in capsules]:
+            state.eatCapsule(capsule[0], capsule[1])
+
+        if (flags & 1):
+            state.endGame(bool(flags & 2))
+
+        return movesOffset, state
+
+    def _iterMoves(self, turn, offset):
+        """
+        Decode the moves from move number `turn` (which starts at offset).
+        Yields a tuple for each move: (offset of the next move, (agentIndex, action)).
+        """
+
+        for i in range(turn, self._numMoves):
+            code, offset = _decodeVarint(self._data, offset)
+            yield (offset, (code // len(ACTIONS), ACTIONS[code % len(ACTIONS)]))
+
+    def _newState(self, timeleft = None):
+        # Local imports to avoid a circular import (the game scripts use this module).
+        if (self.getGameType() == GAME_PACMAN):
+            from pacai.bin.pacman import PacmanGameState
+            return PacmanGameState(self._layout)
+        elif (self.getGameType() == GAME_CAPTURE):
+            from pacai.bin.capture import CaptureGameState
+
+            if (timeleft is None):
+                timeleft = self._info['length']
+
+            return CaptureGameState(self._layout, timeleft)
+
+        raise ValueError('Unknown replay game type: %s.' % (self.getGameType()))
+
+def _getLayoutHash(layoutText, numGhosts):
+    data = ('%d|%s' % (numGhosts, layoutText)).encode('utf-8')
+    return hashlib.sha1(data).digest()[:LAYOUT_HASH_SIZE]
+
+def _encodeSnapshot(state, gameType):
+    """
+    Encode everything about a state that moves can change (through its public accessors).
+    The writer puts the offset of the next move (from the start of the moves) in front of it.
+    """
+
+    score = state.getScore()
+    if (score != int(score)):
+        raise ValueError('Cannot record the non-integer score: %s.' % (score))
+
+    data = bytearray()
+    data += _encodeVarint(_zigzag(int(score)))
+    data += _encodeVarint(int(state.isOver()) | (int(state.isWin()) << 1))
+
+    if (gameType == GAME_CAPTURE):
+        data += _encodeVarint(state.getTimeleft())
+
+    for agentIndex in range(state.getNumAgents()):
+        agentState = state.getAgentState(agentIndex)
+
+        # Agents move by half steps at the slowest (scared ghosts), so positions are doubled.
+        for value in agentState.getPosition():
+            if (value * 2 != int(value * 2)):
+                raise ValueError('Cannot record the agent position: %s.'
+                        % (str(agentState.getPosition())))
+
+            data += _encodeVarint(int(value * 2))
+
+        data += _encodeVarint(ACTION_CODES[agentState.getDirection()])
+        data += _encodeVarint(int(agentState.isPacman()))
+        data += _encodeVarint(agentState.getScaredTimer())
+
+    food = state.getFood()
+    height = food.getHeight()
+
+    bits = 0
+    for x in range(food.getWidth()):
+        for y in range(height):
+            if (food[x][y]):
+                bits |= 1 << (x * height + y)
+
+    data += bits.to_bytes((food.getWidth() * height + 7) // 8, 'little')
+
+    capsules = state.getCapsules()
+    data += _encodeVarint(len(capsules))
+    for (x, y) in capsules:
+        data += _encodeVarint(x)
+        data += _encodeVarint(y)
+
+    return bytes(data)
+
+def _placeAgent(agentState, position, direction):
+    """
+    Put an agent at a position, facing a direction, with its own movement methods:
+    back to its start, then over to the position (with a last step in the direction).
+    """
+
+    agentState.respawn()
+    startX, startY = agentState.getPosition()
+    # A unit step (as ints, so whole positions stay ints).
+    dx, dy = [int(value) for value in Actions.directionToVector(direction)]
+
+    agentState.updatePosition((position[0] - startX - dx, position[1] - startY - dy))
+    agentState.updatePosition((dx, dy))
+
+    if (agentState.getPosition() != position or agentState.getDirection() != direction):
+        raise ValueError('Could not restore an agent to %s (facing %s).'
+                % (str(position), direction))
+
+def _decodeHalf(value):
+    """
+    Undo the doubling of a position coordinate.
+    """
+
+    if (value % 2 == 0):
+        return value // 2
+
+    return value / 2
+
+def _zigzag(value):
+    """
+    Map a signed int to a non-negative one (0, -1, 1, -2, ... to 0, 1, 2, 3, ...).
+    """
+
+    return (value << 1) if (value >= 0) else ((-value << 1) - 1)
+
+def _unzigzag(value):
+    return (value >> 1) if ((value & 1) == 0) else -((value + 1) >> 1)
+
+def _encodeRecord(recordType, payload):
+    return bytes([recordType]) + _encodeVarint(len(payload)) + bytes(payload)
+
+def _encodeVarint(value):
+    """
+    Encode a non-negative int as a (little endian base 128) varint.
+    """
+
+    if (value < 0):
+        raise ValueError('Cannot encode a negative varint: %d.' % (value))
+
+    data = bytearray()
+    while (True):
+        byte = value & 0x7F
+        value >>= 7
+
+        if (value == 0):
+            data.append(byte)
+            return bytes(data)
+
+        data.append(byte | 0x80)
+
+def _decodeVarint(data, offset):
+    """
+    Decode the varint at an offset.
+    Returns a tuple: (value, offset just past the varint).
+    """
+
+    value = 0
+    shift = 0
+    while (True):
+        byte = data[offset]
+        offset += 1
+
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+        if (not (byte & 0x80)):
+            return value, offset
+
+def _skipVarint(data, offset):
+    while (data[offset] & 0x80):
+        offset += 1
+
+    return offset + 1
+
+def _readVarint(file):
+    """
+    Read a varint from a file, None if the file ends first.
+    """
+
+    value = 0
+    shift = 0
+    while (True):
+        byte = file.read(1)
+        if (len(byte) == 0):
+            return None
+
+        value |= (byte[0] & 0x7F) << shift
+        shift += 7
+
+        if (not (byte[0] & 0x80)):
+            return value
@@ -0,0 +1,106 @@
+"""
+A small benchmark for the graph search functions.
+
+Each search function is run on a `pacai.core.search.position.PositionSearchProblem`
+(from the pacman start to (1, 1)) for every requested layout,
+and the number of expanded nodes per second is reported.
+
+EXAMPLES:
+    python -m pacai.bin.searchbench
+    python -m pacai.bin.searchbench --layouts bigMaze,openMaze --repeat 5 \\
+        --functions pacai.student.search.breadthFirstSearch,pacai.core.search.search.bfs
+"""
+
+import argparse
+import functools
+import logging
+import sys
+import time
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from pacai.core.search.position import PositionSearchProblem
+from pacai.util import reflection
+from pacai.util.logs import initLogging
+
+DEFAULT_LAYOUTS = 'bigMaze,openMaze'
+DEFAULT_FUNCTIONS = ','.join([
+    'pacai.student.search.depthFirstSearch',
+    'pacai.student.search.breadthFirstSearch',
+    'pacai.student.search.uniformCostSearch',
+    'pacai.student.search.aStarSearch',
+    'pacai.student.search.bidirectionalSearch',
+])
+DEFAULT_HEURISTIC = 'pacai.core.search.heuristic.manhattan'
+
+def benchmark(function, layout, repeat = 1):
+    """
+    Run the search function on a fresh position search problem `repeat` times.
+    Returns a tuple: (path length, nodes expanded per run, total seconds).
+    """
+
+    state = PacmanGameState(layout)
+
+    path = []
+    expanded = 0
+    totalTime = 0.0
+
+    for i in range(repeat):
+        problem = PositionSearchProblem(state)
+
+        startTime = time.time()
+        path = function(problem)
+        totalTime += time.time() - startTime
+
+        expanded = problem.getExpandedCount()
+
+    return len(path), expanded, totalTime
+
+def main(argv):
+    """
+    Entry point for the search benchmark.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+
+    parser = argparse.ArgumentParser(description = __doc__, prog = 'searchbench',
+            formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('-l', '--layouts', dest = 'layouts',
+            action = 'store', type = str, default = DEFAULT_LAYOUTS,
+            help = 'comma separated layouts to search (default: %(default)s)')
+
+    parser.add_argument('-f', '--functions', dest = 'functions',
+            action = 'store', type = str, default = DEFAULT_FUNCTIONS,
+            help = 'comma separated, fully qualified, search functions (default: %(default)s)')
+
+    parser.add_argument('--heuristic', dest = 'heuristic',
+            action = 'store', type = str, default = DEFAULT_HEURISTIC,
+            help = 'heuristic for the functions that take one (default: %(default)s)')
+
+    parser.add_argument('-r', '--repeat', dest = 'repeat',
+            action = 'store', type = int, default = 3,
+            help = 'number of times to run each search (default: %(default)s)')
+
+    options = parser.parse_args(argv)
+
+    for layoutName in options.layouts.split(','):
+        layout = getLayout(layoutName)
+        if (layout is None):
+            raise ValueError('The layout ' + layoutName + ' cannot be found.')
+
+        for functionName in options.functions.split(','):
+            function = reflection.qualifiedImport(functionName)
+            if ('heuristic' in function.__code__.co_varnames):
+                heuristic = reflection.qualifiedImport(options.heuristic)
+                function = functools.partial(function, heuristic = heuristic)
+
+            length, expanded, seconds = benchmark(function, layout, options.repeat)
+
+            rate = (expanded * options.repeat) / max(seconds, 1e-9)
+            logging.info('%-12s %-45s path: %4d, expanded: %6d, %10.0f nodes/sec' %
+                    (layoutName, functionName, length, expanded, rate))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
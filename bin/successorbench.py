@@ -0,0 +1,124 @@
+"""
+A small benchmark for successor generation in `pacai.bin.pacman.PacmanGameState`.
+
+A full game tree (every legal action of every agent, in turn order)
+is walked to a fixed number of plies from the start of each requested layout,
+once with `generateSuccessor` and once with `makeMove`/`unmakeMove`,
+and the number of successors per second is reported for each.
+
+EXAMPLES:
+    python -m pacai.bin.successorbench
+    python -m pacai.bin.successorbench --layouts mediumClassic --plies 8 --repeat 5
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from pacai.util.logs import initLogging
+
+DEFAULT_LAYOUTS = 'smallClassic,mediumClassic'
+DEFAULT_PLIES = 8
+
+def walkGenerate(state, plies, agentIndex = 0):
+    """
+    Walk the game tree with generateSuccessor().
+    Returns the number of successors generated.
+    """
+
+    if (plies == 0 or state.isOver()):
+        return 0
+
+    nextAgent = (agentIndex + 1) % state.getNumAgents()
+
+    count = 0
+    for action in state.getLegalActions(agentIndex):
+        successor = state.generateSuccessor(agentIndex, action)
+        count += 1 + walkGenerate(successor, plies - 1, nextAgent)
+
+    return count
+
+def walkMakeUnmake(state, plies, agentIndex = 0):
+    """
+    Walk the game tree with makeMove() and unmakeMove().
+    Returns the number of successors made.
+    """
+
+    if (plies == 0 or state.isOver()):
+        return 0
+
+    nextAgent = (agentIndex + 1) % state.getNumAgents()
+
+    count = 0
+    for action in state.getLegalActions(agentIndex):
+        state.makeMove(agentIndex, action)
+        count += 1 + walkMakeUnmake(state, plies - 1, nextAgent)
+        state.unmakeMove()
+
+    return count
+
+def benchmark(walk, layout, plies, repeat = 1):
+    """
+    Run a tree walk from the start of the layout `repeat` times.
+    Returns a tuple: (successors per walk, total seconds).
+    """
+
+    count = 0
+    totalTime = 0.0
+
+    for i in range(repeat):
+        state = PacmanGameState(layout)
+
+        startTime = time.time()
+        count = walk(state, plies)
+        totalTime += time.time() - startTime
+
+    return count, totalTime
+
+def main(argv):
+    """
+    Entry point for the successor benchmark.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+
+    parser = argparse.ArgumentParser(description = __doc__, prog = 'successorbench',
+            formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('-l', '--layouts', dest = 'layouts',
+            action = 'store', type = str, default = DEFAULT_LAYOUTS,
+            help = 'comma separated layouts to start from (default: %(default)s)')
+
+    parser.add_argument('-p', '--plies', dest = 'plies',
+            action = 'store', type = int, default = DEFAULT_PLIES,
+            help = 'number of plies (single agent moves) to walk (default: %(default)s)')
+
+    parser.add_argument('-r', '--repeat', dest = 'repeat',
+            action = 'store', type = int, default = 3,
+            help = 'number of times to walk each tree (default: %(default)s)')
+
+    options = parser.parse_args(argv)
+
+    walks = [
+        ('generateSuccessor', walkGenerate),
+        ('makeMove/unmakeMove', walkMakeUnmake),
+    ]
+
+    for layoutName in options.layouts.split(','):
+        layout = getLayout(layoutName)
+        if (layout is None):
+            raise ValueError('The layout ' + layoutName + ' cannot be found.')
+
+        for (name, walk) in walks:
+            count, seconds = benchmark(walk, layout, options.plies, options.repeat)
+
+            rate = (count * options.repeat) / max(seconds, 1e-9)
+            logging.info('%-14s %-20s successors: %8d, %10.0f successors/sec' %
+                    (layoutName, name, count, rate))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
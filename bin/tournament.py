@@ -0,0 +1,316 @@
+"""
+A round-robin tournament between capture teams.
+
+Every pair of teams plays on every layout, once with each team as red,
+(`--games-per-pairing` times over), with the games spread over a pool of worker processes.
+Each finished game is appended to a checkpoint file (JSON lines),
+so an interrupted tournament picks up where it left off when run again with the same checkpoint.
+Every game has its own seed (derived from `--seed` and the game itself),
+so a resumed tournament plays exactly the games the full run would have.
+
+At the end, Elo ratings and a win matrix (how many times each team beat each other team)
+are logged (and written to `--summary` as JSON, if given).
+
+EXAMPLES:
+    python -m pacai.bin.tournament \\
+        --teams pacai.core.baselineTeam,pacai.student.myTeam \\
+        --layouts defaultCapture,RANDOM13 --num-workers 8 --checkpoint tournament.jsonl
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from pacai.bin.capture import CaptureRules
+from pacai.bin.capture import loadCaptureLayout
+from pacai.ui.capture.null import CaptureNullView
+from pacai.util import reflection
+from pacai.util.logs import initLogging
+
+DEFAULT_CHECKPOINT = 'tournament.jsonl'
+DEFAULT_LAYOUTS = 'defaultCapture'
+
+INITIAL_RATING = 1500
+ELO_K_FACTOR = 32
+
+# Teams (createTeam functions) and layouts already loaded by this process, by name.
+_teamFactories = {}
+_layouts = {}
+
+# The settings for the games played in this process (set by _initWorker).
+_workerConfig = None
+
+def scheduleGames(teams, layouts, gamesPerPairing):
+    """
+    Get every game in the tournament as a dict with the layout, red team, blue team, and round.
+    """
+
+    games = []
+    for (layout, (team1, team2), gameRound) in itertools.product(layouts,
+            itertools.combinations(teams, 2), range(gamesPerPairing)):
+        for (red, blue) in [(team1, team2), (team2, team1)]:
+            games.append({
+                'layout': layout,
+                'red': red,
+                'blue': blue,
+                'round': gameRound,
+            })
+
+    return games
+
+def getGameId(game):
+    return '%s|%s|%s|%d' % (game['layout'], game['red'], game['blue'], game['round'])
+
+def getGameSeed(seed, gameId):
+    """
+    A seed for a single game that does not depend on the order games are played in.
+    """
+
+    digest = hashlib.sha1(('%d|%s' % (seed, gameId)).encode()).digest()
+    return int.from_bytes(digest[:4], 'little')
+
+def loadCheckpoint(path):
+    """
+    Get the results already in a checkpoint file, keyed by game id.
+    A partially written last line (from an interrupted run) is ignored.
+    """
+
+    results = {}
+    if (not os.path.isfile(path)):
+        return results
+
+    with open(path, 'rb') as file:
+        for line in file:
+            try:
+                result = json.loads(line.decode('utf-8'))
+            except ValueError:
+                logging.warning('Skipping a broken line in the checkpoint "%s".' % (path))
+                continue
+
+            results[result['id']] = result
+
+    return results
+
+def computeRatings(teams, results):
+    """
+    Compute Elo ratings by replaying the results in game id order
+    (so the ratings do not depend on the order the games finished in).
+    """
+
+    ratings = {team: INITIAL_RATING for team in teams}
+
+    for result in sorted(results, key = lambda result: result['id']):
+        red = result['red']
+        blue = result['blue']
+
+        expectedRed = 1.0 / (1.0 + 10 ** ((ratings[blue] - ratings[red]) / 400.0))
+        actualRed = {'red': 1.0, 'tie': 0.5, 'blue': 0.0}[result['winner']]
+
+        ratings[red] += ELO_K_FACTOR * (actualRed - expectedRed)
+        ratings[blue] -= ELO_K_FACTOR * (actualRed - expectedRed)
+
+    return ratings
+
+def computeWinMatrix(teams, results):
+    """
+    Get a dict of dicts, where `matrix[a][b]` is the number of games team a won against team b.
+    """
+
+    matrix = {team: {opponent: 0 for opponent in teams} for team in teams}
+
+    for result in results:
+        if (result['winner'] == 'red'):
+            matrix[result['red']][result['blue']] += 1
+        elif (result['winner'] == 'blue'):
+            matrix[result['blue']][result['red']] += 1
+
+    return matrix
+
+def runTournament(teams, layouts, checkpoint, gamesPerPairing = 1, numWorkers = 1,
+        seed = 0, length = 1200):
+    """
+    Play every game in the tournament that is not already in the checkpoint.
+    Returns the (ratings, win matrix).
+    """
+
+    games = scheduleGames(teams, layouts, gamesPerPairing)
+    gameIds = set([getGameId(game) for game in games])
+
+    results = loadCheckpoint(checkpoint)
+    tasks = []
+    for game in games:
+        gameId = getGameId(game)
+        if (gameId in results):
+            continue
+
+        game['id'] = gameId
+        game['seed'] = getGameSeed(seed, gameId)
+        tasks.append(game)
+
+    logging.info('Tournament: %d games, %d already played.' %
+            (len(games), len(games) - len(tasks)))
+
+    config = {'length': length}
+
+    pool = None
+    if (numWorkers > 1):
+        pool = multiprocessing.Pool(numWorkers, initializer = _initWorker, initargs = (config,))
+        playedGames = pool.imap_unordered(_playGame, tasks)
+    else:
+        _initWorker(config)
+        playedGames = map(_playGame, tasks)
+
+    try:
+        with open(checkpoint, 'ab+') as file:
+            # Start on a fresh line if the last run was cut off part way through writing one.
+            file.seek(0, os.SEEK_END)
+            if (file.tell() > 0):
+                file.seek(-1, os.SEEK_END)
+                if (file.read(1) != b'\n'):
+                    file.write(b'\n')
+
+            for result in playedGames:
+                file.write((json.dumps(result) + '\n').encode('utf-8'))
+                file.flush()
+
+                results[result['id']] = result
+                logging.info('%s vs %s on %s: %s (%d).' % (result['red'], result['blue'],
+                        result['layout'], result['winner'], result['score']))
+    except BaseException:
+        # Don't wait for the games that are still running.
+        if (pool is not None):
+            pool.terminate()
+            pool.join()
+
+        raise
+
+    if (pool is not None):
+        pool.close()
+        pool.join()
+
+    # The checkpoint may hold games from a different schedule, only count this one.
+    results = [result for result in results.values() if result['id'] in gameIds]
+
+    return computeRatings(teams, results), computeWinMatrix(teams, results)
+
+def _initWorker(config):
+    global _workerConfig
+    _workerConfig = config
+
+def _getTeamFactory(team):
+    if (team not in _teamFactories):
+        _teamFactories[team] = reflection.qualifiedImport(team + '.createTeam')
+
+    return _teamFactories[team]
+
+def _getLayout(name):
+    if (name not in _layouts):
+        _layouts[name] = loadCaptureLayout(name)
+
+    return _layouts[name]
+
+def _playGame(game):
+    random.seed(game['seed'])
+
+    # Agents are indexed red, blue, red, blue.
+    redAgents = _getTeamFactory(game['red'])(0, 2, True)
+    blueAgents = _getTeamFactory(game['blue'])(1, 3, False)
+    agents = [redAgents[0], blueAgents[0], redAgents[1], blueAgents[1]]
+
+    rules = CaptureRules()
+    capture = rules.newGame(_getLayout(game['layout']), agents, CaptureNullView(),
+            _workerConfig['length'], True)
+
+    startTime = time.time()
+    capture.run()
+
+    score = capture.state.getScore()
+
+    winner = 'tie'
+    if (score > 0):
+        winner = 'red'
+    elif (score < 0):
+        winner = 'blue'
+
+    result = dict(game)
+    result['score'] = score
+    result['winner'] = winner
+    result['time'] = time.time() - startTime
+
+    return result
+
+def main(argv):
+    """
+    Entry point for a tournament.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+
+    parser = argparse.ArgumentParser(description = __doc__, prog = 'tournament',
+            formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('-t', '--teams', dest = 'teams',
+            action = 'store', type = str, required = True,
+            help = 'comma separated, fully qualified, team modules (with a createTeam function)')
+
+    parser.add_argument('-l', '--layouts', dest = 'layouts',
+            action = 'store', type = str, default = DEFAULT_LAYOUTS,
+            help = 'comma separated capture layouts (or RANDOM<seed>) (default: %(default)s)')
+
+    parser.add_argument('-g', '--games-per-pairing', dest = 'gamesPerPairing',
+            action = 'store', type = int, default = 1,
+            help = 'games per pairing, colour, and layout (default: %(default)s)')
+
+    parser.add_argument('-w', '--num-workers', dest = 'numWorkers',
+            action = 'store', type = int, default = 1,
+            help = 'number of processes to play games on (default: %(default)s)')
+
+    parser.add_argument('-c', '--checkpoint', dest = 'checkpoint',
+            action = 'store', type = str, default = DEFAULT_CHECKPOINT,
+            help = 'results file to resume from and append to (default: %(default)s)')
+
+    parser.add_argument('-s', '--seed', dest = 'seed',
+            action = 'store', type = int, default = 0,
+            help = 'seed that every game seed is derived from (default: %(default)s)')
+
+    parser.add_argument('--max-moves', dest = 'maxMoves',
+            action = 'store', type = int, default = 1200,
+            help = 'set maximum number of moves in a game (default: %(default)s)')
+
+    parser.add_argument('--summary', dest = 'summary',
+            action = 'store', type = str, default = None,
+            help = 'write the ratings and win matrix to this JSON file (default: %(default)s)')
+
+    options = parser.parse_args(argv)
+
+    teams = options.teams.split(',')
+    if (len(set(teams)) != len(teams) or len(teams) < 2):
+        raise ValueError('A tournament needs at least two different teams.')
+
+    ratings, matrix = runTournament(teams, options.layouts.split(','), options.checkpoint,
+            gamesPerPairing = options.gamesPerPairing, numWorkers = options.numWorkers,
+            seed = options.seed, length = options.maxMoves)
+
+    logging.info('Ratings:')
+    for team in sorted(teams, key = lambda team: -ratings[team]):
+        logging.info('    %7.1f  %s' % (ratings[team], team))
+
+    logging.info('Wins (row beat column):')
+    for (i, team) in enumerate(teams):
+        wins = ' '.join(['%4d' % (matrix[team][opponent]) for opponent in teams])
+        logging.info('    %2d: %s  %s' % (i, wins, team))
+
+    if (options.summary is not None):
+        with open(options.summary, 'w') as file:
+            json.dump({'ratings': ratings, 'wins': matrix}, file, indent = 4)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
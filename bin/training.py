@@ -0,0 +1,248 @@
+"""
+Distributed (actor/learner) training for pacman reinforcement agents.
+
+The training episodes are split into rounds of `syncInterval` episodes.
+At the start of each round, the learner (the pacman agent of the main process)
+sends a copy of its weights (see `getWeights`/`setWeights` on the agent) to every actor process.
+Actors play their share of the round's episodes with that copy,
+but instead of learning they only record each transition
+(see `pacai.agents.learning.reinforcement.ReinforcementAgent.encodeTransition`),
+and stream every finished episode back to the learner over a queue.
+The learner then applies the updates of each episode
+(see `pacai.agents.learning.reinforcement.ReinforcementAgent.updateEncoded`).
+
+Every episode gets its own seed (derived from the training seed),
+all the episodes of a round are played with the same weights,
+and the learner always applies episodes in order (whichever actor finishes first).
+So training gives the same weights for a seed no matter how many actors there are
+(though not the same weights as sequential training, where every episode sees the updates
+of the episode before it).
+Throughput scales with the number of actors up to `syncInterval`.
+
+Actors only record transitions, so agents with experience replay (a `replayCapacity`)
+cannot be trained this way.
+
+With a checkpoint file, the weights (and the number of episodes trained on)
+are saved after every round, and training resumes from the checkpoint if it already exists.
+"""
+
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import random
+import traceback
+
+from pacai.agents.base import BaseAgent
+from pacai.agents.learning.reinforcement import ReinforcementAgent
+from pacai.ui.pacman.null import PacmanNullView
+
+DEFAULT_SYNC_INTERVAL = 16  # Training episodes between weight syncs.
+TRAINING_LOG_INTERVAL = 100  # Training episodes between progress messages.
+RESULT_POLL_INTERVAL = 1.0  # Seconds between checks that the actors are still alive.
+
+CHECKPOINT_VERSION = 1
+
+def runTraining(layout, pacman, pacmanName, pacmanArgs, ghostName, numGhosts, numTraining,
+        seed, numWorkers = 1, syncInterval = DEFAULT_SYNC_INTERVAL, checkpoint = None,
+        catchExceptions = False, timeout = 30, **kwargs):
+    """
+    Train the pacman agent (the learner) on `numTraining` episodes
+    played by `numWorkers` actor processes.
+    """
+
+    if (not isinstance(pacman, ReinforcementAgent) or not hasattr(pacman, 'getWeights')):
+        raise ValueError('Distributed training needs a reinforcement agent'
+                + ' with getWeights() and setWeights().')
+
+    if (pacman.replay is not None):
+        raise ValueError('Distributed training does not support experience replay'
+                + ' (replayCapacity).')
+
+    syncInterval = max(1, syncInterval)
+
+    seedGenerator = random.Random(seed)
+    episodeSeeds = [seedGenerator.getrandbits(32) for i in range(numTraining)]
+
+    firstEpisode = 0
+    if (checkpoint is not None and os.path.isfile(checkpoint)):
+        firstEpisode = loadCheckpoint(checkpoint, pacman)
+        logging.info('Resuming training after %d episodes from %s.' % (firstEpisode, checkpoint))
+
+    config = {
+        'layout': layout,
+        'pacmanName': pacmanName,
+        'pacmanArgs': pacmanArgs,
+        'ghostName': ghostName,
+        'numGhosts': numGhosts,
+        'catchExceptions': catchExceptions,
+        'timeout': timeout,
+    }
+
+    resultQueue = multiprocessing.Queue()
+    actors = []
+
+    for i in range(max(1, numWorkers)):
+        taskQueue = multiprocessing.Queue()
+        process = multiprocessing.Process(target = _runActor,
+                args = (config, taskQueue, resultQueue), daemon = True)
+        process.start()
+
+        actors.append((process, taskQueue))
+
+    try:
+        for roundStart in range(firstEpisode, numTraining, syncInterval):
+            episodes = list(range(roundStart, min(roundStart + syncInterval, numTraining)))
+
+            # The weights are pickled here (once), so the learner can't change them while sending.
+            weightsData = pickle.dumps(pacman.getWeights(), pickle.HIGHEST_PROTOCOL)
+
+            for (i, (process, taskQueue)) in enumerate(actors):
+                actorEpisodes = [(episode, episodeSeeds[episode])
+                        for episode in episodes[i::len(actors)]]
+
+                if (len(actorEpisodes) > 0):
+                    taskQueue.put((weightsData, pacman.getEpsilon(), numTraining, actorEpisodes))
+
+            # Results come in whenever an actor finishes, but are learned from in order.
+            results = {}
+            for episode in episodes:
+                while (episode not in results):
+                    result = _getResult(resultQueue, actors)
+                    if (result[0] is None):
+                        raise RuntimeError('A training actor failed:\n' + result[1])
+
+                    results[result[0]] = result
+
+                _learnEpisode(pacman, results.pop(episode))
+
+                if ((episode + 1) % TRAINING_LOG_INTERVAL == 0):
+                    logging.info('Trained on %d/%d episodes.' % (episode + 1, numTraining))
+
+            if (checkpoint is not None):
+                saveCheckpoint(checkpoint, pacman, episodes[-1] + 1)
+    finally:
+        for (process, taskQueue) in actors:
+            taskQueue.put(None)
+
+        for (process, taskQueue) in actors:
+            process.join(1)
+            if (process.is_alive()):
+                process.terminate()
+
+    # Take off the training wheels (like `ReinforcementAgent.stopEpisode` does after training),
+    # even if the checkpoint was already done training.
+    pacman.episodesSoFar = max(pacman.episodesSoFar, numTraining)
+    pacman.setEpsilon(0.0)
+    pacman.setLearningRate(0.0)
+
+def saveCheckpoint(path, agent, numEpisodes):
+    """
+    Save the agent's weights (and how many episodes they were trained on).
+    The file is replaced atomically, so an interrupted save never loses the last checkpoint.
+    """
+
+    data = {
+        'version': CHECKPOINT_VERSION,
+        'episodes': numEpisodes,
+        'weights': agent.getWeights(),
+    }
+
+    tempPath = path + '.tmp'
+    with open(tempPath, 'wb') as file:
+        pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
+
+    os.replace(tempPath, path)
+
+def loadCheckpoint(path, agent):
+    """
+    Load the weights of a checkpoint into the agent.
+    Returns the number of episodes the weights were trained on.
+    """
+
+    with open(path, 'rb') as file:
+        data = pickle.load(file)
+
+    if (not isinstance(data, dict) or data.get('version') != CHECKPOINT_VERSION):
+        raise ValueError('Not a training checkpoint (or one from another version): %s.' % (path))
+
+    agent.setWeights(data['weights'])
+    agent.episodesSoFar = data['episodes']
+
+    return data['episodes']
+
+def _getResult(resultQueue, actors):
+    """
+    Wait for the next result from any of the actors.
+    Raises a RuntimeError if an actor died without sending back an error.
+    """
+
+    while (True):
+        # An actor that was already dead has sent everything it ever will before this wait.
+        deadActors = [process for (process, taskQueue) in actors if (not process.is_alive())]
+
+        try:
+            return resultQueue.get(timeout = RESULT_POLL_INTERVAL)
+        except queue.Empty:
+            pass
+
+        if (len(deadActors) > 0):
+            raise RuntimeError('A training actor died (exit code: %s).'
+                    % (deadActors[0].exitcode))
+
+def _learnEpisode(agent, result):
+    episode, episodeRewards, transitions = result
+
+    agent.startEpisode()
+
+    for encoded in transitions:
+        agent.updateEncoded(encoded)
+
+    agent.episodeRewards = episodeRewards
+    agent.stopEpisode()
+
+def _runActor(config, taskQueue, resultQueue):
+    """
+    Play training episodes (as they are handed out) and send back their transitions.
+    """
+
+    # Local import to avoid a circular import (pacman uses this module).
+    from pacai.bin.pacman import ClassicGameRules
+    from pacai.bin.pacman import PACMAN_AGENT_INDEX
+
+    # The learner reports on training, an actor's agent only sees its share of the episodes.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        pacman = BaseAgent.loadAgent(config['pacmanName'], PACMAN_AGENT_INDEX,
+                dict(config['pacmanArgs']))
+        ghosts = [BaseAgent.loadAgent(config['ghostName'], i + 1)
+                for i in range(config['numGhosts'])]
+
+        rules = ClassicGameRules(config['timeout'])
+
+        while (True):
+            task = taskQueue.get()
+            if (task is None):
+                return
+
+            weightsData, epsilon, numTraining, episodes = task
+            pacman.setWeights(pickle.loads(weightsData))
+
+            for (episode, seed) in episodes:
+                random.seed(seed)
+
+                pacman.numTraining = numTraining
+                pacman.episodesSoFar = episode
+                pacman.setEpsilon(epsilon)
+                pacman.experience = []
+
+                game = rules.newGame(config['layout'], pacman, ghosts, PacmanNullView(),
+                        config['catchExceptions'])
+                game.run()
+
+                resultQueue.put((episode, pacman.episodeRewards, pacman.experience))
+                pacman.experience = None
+    except Exception:
+        resultQueue.put((None, traceback.format_exc(), None))
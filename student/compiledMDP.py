@@ -0,0 +1,165 @@
+"""
+A `pacai.core.mdp.MarkovDecisionProcess` compiled into flat NumPy arrays,
+so that Bellman backups over every state can be done as a few vectorized operations.
+
+Every legal (state, action) pair of the MDP gets a "row".
+The rows of a state are contiguous and in the order given by `getPossibleActions`
+(`stateRows[i]` to `stateRows[i + 1]` are the rows of state i, like a CSR sparse matrix),
+and every possible transition of a row is stored as (row, next state, probability, reward).
+The transitions of a row are contiguous too
+(`rowTransitions[j]` to `rowTransitions[j + 1]` are the transitions of row j).
+"""
+
+import numpy
+
+class CompiledMDP(object):
+    """
+    The states, actions, transitions, and rewards of an MDP as arrays.
+    The MDP is only walked once (when compiling).
+    """
+
+    def __init__(self, mdp):
+        self.states = list(mdp.getStates())
+        self.stateIndexes = {state: index for (index, state) in enumerate(self.states)}
+
+        # The action of each row.
+        self.rowActions = []
+
+        stateRows = [0]
+        rowStates = []
+
+        transitionRows = []
+        transitionStates = []
+        transitionProbs = []
+        transitionRewards = []
+
+        for (index, state) in enumerate(self.states):
+            for action in mdp.getPossibleActions(state):
+                row = len(self.rowActions)
+                self.rowActions.append(action)
+                rowStates.append(index)
+
+                for (nextState, prob) in mdp.getTransitionStatesAndProbs(state, action):
+                    transitionRows.append(row)
+                    transitionStates.append(self.stateIndexes[nextState])
+                    transitionProbs.append(prob)
+                    transitionRewards.append(mdp.getReward(state, action, nextState))
+
+            stateRows.append(len(self.rowActions))
+
+        self.numStates = len(self.states)
+        self.numRows = len(self.rowActions)
+
+        self.stateRows = numpy.array(stateRows, dtype = int)
+        self.rowStates = numpy.array(rowStates, dtype = int)
+
+        self.transitionRows = numpy.array(transitionRows, dtype = int)
+        self.transitionStates = numpy.array(transitionStates, dtype = int)
+        self.transitionProbs = numpy.array(transitionProbs, dtype = float)
+        self.transitionRewards = numpy.array(transitionRewards, dtype = float)
+
+        # The transitions are added row by row, so they are already grouped by row.
+        self.rowTransitions = numpy.zeros(self.numRows + 1, dtype = int)
+        numpy.cumsum(numpy.bincount(self.transitionRows, minlength = self.numRows),
+                out = self.rowTransitions[1:])
+
+        # The running total of the transition probabilities (for sampling).
+        self._cumulativeProbs = numpy.zeros(len(self.transitionProbs) + 1)
+        numpy.cumsum(self.transitionProbs, out = self._cumulativeProbs[1:])
+
+        # The expected immediate reward of each row.
+        self.rowRewards = numpy.bincount(self.transitionRows,
+                weights = self.transitionProbs * self.transitionRewards, minlength = self.numRows)
+
+        # The states with at least one action, and where their rows start.
+        self._activeStates = numpy.flatnonzero(self.stateRows[1:] > self.stateRows[:-1])
+        self._activeStarts = self.stateRows[self._activeStates]
+        self.numActiveStates = len(self._activeStates)
+
+    def getQValues(self, values, discountRate):
+        """
+        Get the q-value of every row given the value of every state.
+        """
+
+        futureValues = numpy.bincount(self.transitionRows,
+                weights = self.transitionProbs * values[self.transitionStates],
+                minlength = self.numRows)
+
+        return self.rowRewards + discountRate * futureValues
+
+    def getStateValues(self, qValues):
+        """
+        Get the value of every state (the best q-value of its rows) given the q-value of every row.
+        States without any actions have a value of zero.
+        """
+
+        values = numpy.zeros(self.numStates)
+        if (self.numRows > 0):
+            values[self._activeStates] = numpy.maximum.reduceat(qValues, self._activeStarts)
+
+        return values
+
+    def getBestRows(self, qValues):
+        """
+        Get the best row of every state (the first one on ties), -1 for states without actions.
+        """
+
+        bestRows = numpy.full(self.numStates, -1, dtype = int)
+        if (self.numRows == 0):
+            return bestRows
+
+        # Mark every row that reaches its state's value, and take the first marked row per state.
+        isBest = (qValues == self.getStateValues(qValues)[self.rowStates])
+        candidates = numpy.where(isBest, numpy.arange(self.numRows), self.numRows)
+        bestRows[self._activeStates] = numpy.minimum.reduceat(candidates, self._activeStarts)
+
+        return bestRows
+
+    def sampleTransitions(self, rows, samples):
+        """
+        Sample a transition of each of the rows, given a uniform sample in [0, 1) for each.
+        Returns the index of each of the sampled transitions.
+        """
+
+        starts = self.rowTransitions[rows]
+        ends = self.rowTransitions[rows + 1]
+
+        # Take the first transition of the row whose cumulative probability passes the sample.
+        lowProbs = self._cumulativeProbs[starts]
+        targets = lowProbs + samples * (self._cumulativeProbs[ends] - lowProbs)
+        transitions = numpy.searchsorted(self._cumulativeProbs[1:], targets, side = 'right')
+
+        return numpy.clip(transitions, starts, ends - 1)
+
+    def getRow(self, state, action):
+        """
+        Get the row of a (state, action) pair, None if the action is not legal in the state.
+        """
+
+        index = self.stateIndexes[state]
+        for row in range(self.stateRows[index], self.stateRows[index + 1]):
+            if (self.rowActions[row] == action):
+                return row
+
+        return None
+
+    def valueIteration(self, discountRate, iters, tolerance = 0.0, values = None):
+        """
+        Run (synchronous) value iteration for at most `iters` sweeps,
+        stopping early once no state value changes by more than `tolerance`.
+        Returns a tuple: (state values, number of sweeps run, largest change in the last sweep).
+        """
+
+        if (values is None):
+            values = numpy.zeros(self.numStates)
+
+        change = 0.0
+        for i in range(iters):
+            newValues = self.getStateValues(self.getQValues(values, discountRate))
+            change = float(numpy.max(numpy.abs(newValues - values), initial = 0.0))
+            values = newValues
+
+            if (change <= tolerance):
+                return values, i + 1, change
+
+        return values, iters, change
@@ -0,0 +1,206 @@
+"""
+Cached summaries of a state's food and ghosts, for evaluation functions.
+
+Most of the leaves in a game tree search differ from their parent (and siblings) by a single move,
+and only pacman's moves can change the food.
+So instead of rescanning the food grid at every leaf,
+the food and capsules are summarized once per distinct set of food
+(keyed by `pacai.bin.pacman.PacmanGameState.getFoodZobristHash`),
+and the distance from a position to the nearest food or capsule is remembered per summary.
+A leaf then costs a couple of dictionary lookups plus one distance per ghost.
+
+When pacman eats, the summary of the food that is left is made from the summary before
+(if it is still cached), so the nearest distances are updated instead of rescanned:
+only the positions whose nearest food (or capsule) was the one just eaten are looked up again.
+
+Distances are manhattan distances, unless the cache is created with `useMazeDistances`
+(then they come from the layout's `pacai.student.mazeDistances.MazeDistances` table,
+which is computed if it is not already cached).
+So the distances only ever depend on how the cache was created.
+"""
+
+from pacai.core.distance import manhattan
+from pacai.student import mazeDistances
+from pacai.util.util import nearestPoint
+
+# The default number of food summaries kept before the oldest are dropped.
+DEFAULT_MAX_SUMMARIES = 10000
+
+# The distance reported when there is no food (or capsule) left.
+NO_TARGET_DISTANCE = 10000
+
+class FoodSummary(object):
+    """
+    The food and capsules of a state, with the nearest distances from positions already asked for.
+    A summary can start from the summary of the state before a food or capsule was eaten
+    (`parent`), keeping every nearest distance that did not go to what was eaten.
+    """
+
+    def __init__(self, gameState, distanceFunction, parent = None,
+            eatenFood = None, eatenCapsule = None):
+        self._food = gameState.getFood().asList()
+        self._capsules = list(gameState.getCapsules())
+        self._distanceFunction = distanceFunction
+
+        # {position: (distance, nearest target)} for the positions already asked for.
+        self._nearestFood = {}
+        self._nearestCapsule = {}
+
+        if (parent is not None):
+            self._nearestFood = _withoutTarget(parent._nearestFood, eatenFood)
+            self._nearestCapsule = _withoutTarget(parent._nearestCapsule, eatenCapsule)
+
+    def getNumFood(self):
+        return len(self._food)
+
+    def getFoodPositions(self):
+        return self._food
+
+    def getCapsulePositions(self):
+        return self._capsules
+
+    def getNearestFoodDistance(self, position):
+        """
+        Get the distance to the closest food (or `NO_TARGET_DISTANCE` if there is none).
+        """
+
+        if (position not in self._nearestFood):
+            self._nearestFood[position] = self._nearest(position, self._food)
+
+        return self._nearestFood[position][0]
+
+    def getNearestCapsuleDistance(self, position):
+        """
+        Get the distance to the closest capsule (or `NO_TARGET_DISTANCE` if there is none).
+        """
+
+        if (position not in self._nearestCapsule):
+            self._nearestCapsule[position] = self._nearest(position, self._capsules)
+
+        return self._nearestCapsule[position][0]
+
+    def _nearest(self, position, targets):
+        """
+        Get the (distance, target) of the closest target, (`NO_TARGET_DISTANCE`, None) if none.
+        """
+
+        nearest = (NO_TARGET_DISTANCE, None)
+        for target in targets:
+            dist = self._distanceFunction(position, target)
+            if (dist < nearest[0]):
+                nearest = (dist, target)
+
+        return nearest
+
+class EvaluationCache(object):
+    """
+    Food summaries and distance lookups shared by all the states of a layout.
+    Changing layouts (walls) starts the cache over.
+    """
+
+    def __init__(self, maxSummaries = DEFAULT_MAX_SUMMARIES, useMazeDistances = False):
+        self._maxSummaries = maxSummaries
+        self._useMazeDistances = useMazeDistances
+        self._summaries = {}
+
+        self._walls = None
+        self._distancer = None
+
+    def hasMazeDistances(self, gameState):
+        self._checkLayout(gameState)
+        return self._distancer is not None
+
+    def getDistance(self, gameState, pos1, pos2):
+        """
+        Get the maze distance between two positions when using maze distances,
+        the manhattan distance otherwise.
+        """
+
+        self._checkLayout(gameState)
+
+        if (self._distancer is None):
+            return manhattan(pos1, pos2)
+
+        return self._distancer.getDistance(pos1, pos2)
+
+    def getFoodSummary(self, gameState):
+        self._checkLayout(gameState)
+
+        distanceFunction = manhattan
+        if (self._distancer is not None):
+            distanceFunction = self._distancer.getDistance
+
+        # States without a food hash (e.g. capture states) just don't share summaries.
+        if (not hasattr(gameState, 'getFoodZobristHash')):
+            return FoodSummary(gameState, distanceFunction)
+
+        key = gameState.getFoodZobristHash()
+        summary = self._summaries.get(key)
+
+        if (summary is None):
+            parent, eatenFood, eatenCapsule = self._findParent(gameState, key)
+
+            if (len(self._summaries) >= self._maxSummaries):
+                del self._summaries[next(iter(self._summaries))]
+
+            summary = FoodSummary(gameState, distanceFunction, parent, eatenFood, eatenCapsule)
+            self._summaries[key] = summary
+
+        return summary
+
+    def getAverageGhostDistance(self, gameState, position):
+        """
+        Get the average distance from a position to the ghosts.
+        """
+
+        totalDistance = 0
+        for ghostPosition in gameState.getGhostPositions():
+            totalDistance += self.getDistance(gameState, position, ghostPosition)
+
+        return totalDistance / (gameState.getNumAgents() - 1)
+
+    def _findParent(self, gameState, key):
+        """
+        Find the cached summary of the food before pacman ate what is under it (if anything).
+        Returns a tuple: (summary, eaten food, eaten capsule), all None if there is no such summary.
+        """
+
+        position = nearestPoint(gameState.getPacmanPosition())
+
+        # Only what is gone from under pacman can have just been eaten.
+        candidates = []
+        if (not gameState.hasFood(position[0], position[1])):
+            candidates.append((position, None))
+
+        if (not gameState.hasCapsule(position[0], position[1])):
+            candidates.append((None, position))
+
+        for (eatenFood, eatenCapsule) in candidates:
+            parentKey = key ^ gameState.getFoodZobristDelta(eatenFood, eatenCapsule)
+
+            parent = self._summaries.get(parentKey)
+            if (parent is not None):
+                return parent, eatenFood, eatenCapsule
+
+        return None, None, None
+
+    def _checkLayout(self, gameState):
+        walls = gameState.getWalls()
+        if (walls is self._walls):
+            return
+
+        self._walls = walls
+        self._summaries.clear()
+
+        if (self._useMazeDistances):
+            self._distancer = mazeDistances.getMazeDistances(walls)
+
+def _withoutTarget(nearest, target):
+    """
+    Copy nearest (distance, target) entries, leaving out the ones that go to the given target.
+    """
+
+    if (target is None):
+        return dict(nearest)
+
+    return {position: entry for (position, entry) in nearest.items() if (entry[1] != target)}
@@ -0,0 +1,325 @@
+"""
+A precomputed table of the maze distance between every pair of open cells in a layout.
+
+Every open (non-wall) cell of the layout gets a dense integer id,
+and the distances are kept in a flat N x N matrix of unsigned 16-bit integers
+(`distances[id1 * N + id2]`), so a distance query is just two dictionary lookups and an index.
+Cells that cannot reach each other are stored as `UNREACHABLE`,
+but the distance between them is always given out as `math.inf`.
+
+Computing the table is O(N^2), so each table is written once to a cache file
+(keyed by a hash of the layout's walls) and memory-mapped on later loads.
+The cache lives in a directory private to the current user (see `DEFAULT_CACHE_DIR`),
+since cached tables are trusted as is.
+This means that repeated games (and repeated heuristic calls) on the same layout
+never have to recompute any distances.
+Tables are also kept per process, so `getMazeDistances` on the same walls is always cheap.
+"""
+
+import array
+import collections
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from pacai.core import distance
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+
+# A per-user cache (not the shared temp dir, where anyone could plant a table).
+DEFAULT_CACHE_DIR = os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+        'pacai', 'distances')
+
+# The distance stored for a pair of cells that cannot reach each other
+# (only in the table, queries give `math.inf` instead).
+UNREACHABLE = 0xFFFF
+
+FILE_MAGIC = b'PMDT'
+FILE_VERSION = 1
+
+# magic, version, width, height, number of cells.
+HEADER_FORMAT = '<4sHHHI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Distance tables that have already been loaded by this process, keyed by layout hash.
+_tables = {}
+
+class MazeGraph(object):
+    """
+    The open cells of a wall `pacai.core.grid.Grid` with their dense ids,
+    along with the neighbors of every cell.
+    This is cheap to build (unlike the distances), so it can be used on its own.
+    """
+
+    def __init__(self, walls):
+        # Ids are assigned in column-major order, the same order as `pacai.core.grid.Grid`.
+        self.cells = [(x, y)
+                for x in range(walls.getWidth()) for y in range(walls.getHeight())
+                if not walls[x][y]]
+        self.cellIds = {cell: id for (id, cell) in enumerate(self.cells)}
+
+        # The (neighborId, action) pairs for each cell,
+        # in the same order as `pacai.core.search.position.PositionSearchProblem.successorStates`.
+        self.neighbors = []
+        for (x, y) in self.cells:
+            cellNeighbors = []
+            for action in Directions.CARDINAL:
+                dx, dy = Actions.directionToVector(action)
+                neighborId = self.cellIds.get((int(x + dx), int(y + dy)))
+                if (neighborId is not None):
+                    cellNeighbors.append((neighborId, action))
+
+            self.neighbors.append(cellNeighbors)
+
+class MazeDistances(object):
+    """
+    All-pairs maze distances for the open cells of a wall `pacai.core.grid.Grid`.
+    Use `getMazeDistances` to get an instance that is shared and cached on disk.
+    """
+
+    def __init__(self, walls, cacheDir = DEFAULT_CACHE_DIR):
+        self._width = walls.getWidth()
+        self._height = walls.getHeight()
+
+        self._graph = MazeGraph(walls)
+        self._cells = self._graph.cells
+        self._cellIds = self._graph.cellIds
+
+        self._walls = walls
+        self._cacheDir = cacheDir
+        self._key = layoutHash(walls)
+        self._mmap = None
+        self._distances = None
+
+        if (cacheDir is not None):
+            self._distances = self._loadCache(cacheDir)
+
+        if (self._distances is None):
+            self._distances = self._computeDistances(walls)
+
+            if (cacheDir is not None):
+                self._writeCache(cacheDir)
+
+    def getCells(self):
+        """
+        Get all the open cells, ordered by id.
+        """
+
+        return self._cells
+
+    def getCellId(self, position):
+        """
+        Get the id of an open (integer) position, or None if the position is a wall.
+        """
+
+        return self._cellIds.get(position)
+
+    def getNumCells(self):
+        return len(self._cells)
+
+    def getGraph(self):
+        """
+        Get the `MazeGraph` (cells and neighbors) that the distances were computed on.
+        """
+
+        return self._graph
+
+    def getDistanceById(self, id1, id2):
+        """
+        Get the maze distance between two cells by id (`math.inf` if they can not reach each other).
+        """
+
+        dist = self._distances[id1 * len(self._cells) + id2]
+        if (dist == UNREACHABLE):
+            return math.inf
+
+        return dist
+
+    def getDistanceOnGrid(self, pos1, pos2):
+        """
+        Get the maze distance between two open grid positions
+        (`math.inf` if they can not reach each other).
+        """
+
+        dist = self._distances[self._cellIds[pos1] * len(self._cells) + self._cellIds[pos2]]
+        if (dist == UNREACHABLE):
+            return math.inf
+
+        return dist
+
+    def getDistance(self, pos1, pos2):
+        """
+        Get the maze distance between two positions (`math.inf` if they can not reach each other).
+        Positions that are between grid points (e.g. a moving capture agent)
+        are measured from their closest grid points.
+        Positions that are not in the table fall back to manhattan distance.
+        """
+
+        id1 = self._cellIds.get(pos1)
+        id2 = self._cellIds.get(pos2)
+        if (id1 is not None and id2 is not None):
+            dist = self._distances[id1 * len(self._cells) + id2]
+            if (dist == UNREACHABLE):
+                return math.inf
+
+            return dist
+
+        bestDistance = None
+        for (snap1, snapDistance1) in self._snapToGrid(pos1):
+            for (snap2, snapDistance2) in self._snapToGrid(pos2):
+                dist = self.getDistanceOnGrid(snap1, snap2) + snapDistance1 + snapDistance2
+                if (bestDistance is None or dist < bestDistance):
+                    bestDistance = dist
+
+        if (bestDistance is None):
+            return distance.manhattan(pos1, pos2)
+
+        return bestDistance
+
+    def __reduce__(self):
+        # The table is memory-mapped, so it is shared through the cache instead of pickled.
+        return (getMazeDistances, (self._walls, self._cacheDir))
+
+    def getMazeDistances(self):
+        """
+        A no-op kept for compatibility with `pacai.core.distanceCalculator.Distancer`,
+        the table is always fully computed on construction.
+        """
+
+        pass
+
+    def _snapToGrid(self, position):
+        """
+        Get the open grid points around a (possibly fractional) position,
+        along with the distance to each of them.
+        """
+
+        x, y = position
+        snaps = []
+
+        for gridX in {int(x), int(x + 0.999)}:
+            for gridY in {int(y), int(y + 0.999)}:
+                if ((gridX, gridY) in self._cellIds):
+                    snaps.append(((gridX, gridY), abs(x - gridX) + abs(y - gridY)))
+
+        return snaps
+
+    def _computeDistances(self, walls):
+        """
+        Run a breadth first search from every open cell.
+        """
+
+        numCells = len(self._cells)
+
+        distances = array.array('H', [UNREACHABLE]) * (numCells * numCells)
+
+        for source in range(numCells):
+            offset = source * numCells
+            distances[offset + source] = 0
+
+            fringe = collections.deque([source])
+            while (fringe):
+                current = fringe.popleft()
+                nextDistance = distances[offset + current] + 1
+
+                for (neighbor, action) in self._graph.neighbors[current]:
+                    if (distances[offset + neighbor] == UNREACHABLE):
+                        distances[offset + neighbor] = nextDistance
+                        fringe.append(neighbor)
+
+        return distances
+
+    def _cachePath(self, cacheDir):
+        return os.path.join(cacheDir, self._key + '.dist')
+
+    def _loadCache(self, cacheDir):
+        """
+        Memory-map a previously written table.
+        Returns None if there is no usable cache file.
+        """
+
+        path = self._cachePath(cacheDir)
+        if (not os.path.isfile(path)):
+            return None
+
+        numCells = len(self._cells)
+        expectedHeader = struct.pack(HEADER_FORMAT, FILE_MAGIC, FILE_VERSION,
+                self._width, self._height, numCells)
+
+        try:
+            with open(path, 'rb') as file:
+                if (os.fstat(file.fileno()).st_size != HEADER_SIZE + (2 * numCells * numCells)):
+                    raise ValueError('Unexpected file size.')
+
+                if (file.read(HEADER_SIZE) != expectedHeader):
+                    raise ValueError('Unexpected file header.')
+
+                self._mmap = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        except (OSError, ValueError) as ex:
+            logging.warning('Unable to load maze distance cache "%s". -- %s' % (path, str(ex)))
+            return None
+
+        return memoryview(self._mmap)[HEADER_SIZE:].cast('H')
+
+    def _writeCache(self, cacheDir):
+        """
+        Write out the table.
+        The file is written to a temp path and then moved into place,
+        so concurrent games never see a partial table.
+        """
+
+        header = struct.pack(HEADER_FORMAT, FILE_MAGIC, FILE_VERSION,
+                self._width, self._height, len(self._cells))
+
+        try:
+            os.makedirs(cacheDir, mode = 0o700, exist_ok = True)
+
+            handle, tempPath = tempfile.mkstemp(dir = cacheDir, suffix = '.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as file:
+                    file.write(header)
+                    self._distances.tofile(file)
+
+                os.replace(tempPath, self._cachePath(cacheDir))
+            except BaseException:
+                # Don't leave the partial table behind.
+                try:
+                    os.remove(tempPath)
+                except OSError:
+                    pass
+
+                raise
+        except OSError as ex:
+            logging.warning('Unable to write maze distance cache to "%s". -- %s' %
+                    (cacheDir, str(ex)))
+
+def layoutHash(walls):
+    """
+    Get a hash (hex string) that identifies a layout by its walls.
+    """
+
+    hasher = hashlib.sha1()
+    hasher.update(struct.pack('<HH', walls.getWidth(), walls.getHeight()))
+    hasher.update(sys.byteorder.encode())
+
+    for x in range(walls.getWidth()):
+        hasher.update(bytes([int(bool(walls[x][y])) for y in range(walls.getHeight())]))
+
+    return hasher.hexdigest()
+
+def getMazeDistances(walls, cacheDir = DEFAULT_CACHE_DIR):
+    """
+    Get the (shared) `MazeDistances` for a wall grid.
+    """
+
+    key = layoutHash(walls)
+    if (key not in _tables):
+        _tables[key] = MazeDistances(walls, cacheDir = cacheDir)
+
+    return _tables[key]
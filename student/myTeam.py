@@ -2,6 +2,8 @@
 from pacai.agents.capture.capture import CaptureAgent
 # from pacai.agents.search.multiagent import MultiAgentSearchAgent
 from pacai.core.directions import Directions
+from pacai.student import mazeDistances
+from pacai.student import rootParallel
 # from pacai.core.actions import Actions
 # from pacai.util import reflection
 from pacai.util import counter
@@ -26,13 +28,33 @@ def createTeam(firstIndex, secondIndex, isRed):
 
     return [firstAgent, secondAgent]
 
-class ModifiedExpectimaxAgent(CaptureAgent):
+class MazeTableAgent(CaptureAgent):
+    """
+    A capture agent that measures maze distances with a shared, precomputed table
+    (see `pacai.student.mazeDistances`).
+    """
+
+    def createDistancer(self, gameState):
+        return mazeDistances.getMazeDistances(gameState.getInitialLayout().walls)
+
+class ModifiedExpectimaxAgent(MazeTableAgent):
     # So far the algorithm only works for TREE_DEPTH <= 2. Depth > 2 yields infinite recursion.
     TREE_DEPTH = 2
 
-    def __init__(self, index, **kwargs):
+    def __init__(self, index, numWorkers = 0, **kwargs):
         super().__init__(index, **kwargs)
 
+        # With workers, each root action is searched in parallel.
+        self._rootPool = None
+        if (int(numWorkers) > 0):
+            self._rootPool = rootParallel.RootSearchPool(self, int(numWorkers))
+
+    def final(self, gameState):
+        super().final(gameState)
+
+        if (self._rootPool is not None):
+            self._rootPool.close()
+
     # Wrapper function for findAction, it's not really necessary
     def chooseAction(self, gameState):
         return self.findAction(gameState)
@@ -41,18 +63,26 @@ class ModifiedExpectimaxAgent(CaptureAgent):
         if gameState.isWin() or gameState.isLose():
             return self.evaluate(gameState)
 
+        # filter out the STOP action to make branching factor smaller
+        actions = [action for action in gameState.getLegalActions(self.index) if action != 'Stop']
+        if (self._rootPool is not None):
+            actionValues = self._rootPool.getActionValues(gameState, actions)
+        else:
+            actionValues = [self.rootActionValue(gameState, action) for action in actions]
+
         bestAction = Directions.STOP
         score = -math.inf
-        for action in gameState.getLegalActions(self.index):
-            # filter out the STOP action to make branching factor smaller
-            if action != 'Stop':
-                nextState = self.getSuccessor(gameState, action)
-                prevscore = score
-                score = max(score, self.expectedValue(nextState, self.index + 1, self.TREE_DEPTH))
-                if score > prevscore:
-                    bestAction = action
+        for (action, actionValue) in zip(actions, actionValues):
+            prevscore = score
+            score = max(score, actionValue)
+            if score > prevscore:
+                bestAction = action
         return bestAction
 
+    def rootActionValue(self, gameState, action):
+        nextState = self.getSuccessor(gameState, action)
+        return self.expectedValue(nextState, self.index + 1, self.TREE_DEPTH)
+
     def expectedValue(self, gameState, agentIndex, depth):
         # We don't have to worry about the other teammate, so skip over him
         if agentIndex == self.index + 2:
@@ -144,7 +174,7 @@ class ModifiedExpectimaxAgent(CaptureAgent):
         return features * weights
 
 # This agent is pretty dumb at the moment, don't use it unless it can be improved/rewritten
-class OffensiveReflexAgent(CaptureAgent):
+class OffensiveReflexAgent(MazeTableAgent):
     """
     A reflex agent that seeks food.
     This agent will give you an idea of what an offensive agent might look like,
@@ -225,7 +255,7 @@ class OffensiveReflexAgent(CaptureAgent):
         else:
             return successor
 
-class DefensiveReflexAgent(CaptureAgent):
+class DefensiveReflexAgent(MazeTableAgent):
     """
     A reflex agent that tries to keep its side Pacman-free.
     This is to give you an idea of what a defensive agent could be like.
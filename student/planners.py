@@ -0,0 +1,286 @@
+"""
+Planners for `pacai.student.valueIterationAgent.ValueIterationAgent`
+that back up states one at a time (in place) instead of in synchronous sweeps:
+
+ - Gauss-Seidel value iteration sweeps over the states,
+   but each backup already sees the new values of the states backed up before it in the sweep.
+ - Prioritized sweeping always backs up the state with the largest Bellman error (from a heap),
+   and only re-checks the predecessors of a state when its value changes.
+ - Real-time dynamic programming (RTDP) runs greedy trials from the start state,
+   backing up only the states it visits
+   (and, once trials stop changing values, any state the greedy policy can reach that is still off).
+   RTDP needs optimistic initial values to find the optimal values of the states it cares about,
+   so it starts every state at an upper bound (see `PlannerModel.getValueUpperBound`)
+   instead of zero.
+   States that the greedy policy never reaches are left at that bound.
+
+Each planner returns its values along with the number of backups it performed
+and its residual (the largest change that one more backup would make to a value).
+"""
+
+import heapq
+import random
+
+PLANNER_SYNC = 'sync'
+PLANNER_GAUSS_SEIDEL = 'gaussSeidel'
+PLANNER_PRIORITIZED = 'prioritized'
+PLANNER_RTDP = 'rtdp'
+
+PLANNERS = [PLANNER_SYNC, PLANNER_GAUSS_SEIDEL, PLANNER_PRIORITIZED, PLANNER_RTDP]
+
+# The most steps an RTDP trial takes before starting over.
+DEFAULT_MAX_TRIAL_LENGTH = 1000
+
+class PlannerModel(object):
+    """
+    The transitions of an MDP by state index, along with the predecessors of every state.
+    The MDP is only walked once (when building the model).
+    """
+
+    def __init__(self, mdp):
+        self.states = list(mdp.getStates())
+        self.stateIndexes = {state: index for (index, state) in enumerate(self.states)}
+
+        # transitions[i] is a list with a list of (next state index, prob, reward) for each action.
+        self.transitions = []
+
+        # predecessors[i] is the indexes of all the states that can transition into state i.
+        self.predecessors = [set() for state in self.states]
+
+        for (index, state) in enumerate(self.states):
+            actionTransitions = []
+
+            for action in mdp.getPossibleActions(state):
+                transitions = []
+                for (nextState, prob) in mdp.getTransitionStatesAndProbs(state, action):
+                    nextIndex = self.stateIndexes[nextState]
+                    transitions.append((nextIndex, prob, mdp.getReward(state, action, nextState)))
+
+                    if (prob > 0):
+                        self.predecessors[nextIndex].add(index)
+
+                actionTransitions.append(transitions)
+
+            self.transitions.append(actionTransitions)
+
+    def getValueUpperBound(self, discountRate):
+        """
+        Get a value that no state can exceed: the largest reward forever (discounted).
+        Without discounting, there is only a bound when no reward is positive.
+        """
+
+        maxReward = 0.0
+        for actionTransitions in self.transitions:
+            for transitions in actionTransitions:
+                for (nextIndex, prob, reward) in transitions:
+                    maxReward = max(maxReward, reward)
+
+        if (maxReward == 0.0):
+            return 0.0
+
+        if (discountRate >= 1.0):
+            raise ValueError('RTDP needs a discount below one when rewards can be positive.')
+
+        return maxReward / (1.0 - discountRate)
+
+    def getQValues(self, index, values, discountRate):
+        """
+        Get the q-value of each action of a state.
+        """
+
+        qValues = []
+        for transitions in self.transitions[index]:
+            qValue = 0.0
+            for (nextIndex, prob, reward) in transitions:
+                qValue += prob * (reward + discountRate * values[nextIndex])
+
+            qValues.append(qValue)
+
+        return qValues
+
+    def backup(self, index, values, discountRate):
+        """
+        Get the backed up value of a state (zero for states without any actions).
+        """
+
+        if (len(self.transitions[index]) == 0):
+            return 0.0
+
+        return max(self.getQValues(index, values, discountRate))
+
+    def getResidual(self, values, discountRate, indexes = None):
+        """
+        Get the largest Bellman error over the given states (all states by default).
+        """
+
+        if (indexes is None):
+            indexes = range(len(self.states))
+
+        residual = 0.0
+        for index in indexes:
+            residual = max(residual, abs(self.backup(index, values, discountRate) - values[index]))
+
+        return residual
+
+    def getGreedyReachable(self, startIndex, values, discountRate):
+        """
+        Get the indexes of the states reachable from the start when acting greedily on the values.
+        """
+
+        reachable = set([startIndex])
+        stack = [startIndex]
+
+        while (len(stack) > 0):
+            index = stack.pop()
+            if (len(self.transitions[index]) == 0):
+                continue
+
+            qValues = self.getQValues(index, values, discountRate)
+            bestAction = qValues.index(max(qValues))
+
+            for (nextIndex, prob, reward) in self.transitions[index][bestAction]:
+                if (prob > 0 and nextIndex not in reachable):
+                    reachable.add(nextIndex)
+                    stack.append(nextIndex)
+
+        return reachable
+
+def gaussSeidel(model, discountRate, maxSweeps, tolerance = 0.0):
+    """
+    Run in-place value iteration for at most `maxSweeps` sweeps,
+    stopping once a sweep changes no value by more than `tolerance`.
+    Returns a tuple: (values, number of backups, residual).
+    """
+
+    values = [0.0] * len(model.states)
+    backups = 0
+
+    for i in range(maxSweeps):
+        change = 0.0
+        for index in range(len(model.states)):
+            if (len(model.transitions[index]) == 0):
+                continue
+
+            value = model.backup(index, values, discountRate)
+            change = max(change, abs(value - values[index]))
+
+            values[index] = value
+            backups += 1
+
+        if (change <= tolerance):
+            break
+
+    return values, backups, model.getResidual(values, discountRate)
+
+def prioritizedSweeping(model, discountRate, maxBackups, tolerance = 0.0):
+    """
+    Back up states in order of their Bellman error until no error is over `tolerance`
+    (or `maxBackups` backups have been done).
+    Returns a tuple: (values, number of backups, residual).
+    """
+
+    values = [0.0] * len(model.states)
+    backups = 0
+
+    # The current error of every queued state, older heap entries for a state are skipped.
+    errors = {}
+    heap = []
+
+    for index in range(len(model.states)):
+        _queueState(model, index, values, discountRate, tolerance, errors, heap)
+
+    while (len(heap) > 0 and backups < maxBackups):
+        negativeError, index = heapq.heappop(heap)
+        if (errors.get(index) != -negativeError):
+            continue
+
+        del errors[index]
+
+        values[index] = model.backup(index, values, discountRate)
+        backups += 1
+
+        for predecessor in model.predecessors[index]:
+            _queueState(model, predecessor, values, discountRate, tolerance, errors, heap)
+
+    return values, backups, model.getResidual(values, discountRate)
+
+def _queueState(model, index, values, discountRate, tolerance, errors, heap):
+    """
+    Queue a state by its Bellman error (or drop it from the queue if the error is small enough).
+    """
+
+    error = abs(model.backup(index, values, discountRate) - values[index])
+    if (error <= tolerance):
+        errors.pop(index, None)
+        return
+
+    if (errors.get(index) == error):
+        return
+
+    errors[index] = error
+    heapq.heappush(heap, (-error, index))
+
+def rtdp(model, discountRate, startIndex, maxBackups, tolerance = 0.0,
+        maxTrialLength = DEFAULT_MAX_TRIAL_LENGTH):
+    """
+    Run greedy trials from the start state, backing up each visited state,
+    until every state reachable from the start under the greedy policy
+    has a Bellman error of at most `tolerance` (or `maxBackups` backups have been done).
+    Returns a tuple: (values, number of backups, residual over the greedily reachable states).
+    """
+
+    upperBound = model.getValueUpperBound(discountRate)
+
+    values = [0.0] * len(model.states)
+    for index in range(len(model.states)):
+        if (len(model.transitions[index]) > 0):
+            values[index] = upperBound
+
+    backups = 0
+
+    while (backups < maxBackups):
+        change = 0.0
+
+        index = startIndex
+        for step in range(maxTrialLength):
+            if (len(model.transitions[index]) == 0 or backups >= maxBackups):
+                break
+
+            qValues = model.getQValues(index, values, discountRate)
+            value = max(qValues)
+
+            change = max(change, abs(value - values[index]))
+            values[index] = value
+            backups += 1
+
+            index = _sampleNextState(model.transitions[index][qValues.index(value)])
+
+        # Once a whole trial barely changes anything, check all the relevant states
+        # (backing up the ones that are still off, which trials rarely visit).
+        if (change <= tolerance):
+            reachable = model.getGreedyReachable(startIndex, values, discountRate)
+
+            change = 0.0
+            for index in reachable:
+                value = model.backup(index, values, discountRate)
+                if (abs(value - values[index]) > tolerance):
+                    change = max(change, abs(value - values[index]))
+                    values[index] = value
+                    backups += 1
+
+            if (change <= tolerance):
+                break
+
+    reachable = model.getGreedyReachable(startIndex, values, discountRate)
+    return values, backups, model.getResidual(values, discountRate, reachable)
+
+def _sampleNextState(transitions):
+    target = random.random()
+
+    total = 0.0
+    for (nextIndex, prob, reward) in transitions:
+        total += prob
+        if (target < total):
+            return nextIndex
+
+    return transitions[-1][0]
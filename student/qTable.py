@@ -0,0 +1,146 @@
+"""
+A tabular Q-function stored in a NumPy array.
+
+States are interned to dense integer ids the first time they are updated,
+and actions to column ids the first time they are seen,
+so Q(state, action) lives at `values[stateId, actionId]`.
+A lookup hashes the state once (no matter how many actions are asked about),
+and all the Q-values of a state's legal actions are read with a single slice of its row
+(or a single gather when the actions' columns are not contiguous).
+Since states rarely have more than a handful of actions,
+the max/argmax over those values is done on a list
+(NumPy reductions cost more than the whole lookup on such short rows).
+The array starts small and doubles (in either dimension) whenever it runs out of room.
+"""
+
+import random
+
+import numpy
+
+DEFAULT_CAPACITY = 1024
+
+class QTable(object):
+    """
+    Q-values for (state, action) pairs, zero for any pair that was never updated.
+    States must be hashable.
+    """
+
+    def __init__(self, capacity = DEFAULT_CAPACITY):
+        self._stateIds = {}
+        self._actionIds = {}
+
+        # The columns (a slice or an index array) for each list of legal actions already seen.
+        self._actionColumns = {}
+
+        self._values = numpy.zeros((max(1, int(capacity)), 1))
+
+    def getNumStates(self):
+        return len(self._stateIds)
+
+    def getNumActions(self):
+        return len(self._actionIds)
+
+    def getQValue(self, state, action):
+        stateId = self._stateIds.get(state)
+        actionId = self._actionIds.get(action)
+
+        if (stateId is None or actionId is None):
+            return 0.0
+
+        return float(self._values[stateId, actionId])
+
+    def getQValues(self, state, actions):
+        """
+        Get the Q-values of a state for each of the actions (as a list).
+        """
+
+        columns = self._getColumns(actions)
+
+        stateId = self._stateIds.get(state)
+        if (stateId is None):
+            return [0.0] * len(actions)
+
+        return self._values[stateId, columns].tolist()
+
+    def getValue(self, state, actions):
+        """
+        Get the best Q-value over the actions (0.0 if there are no actions).
+        """
+
+        if (len(actions) == 0):
+            return 0.0
+
+        return max(self.getQValues(state, actions))
+
+    def getPolicy(self, state, actions):
+        """
+        Get the action with the best Q-value (ties are broken randomly),
+        None if there are no actions.
+        """
+
+        if (len(actions) == 0):
+            return None
+
+        qValues = self.getQValues(state, actions)
+        bestValue = max(qValues)
+
+        return random.choice([action for (action, qValue) in zip(actions, qValues)
+                if qValue == bestValue])
+
+    def update(self, state, action, target, alpha):
+        """
+        Move Q(state, action) towards the target by the learning rate:
+        `Q(state, action) += alpha * (target - Q(state, action))`.
+        """
+
+        stateId = self._getStateId(state)
+        actionId = self._getActionId(action)
+
+        self._values[stateId, actionId] += alpha * (target - self._values[stateId, actionId])
+
+    def _getStateId(self, state):
+        stateId = self._stateIds.get(state)
+        if (stateId is not None):
+            return stateId
+
+        stateId = len(self._stateIds)
+        self._stateIds[state] = stateId
+
+        if (stateId >= self._values.shape[0]):
+            self._grow(2 * self._values.shape[0], self._values.shape[1])
+
+        return stateId
+
+    def _getActionId(self, action):
+        actionId = self._actionIds.get(action)
+        if (actionId is not None):
+            return actionId
+
+        actionId = len(self._actionIds)
+        self._actionIds[action] = actionId
+
+        if (actionId >= self._values.shape[1]):
+            self._grow(self._values.shape[0], 2 * self._values.shape[1])
+
+        return actionId
+
+    def _getColumns(self, actions):
+        key = tuple(actions)
+
+        columns = self._actionColumns.get(key)
+        if (columns is None):
+            actionIds = [self._getActionId(action) for action in actions]
+
+            if (actionIds == list(range(actionIds[0], actionIds[0] + len(actionIds)))):
+                columns = slice(actionIds[0], actionIds[0] + len(actionIds))
+            else:
+                columns = numpy.array(actionIds, dtype = int)
+
+            self._actionColumns[key] = columns
+
+        return columns
+
+    def _grow(self, numRows, numColumns):
+        values = numpy.zeros((numRows, numColumns))
+        values[:self._values.shape[0], :self._values.shape[1]] = self._values
+        self._values = values
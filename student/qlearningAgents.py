@@ -8,6 +8,10 @@ from pacai.util import probability
 import random
 # from pacai.core.featureExtractors import *
 
+# Where tabular Q-values are kept: a Counter keyed by (state, action), or a QTable.
+QTABLE_COUNTER = 'counter'
+QTABLE_ARRAY = 'array'
+
 class QLearningAgent(ReinforcementAgent):
     """
     A Q-Learning agent.
@@ -47,13 +51,44 @@ class QLearningAgent(ReinforcementAgent):
     Note that you should never call this function, it will be called on your behalf.
 
     DESCRIPTION: <Write something here so we know what you did.>
+
+    With `qTable` set to `QTABLE_ARRAY` ("array"), Q-values are kept in a
+    `pacai.student.qTable.QTable` (states interned to rows of a NumPy array)
+    instead of a Counter, and values and policies are a single vectorized max/argmax per state.
     """
 
-    def __init__(self, index, **kwargs):
+    def __init__(self, index, qTable = QTABLE_COUNTER, **kwargs):
         super().__init__(index, **kwargs)
         self.QValues = counter.Counter()
 
         # You can initialize Q-values here.
+        self._qTable = None
+        if (qTable == QTABLE_ARRAY):
+            # NumPy is only needed for array tables.
+            from pacai.student.qTable import QTable
+            self._qTable = QTable()
+        elif (qTable != QTABLE_COUNTER):
+            raise ValueError('Unknown Q-table: %s.' % (qTable))
+
+    def getWeights(self):
+        """
+        Get everything learned so far (the Q-table), e.g. to save it or copy it to another agent.
+        """
+
+        if (self._qTable is not None):
+            return self._qTable
+
+        return self.QValues
+
+    def setWeights(self, weights):
+        """
+        Replace everything learned so far with weights from `QLearningAgent.getWeights`.
+        """
+
+        if (self._qTable is not None):
+            self._qTable = weights
+        else:
+            self.QValues = weights
 
     def getQValue(self, state, action):
         """
@@ -61,6 +96,9 @@ class QLearningAgent(ReinforcementAgent):
         and `pacai.core.directions.Directions`.
         Should return 0.0 if the (state, action) pair has never been seen.
         """
+        if (self._qTable is not None):
+            return self._qTable.getQValue(state, action)
+
         if (state, action) in self.QValues:
             return self.QValues[(state, action)]
 
@@ -78,6 +116,9 @@ class QLearningAgent(ReinforcementAgent):
         which returns the actual best action.
         Whereas this method returns the value of the best action.
         """
+        if (self._qTable is not None):
+            return self._qTable.getValue(state, self.getLegalActions(state))
+
         QValues = [self.getQValue(state, action) for action in self.getLegalActions(state)]
         if len(QValues) == 0:
             return 0.0
@@ -95,18 +136,27 @@ class QLearningAgent(ReinforcementAgent):
         which returns the value of the best action.
         Whereas this method returns the best action itself.
         """
-        bestActions = [action for action in self.getLegalActions(state)
-                       if self.getQValue(state, action) == self.getValue(state)]
+        actions = self.getLegalActions(state)
+        if (self._qTable is not None):
+            return self._qTable.getPolicy(state, actions)
 
-        # FIXME: This check might not be necessary
-        if len(bestActions) == 0:
+        if len(actions) == 0:
             return None
+
+        QValues = [self.getQValue(state, action) for action in actions]
+        bestValue = max(QValues)
+        bestActions = [action for (action, QValue) in zip(actions, QValues) if QValue == bestValue]
+
         return random.choice(bestActions)
 
     def update(self, state, action, nextState, reward):
+        target = reward + self.getDiscountRate() * self.getValue(nextState)
+        if (self._qTable is not None):
+            self._qTable.update(state, action, target, self.getAlpha())
+            return
+
         # adds the error times learning rate
-        self.QValues[(state, action)] += self.getAlpha() * ((reward + self.getDiscountRate()
-                     * self.getValue(nextState)) - self.QValues[(state, action)])
+        self.QValues[(state, action)] += self.getAlpha() * (target - self.QValues[(state, action)])
 
     def getAction(self, state):
         # use the exploration probability to choose randomly
@@ -158,32 +208,107 @@ class ApproximateQAgent(PacmanQAgent):
 
     I used the formula from slide 77 in MDPs.pdf
     This helped with the update.
+
+    With `vectorized` set, the extractor must declare its features (`getFeatureNames`),
+    and Q-values and updates go through a `pacai.student.vectorFeatures.LinearQFunction`:
+    the features of all of a state's actions are one NumPy matrix (built once per state),
+    Q-values are a matrix-vector product, and an update is a single vector operation.
+    `pacai.student.vectorFeatures.VectorSimpleExtractor` builds the same features as
+    `pacai.core.featureExtractors.SimpleExtractor` directly as a matrix.
     """
 
     def __init__(self, index,
-            extractor = 'pacai.core.featureExtractors.IdentityExtractor', **kwargs):
+            extractor = 'pacai.core.featureExtractors.IdentityExtractor', vectorized = False,
+            **kwargs):
         super().__init__(index, **kwargs)
+
+        if (self._qTable is not None):
+            raise ValueError('Approximate Q-learning does not keep a Q-table.')
+
         self.featExtractor = reflection.qualifiedImport(extractor)
         self.weights = counter.Counter()
 
+        # The extractor is only built once.
+        self._extractor = self.featExtractor()
+
+        self._qFunction = None
+        if (str(vectorized).lower() in ('1', 'true')):
+            # NumPy is only needed for vectorized mode.
+            from pacai.student.vectorFeatures import LinearQFunction
+            self._qFunction = LinearQFunction(self._extractor, self.getLegalActions)
+
         # You might want to initialize weights here.
 
+    def getWeights(self):
+        """
+        Get the weights (a Counter keyed by feature).
+        """
+
+        if (self._qFunction is not None):
+            return self._qFunction.getWeights()
+
+        return self.weights
+
+    def setWeights(self, weights):
+        if (self._qFunction is not None):
+            self._qFunction.setWeights(weights)
+        else:
+            self.weights = weights
+
     # calcualtes the expected utility of being at a certain state and about to take an action
     def getQValue(self, state, action):
-        features = self.featExtractor().getFeatures(state, action)
+        if (self._qFunction is not None):
+            return self._qFunction.getQValue(state, action)
+
+        features = self._extractor.getFeatures(state, action)
         expectedUtil = 0
         for key in features.keys():
             expectedUtil += self.weights[key] * features[key]
         return expectedUtil
 
+    def getValue(self, state):
+        if (self._qFunction is not None):
+            return self._qFunction.getValue(state)
+
+        return super().getValue(state)
+
+    def getPolicy(self, state):
+        if (self._qFunction is not None):
+            return self._qFunction.getPolicy(state)
+
+        return super().getPolicy(state)
+
     def update(self, state, action, nextState, reward):
+        target = reward + self.getDiscountRate() * self.getValue(nextState)
+        if (self._qFunction is not None):
+            self._qFunction.update(state, action, target, self.getAlpha())
+            return
+
         # adds the error times learning rate
-        error = (reward + self.getDiscountRate() * self.getValue(nextState))\
-            - (self.getQValue(state, action))
-        features = self.featExtractor().getFeatures(state, action)
+        features = self._extractor.getFeatures(state, action)
+        error = target - sum([self.weights[key] * features[key] for key in features.keys()])
         for key in features.keys():
             self.weights[key] += self.getAlpha() * error * features[key]
 
+    def encodeTransition(self, state, action, nextState, reward):
+        if (self._qFunction is not None):
+            return self._qFunction.encodeTransition(state, action, nextState, reward)
+
+        return super().encodeTransition(state, action, nextState, reward)
+
+    def updateEncoded(self, encoded):
+        if (self._qFunction is not None):
+            self._qFunction.updateEncoded(encoded, self.getDiscountRate(), self.getAlpha())
+        else:
+            super().updateEncoded(encoded)
+
+    def updateBatch(self, transitions, weights):
+        if (self._qFunction is not None):
+            return self._qFunction.updateBatch(transitions, weights, self.getDiscountRate(),
+                    self.getAlpha())
+
+        return super().updateBatch(transitions, weights)
+
     def final(self, state):
         """
         Called at the end of each game.
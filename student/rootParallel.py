@@ -0,0 +1,210 @@
+"""
+Root-parallel game tree search.
+
+The subtree under each legal action at the root is searched in a worker process,
+and the values are reduced back by the searching agent.
+Workers come from a persistent process pool that holds its own copy of the agent
+(so each worker keeps its own transposition table between moves),
+and the static layout, so that only the changing parts of a state are sent per move.
+
+States are sent in a compact form (see `packState`):
+the layout is left out and every `pacai.core.grid.Grid` is packed into an integer bitset,
+which is much smaller (and faster to send) than pickling the full game state.
+
+An agent that uses `RootSearchPool.getActionValues` must have a
+`rootActionValue(gameState, action)` method, which gives the value of taking the action at the root.
+An agent that uses `RootSearchPool.runRootSearches` (e.g. root parallel Monte Carlo tree search,
+where every worker searches its own tree from the root) must have
+a `rootSearch(gameState, seed)` method, which runs a whole search and returns its results.
+"""
+
+import copy
+import multiprocessing
+import pickle
+import weakref
+
+from pacai.core.grid import Grid
+
+# The agent and layout in a worker process (set by _initWorker).
+_workerAgent = None
+_workerLayout = None
+
+# The last root state a worker unpacked (as (packed, state)), since every task shares the root.
+_workerRoot = (None, None)
+
+class RootSearchPool(object):
+    """
+    A persistent pool of worker processes that search root actions for an agent.
+    The pool is (re)started with a fresh copy of the agent whenever the layout changes.
+    Agents should `RootSearchPool.close` their pool when a game ends (in `final`),
+    otherwise the workers are only shut down once the pool is garbage collected
+    (or the program exits).
+    """
+
+    def __init__(self, agent, numWorkers):
+        self._agent = agent
+        self._numWorkers = numWorkers
+
+        self._pool = None
+        self._layout = None
+        self._finalizer = None
+
+    def getActionValues(self, gameState, actions):
+        """
+        Get `agent.rootActionValue(gameState, action)` for each action (in the same order),
+        with each action searched in a worker.
+        """
+
+        self._ensureStarted(gameState)
+
+        packedState = packState(gameState)
+        tasks = [(packedState, action) for action in actions]
+
+        return self._pool.map(_searchRootAction, tasks, chunksize = 1)
+
+    def runRootSearches(self, gameState, seeds):
+        """
+        Get `agent.rootSearch(gameState, seed)` for each seed (in the same order),
+        with each search run in a worker.
+        """
+
+        self._ensureStarted(gameState)
+
+        packedState = packState(gameState)
+        tasks = [(packedState, seed) for seed in seeds]
+
+        return self._pool.map(_runRootSearch, tasks, chunksize = 1)
+
+    def close(self):
+        if (self._pool is not None):
+            self._finalizer()
+            self._pool = None
+            self._finalizer = None
+
+    def _ensureStarted(self, gameState):
+        layout = gameState.getInitialLayout()
+        if (self._pool is None or self._layout is not layout):
+            self._start(layout)
+
+    def _start(self, layout):
+        self.close()
+
+        agentData = pickle.dumps(_workerCopy(self._agent), pickle.HIGHEST_PROTOCOL)
+
+        self._layout = layout
+        self._pool = multiprocessing.Pool(self._numWorkers,
+                initializer = _initWorker, initargs = (agentData, layout))
+        self._finalizer = weakref.finalize(self, self._pool.terminate)
+
+def packState(gameState):
+    """
+    Pack a game state into a compact bytes object.
+    The layout is left out (`unpackState` takes it back in) and grids are packed into bitsets.
+    """
+
+    attributes = {}
+    for (name, value) in gameState.__dict__.items():
+        if (name == '_layout'):
+            continue
+
+        if (isinstance(value, Grid)):
+            value = _packGrid(value)
+
+        attributes[name] = value
+
+    # Undo entries from make/unmake moves are only meaningful in this process.
+    if ('_undoStack' in attributes):
+        attributes['_undoStack'] = None
+
+    return pickle.dumps((type(gameState), attributes), pickle.HIGHEST_PROTOCOL)
+
+def unpackState(data, layout):
+    """
+    Rebuild a game state packed with `packState`.
+    """
+
+    stateClass, attributes = pickle.loads(data)
+
+    gameState = stateClass.__new__(stateClass)
+    for (name, value) in attributes.items():
+        if (isinstance(value, _PackedGrid)):
+            value = _unpackGrid(value)
+
+        gameState.__dict__[name] = value
+
+    gameState._layout = layout
+    return gameState
+
+class _PackedGrid(object):
+    """
+    A grid of booleans as a bitset, with bit (x * height + y) set for each true cell.
+    """
+
+    def __init__(self, width, height, bits):
+        self.width = width
+        self.height = height
+        self.bits = bits
+
+def _packGrid(grid):
+    bits = 0
+    for (x, y) in grid.asList():
+        bits |= 1 << (x * grid.getHeight() + y)
+
+    return _PackedGrid(grid.getWidth(), grid.getHeight(), bits)
+
+def _unpackGrid(packedGrid):
+    grid = Grid(packedGrid.width, packedGrid.height)
+
+    bits = packedGrid.bits
+    while (bits):
+        lowBit = bits & -bits
+        index = lowBit.bit_length() - 1
+        grid[index // packedGrid.height][index % packedGrid.height] = True
+        bits ^= lowBit
+
+    return grid
+
+def _workerCopy(agent):
+    """
+    Get a copy of the agent to send to the workers,
+    without any of the state that only matters in this process.
+    """
+
+    agent = copy.copy(agent)
+
+    # Local import to avoid a circular import (multiagents uses this module).
+    from pacai.student.multiagents import TranspositionTable
+
+    for (name, value) in list(agent.__dict__.items()):
+        if (isinstance(value, TranspositionTable)):
+            agent.__dict__[name] = TranspositionTable(value.getMaxEntries())
+        elif (isinstance(value, RootSearchPool)):
+            agent.__dict__[name] = None
+
+    if (hasattr(agent, 'observationHistory')):
+        agent.observationHistory = []
+
+    return agent
+
+def _initWorker(agentData, layout):
+    global _workerAgent
+    global _workerLayout
+
+    _workerAgent = pickle.loads(agentData)
+    _workerLayout = layout
+
+def _getWorkerRoot(packedState):
+    global _workerRoot
+
+    if (_workerRoot[0] != packedState):
+        _workerRoot = (packedState, unpackState(packedState, _workerLayout))
+
+    return _workerRoot[1]
+
+def _searchRootAction(task):
+    packedState, action = task
+    return _workerAgent.rootActionValue(_getWorkerRoot(packedState), action)
+
+def _runRootSearch(task):
+    packedState, seed = task
+    return _workerAgent.rootSearch(_getWorkerRoot(packedState), seed)
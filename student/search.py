@@ -1,9 +1,288 @@
 """
 In this file, you will implement generic search algorithms which are called by Pacman agents.
 """
-from pacai.util.stack import Stack
-from pacai.util.queue import Queue
-from pacai.util.priorityQueue import PriorityQueueWithFunction
+import collections
+import copy
+import heapq
+import itertools
+import logging
+import math
+import sys
+
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+
+# The default number of nodes that the memory-bounded searches may keep in memory.
+DEFAULT_MAX_NODES = 100000
+
+def _buildPath(node):
+    """
+    Walk the parent pointers of a search node back to the root,
+    and return the actions that lead from the root to the node.
+
+    A search node is a tuple: (state, pathCost, parentNode, action).
+    The root node has no parent and no action.
+    """
+
+    path = []
+    while (node[2] is not None):
+        path.append(node[3])
+        node = node[2]
+
+    path.reverse()
+    return path
+
+def _graphSearch(problem, fringe, push, pop):
+    """
+    The graph search engine shared by `depthFirstSearch` and `breadthFirstSearch`.
+
+    Instead of copying the path for every node, nodes only keep a pointer to their parent
+    and the path is rebuilt once (see `_buildPath`) when the goal is found.
+    The explored (closed) set is a hashed set, so states must be hashable.
+
+    `fringe` is the container holding the nodes (only used to check for emptiness),
+    while `push` and `pop` add and remove nodes from it.
+    The order that `pop` returns nodes in defines the search strategy.
+    """
+
+    explored = set()
+
+    push((problem.startingState(), 0, None, None))
+    while (fringe):
+        node = pop()
+        state, cost = node[0], node[1]
+        explored.add(state)
+
+        for (position, direction, stepCost) in problem.successorStates(state):
+            if (position in explored):
+                continue
+
+            child = (position, cost + stepCost, node, direction)
+            if problem.isGoal(position):
+                return _buildPath(child)
+
+            push(child)
+            explored.add(position)
+
+    print("No path found: ")
+    return []
+
+def _bestFirstSearch(problem, heuristic = None):
+    """
+    The best-first search engine behind `uniformCostSearch` and `aStarSearch`.
+
+    The fringe is a binary heap of (f, tiebreak, node) entries,
+    where f = g + h and the tiebreak counter keeps the ordering stable
+    (and keeps the heap from ever comparing states).
+    A table of the best known path cost (g) to each state gives us a lazy decrease-key:
+    a cheaper path to a state just pushes a new entry,
+    and the stale, more expensive entries are skipped when they are popped.
+
+    Unlike `_graphSearch`, the goal test happens when a node is popped (not generated),
+    which is what makes the returned path optimal.
+    The heuristic (if any) is called at most once per distinct state.
+    """
+
+    startState = problem.startingState()
+    bestCosts = {startState: 0}
+    heuristicValues = {}
+
+    def estimate(state):
+        if (heuristic is None):
+            return 0
+
+        if (state not in heuristicValues):
+            heuristicValues[state] = heuristic(state, problem)
+
+        return heuristicValues[state]
+
+    counter = itertools.count()
+    fringe = [(estimate(startState), next(counter), (startState, 0, None, None))]
+
+    while (fringe):
+        node = heapq.heappop(fringe)[2]
+        state, cost = node[0], node[1]
+
+        # A cheaper path to this state has already been found.
+        if (cost > bestCosts[state]):
+            continue
+
+        if (problem.isGoal(state)):
+            return _buildPath(node)
+
+        for (position, direction, stepCost) in problem.successorStates(state):
+            newCost = cost + stepCost
+            if (position in bestCosts and newCost >= bestCosts[position]):
+                continue
+
+            bestCosts[position] = newCost
+            child = (position, newCost, node, direction)
+            heapq.heappush(fringe, (newCost + estimate(position), next(counter), child))
+
+    print("No path found: ")
+    return []
+
+class _BoundedNode(object):
+    """
+    A search node for `memoryBoundedAStarSearch`.
+    Unlike the tuple nodes used by the other searches,
+    these nodes are mutable since their f-value gets backed up when their children are forgotten.
+    """
+
+    def __init__(self, state, cost, estimate, parent = None, action = None):
+        self.state = state
+        self.cost = cost
+        self.estimate = estimate
+        self.parent = parent
+        self.action = action
+
+        self.depth = 0
+        if (parent is not None):
+            self.depth = parent.depth + 1
+
+        # The number of children currently in memory.
+        self.numChildren = 0
+
+        # The (backed up) f-values of the children that were dropped from memory, by state.
+        self.forgotten = {}
+
+        # The id of this node's entry on the fringe (None if it is not on the fringe).
+        self.fringeId = None
+
+    def getBestForgotten(self):
+        """
+        The lowest f-value of the children that were dropped from memory.
+        """
+
+        return min(self.forgotten.values(), default = math.inf)
+
+    def getSize(self):
+        """
+        The memory (in bytes) taken by this node (not counting its parent).
+        """
+
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__) + sys.getsizeof(self.state)
+
+    def getPath(self):
+        path = []
+
+        node = self
+        while (node.parent is not None):
+            path.append(node.action)
+            node = node.parent
+
+        path.reverse()
+        return path
+
+class _BoundedFringe(object):
+    """
+    The fringe of `memoryBoundedAStarSearch`, which needs both the best and the worst leaf.
+    Leaves are kept in a min-heap and a max-heap at once.
+    Nodes that still have children in memory, but also forgotten children,
+    are only in the min-heap (by the f-value of their best forgotten child),
+    since they can be searched again but not dropped.
+
+    Removing a node from the fringe (or popping it from one heap) does not touch the heaps,
+    instead an entry that is no longer on the fringe is skipped (and dropped) when it comes up.
+    So pushing and popping are both O(log n).
+    """
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+        # (f-value, -depth, id, node): the best node (lowest f-value, deepest) is on top.
+        self._bestHeap = []
+
+        # (-f-value, depth, -id, node): the worst leaf (highest f-value, shallowest) is on top.
+        self._worstHeap = []
+
+        # The ids of the entries that are currently on the fringe (and the ones that are leaves).
+        self._ids = set()
+        self._leafIds = set()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def hasLeaves(self):
+        return len(self._leafIds) > 0
+
+    def getSize(self):
+        """
+        The memory (in bytes) taken by the fringe itself (not counting the nodes).
+        """
+
+        entries = len(self._bestHeap) + len(self._worstHeap)
+        entrySize = sys.getsizeof((0, 0, 0, None))
+
+        return (sys.getsizeof(self._bestHeap) + sys.getsizeof(self._worstHeap)
+                + sys.getsizeof(self._ids) + sys.getsizeof(self._leafIds) + entries * entrySize)
+
+    def push(self, node):
+        """
+        Put a leaf on the fringe (by its f-value).
+        """
+
+        id = self._add(node)
+        self._leafIds.add(id)
+
+        heapq.heappush(self._bestHeap, (node.estimate, -node.depth, id, node))
+        heapq.heappush(self._worstHeap, (-node.estimate, node.depth, -id, node))
+
+    def pushForgotten(self, node):
+        """
+        Put a node that has forgotten children (but is not a leaf) on the fringe,
+        by the f-value of its best forgotten child.
+        """
+
+        id = self._add(node)
+        heapq.heappush(self._bestHeap, (node.getBestForgotten(), -node.depth, id, node))
+
+    def remove(self, node):
+        if (node.fringeId is None):
+            return
+
+        self._ids.discard(node.fringeId)
+        self._leafIds.discard(node.fringeId)
+        node.fringeId = None
+
+    def popBest(self):
+        while (True):
+            estimate, negativeDepth, id, node = heapq.heappop(self._bestHeap)
+            if (id in self._ids):
+                self.remove(node)
+                return node
+
+    def popWorst(self):
+        """
+        Pop the worst leaf.
+        """
+
+        while (True):
+            negativeEstimate, depth, negativeId, node = heapq.heappop(self._worstHeap)
+            if (-negativeId in self._leafIds):
+                self.remove(node)
+                return node
+
+    def _add(self, node):
+        # A node is only ever on the fringe once.
+        self.remove(node)
+
+        id = next(self._counter)
+        self._ids.add(id)
+        node.fringeId = id
+
+        # Keep the skipped entries from piling up.
+        if (len(self._bestHeap) + len(self._worstHeap) > 4 * len(self._ids) + 64):
+            self._compact()
+
+        return id
+
+    def _compact(self):
+        self._bestHeap = [entry for entry in self._bestHeap if entry[2] in self._ids]
+        self._worstHeap = [entry for entry in self._worstHeap if -entry[2] in self._leafIds]
+
+        heapq.heapify(self._bestHeap)
+        heapq.heapify(self._worstHeap)
 
 def depthFirstSearch(problem):
     """
@@ -20,100 +299,467 @@ def depthFirstSearch(problem):
     print("Start's successors: %s" % (problem.successorStates(problem.startingState())))
     ```
     """
-    # initialize stuff for DFS
-    explored = []
-    goalNotFound = True
-
-    fringe = Stack()
-    fringe.push((problem.startingState(), []))
-    while(not fringe.isEmpty() and goalNotFound):
-        (node, path) = fringe.pop()
-        explored.append(node)
-        for (position, direction, cost) in problem.successorStates(node):
-            if position not in explored and goalNotFound:
-                if problem.isGoal(position):
-                    goalNotFound = False
-                    return path + [direction]
-                else:
-                    fringe.push((position, path + [direction]))
-                explored.append(position)
 
-    print("No path found: ")
-    return []
+    fringe = []
+    return _graphSearch(problem, fringe, fringe.append, fringe.pop)
 
 def breadthFirstSearch(problem):
     """
     Search the shallowest nodes in the search tree first. [p 81]
     """
-    explored = []
-    goalNotFound = True
-
-    fringe = Queue()
-    fringe.push((problem.startingState(), []))
-    while(not fringe.isEmpty() and goalNotFound):
-        (node, path) = fringe.pop()
-        explored.append(node)
-        for (position, direction, cost) in problem.successorStates(node):
-            if position not in explored and goalNotFound:
-                if problem.isGoal(position):
-                    goalNotFound = False
-                    return path + [direction]
-                else:
-                    fringe.push((position, path + [direction]))
-                explored.append(position)
 
-    print("No path found: ")
-    return []
+    fringe = collections.deque()
+    return _graphSearch(problem, fringe, fringe.append, fringe.popleft)
 
 def uniformCostSearch(problem):
     """
     Search the node of least total cost first.
     """
 
-    # *** Your Code Here ***
-    explored = []
-    goalNotFound = True
-
-    fringe = PriorityQueueWithFunction(lambda x: x[2])
-    fringe.push((problem.startingState(), [], 0))
-    while(not fringe.isEmpty() and goalNotFound):
-        (node, path, cost) = fringe.pop()
-        explored.append(node)
-        for (position, direction, newCost) in problem.successorStates(node):
-            if position not in explored and goalNotFound:
-                if problem.isGoal(position):
-                    goalNotFound = False
-                    return path + [direction]
-                else:
-                    fringe.push((position, path + [direction], cost + newCost))
-                explored.append(position)
+    return _bestFirstSearch(problem)
+
+def aStarSearch(problem, heuristic):
+    """
+    Search the node that has the lowest combined cost and heuristic first.
+    """
+
+    return _bestFirstSearch(problem, heuristic)
+
+def iterativeDeepeningAStarSearch(problem, heuristic, maxNodes = DEFAULT_MAX_NODES):
+    """
+    Iterative deepening A* (IDA*).
+
+    Run depth first searches that cut off any node with an f-value over a bound,
+    raising the bound to the smallest f-value that was cut off after every failed iteration.
+    Only the current path is kept, so memory grows with the depth of the solution
+    instead of the size of the fringe.
+
+    To keep mazes (which have lots of different paths to the same position) from
+    blowing up, each iteration also skips states already reached at least as cheaply.
+    That table is bounded: once it holds `maxNodes` states, no new states are added.
+    The peak number of nodes held in memory (and the memory they take) is logged.
+    """
+
+    startState = problem.startingState()
+    if (problem.isGoal(startState)):
+        return []
+
+    bound = heuristic(startState, problem)
+    peakNodes = 0
+    peakBytes = 0
+
+    while (bound < math.inf):
+        nextBound = math.inf
+
+        bestCosts = {startState: 0}
+        onPath = {startState}
+        states = [startState]
+        costs = [0]
+        actions = []
+        frames = [iter(problem.successorStates(startState))]
+
+        # The memory taken by the states in the table and the successor iterators on the path.
+        stateBytes = sys.getsizeof(startState)
+        frameSize = sys.getsizeof(frames[0])
+
+        while (frames):
+            step = next(frames[-1], None)
+            if (step is None):
+                # All the children of this node have been searched, backtrack.
+                frames.pop()
+                costs.pop()
+                onPath.remove(states.pop())
+                if (actions):
+                    actions.pop()
+
+                continue
+
+            (position, direction, stepCost) = step
+            if (position in onPath):
+                continue
+
+            cost = costs[-1] + stepCost
+            if (position in bestCosts and bestCosts[position] <= cost):
+                continue
+
+            estimate = cost + heuristic(position, problem)
+            if (estimate > bound):
+                nextBound = min(nextBound, estimate)
+                continue
+
+            if (problem.isGoal(position)):
+                _logPeakMemory('IDA*', peakNodes, peakBytes, maxNodes)
+                return actions + [direction]
+
+            if (position not in bestCosts and len(bestCosts) < maxNodes):
+                stateBytes += sys.getsizeof(position)
+
+            if (position in bestCosts or len(bestCosts) < maxNodes):
+                bestCosts[position] = cost
+
+            onPath.add(position)
+            states.append(position)
+            costs.append(cost)
+            actions.append(direction)
+            frames.append(iter(problem.successorStates(position)))
+
+            if (len(frames) + len(bestCosts) > peakNodes):
+                peakNodes = len(frames) + len(bestCosts)
+
+            numBytes = (stateBytes + len(frames) * frameSize + sys.getsizeof(bestCosts)
+                    + sys.getsizeof(onPath) + sys.getsizeof(states) + sys.getsizeof(costs)
+                    + sys.getsizeof(actions) + sys.getsizeof(frames))
+            peakBytes = max(peakBytes, numBytes)
+
+        bound = nextBound
 
     print("No path found: ")
     return []
 
-def aStarSearch(problem, heuristic):
+def memoryBoundedAStarSearch(problem, heuristic, maxNodes = DEFAULT_MAX_NODES):
     """
-    Search the node that has the lowest combined cost and heuristic first.
+    Simplified memory-bounded A* (SMA*).
+
+    This runs like A* until `maxNodes` nodes are in memory.
+    Then, to make room, the worst leaf (highest f-value, shallowest) is dropped,
+    and its f-value is remembered by its parent.
+    A node with forgotten children stays on the fringe (by its best forgotten f-value),
+    so a forgotten subtree is regenerated as soon as it looks best again.
+    When a node has lost all its children, it is a leaf again
+    with the best f-value of its forgotten subtrees.
+    Regenerated children get back the f-value that was remembered for them,
+    so a subtree that was found to be worse (or a dead end) is not searched again for nothing.
+
+    Children that do not fit in the budget are never kept,
+    but their f-values are remembered by their parent just like forgotten children.
+    A node whose path already fills the budget can not have any children in memory,
+    so (like in SMA*) it gets an infinite f-value.
+
+    With an admissible heuristic, the returned path is optimal as long as the search for it
+    fits in the budget.
+    With a budget that is too tight, a worse path (or no path) may be returned.
+    The peak number of nodes held in memory (and the memory they take) is logged.
     """
 
-    # *** Your Code Here ***
-    explored = []
-    goalNotFound = True
-
-    # fringe = PriorityQueueWithFunction(lambda x: x[2] + manhattan(x[0], problem))
-    fringe = PriorityQueueWithFunction(lambda x: x[2] + heuristic(x[0], problem))
-    fringe.push((problem.startingState(), [], 0))
-    while(not fringe.isEmpty() and goalNotFound):
-        (node, path, cost) = fringe.pop()
-        explored.append(node)
-        for (position, direction, newCost) in problem.successorStates(node):
-            if position not in explored and goalNotFound:
-                if problem.isGoal(position):
-                    goalNotFound = False
-                    return path + [direction]
-                else:
-                    fringe.push((position, path + [direction], cost + newCost))
-                explored.append(position)
+    fringe = _BoundedFringe()
+
+    # The cheapest node in memory for each state.
+    bestNodes = {}
+
+    numNodes = 0
+    peakNodes = 0
+
+    # The memory taken by the nodes in memory.
+    nodeBytes = 0
+    peakBytes = 0
+
+    def forget(node):
+        nonlocal numNodes, nodeBytes
+
+        while (node.parent is not None):
+            numNodes -= 1
+            nodeBytes -= node.getSize()
+            if (bestNodes.get(node.state) is node):
+                del bestNodes[node.state]
+
+            fringe.remove(node)
+
+            parent = node.parent
+            parent.numChildren -= 1
+            parent.forgotten[node.state] = node.estimate
+
+            if (parent.numChildren > 0):
+                if (node.estimate < math.inf):
+                    fringe.pushForgotten(parent)
+
+                return
+
+            # The parent is a leaf again, back up the best f-value of its forgotten subtrees.
+            parent.estimate = parent.getBestForgotten()
+
+            # A dead end, forget it as well.
+            if (parent.estimate == math.inf and parent.parent is not None):
+                node = parent
+                continue
+
+            fringe.push(parent)
+            return
+
+    startState = problem.startingState()
+    root = _BoundedNode(startState, 0, heuristic(startState, problem))
+    bestNodes[startState] = root
+    fringe.push(root)
+    numNodes = 1
+    nodeBytes = root.getSize()
+
+    while (fringe):
+        best = fringe.popBest()
+        isLeaf = (best.numChildren == 0)
+
+        if (isLeaf and best.estimate == math.inf):
+            break
+
+        if (isLeaf and problem.isGoal(best.state)):
+            _logPeakMemory('SMA*', peakNodes, peakBytes, maxNodes)
+            return best.getPath()
+
+        # The path to this leaf fills the budget, so none of its children fit.
+        if (isLeaf and best.depth + 1 >= maxNodes):
+            best.estimate = math.inf
+            if (best.parent is None):
+                break
+
+            forget(best)
+            continue
+
+        onPath = set()
+        node = best
+        while (node is not None):
+            onPath.add(node.state)
+            node = node.parent
+
+        # A leaf generates all its children, otherwise only the forgotten ones come back.
+        # Only the children that are not kept are remembered again (below).
+        remembered = best.forgotten
+        best.forgotten = {}
+
+        if (not isLeaf):
+            best.forgotten = {state: estimate for (state, estimate) in remembered.items()
+                    if (estimate == math.inf)}
+
+        children = []
+        for (position, direction, stepCost) in problem.successorStates(best.state):
+            if (position in onPath):
+                continue
+
+            if (not isLeaf and position not in remembered):
+                continue
+
+            cost = best.cost + stepCost
+            if (position in bestNodes and bestNodes[position].cost <= cost):
+                continue
+
+            # Pathmax, children can never look better than their parent
+            # (or than they did when they were forgotten).
+            estimate = max(best.estimate, cost + heuristic(position, problem),
+                    remembered.get(position, 0))
+
+            if (estimate == math.inf):
+                best.forgotten[position] = estimate
+                continue
+
+            children.append(_BoundedNode(position, cost, estimate, best, direction))
+
+        # Make room by dropping the worst leaves.
+        # (This may drop the node's own children, which it then remembers.)
+        while (numNodes + len(children) > maxNodes and fringe.hasLeaves()):
+            forget(fringe.popWorst())
+
+        # If only the current path is left in memory, then keep the best children that fit
+        # (at least one does, since the path is shorter than the budget).
+        # The parent remembers the rest, like any other forgotten children.
+        if (numNodes + len(children) > maxNodes):
+            children.sort(key = lambda child: child.estimate)
+
+            numKept = maxNodes - numNodes
+            for child in children[numKept:]:
+                best.forgotten[child.state] = child.estimate
+
+            children = children[:numKept]
+
+        # A dead end (every successor is on the path, already reached more cheaply,
+        # or known to be a dead end).
+        if (len(children) == 0 and best.numChildren == 0):
+            best.estimate = best.getBestForgotten()
+            fringe.remove(best)
+
+            if (best.estimate < math.inf):
+                fringe.push(best)
+            elif (best.parent is None):
+                break
+            else:
+                forget(best)
+
+            continue
+
+        for child in children:
+            best.numChildren += 1
+            bestNodes[child.state] = child
+            fringe.push(child)
+            nodeBytes += child.getSize()
+
+        numNodes += len(children)
+        if (numNodes >= peakNodes):
+            peakNodes = numNodes
+            peakBytes = max(peakBytes, nodeBytes + fringe.getSize() + sys.getsizeof(bestNodes))
+
+        # Dropping its own children may have put the node back on the fringe as a leaf.
+        fringe.remove(best)
+        if (best.getBestForgotten() < math.inf):
+            fringe.pushForgotten(best)
 
     print("No path found: ")
     return []
+
+def _logPeakMemory(name, peakNodes, peakBytes, maxNodes):
+    logging.info('[%s] Peak memory: %d nodes, %.1f KiB (budget: %d nodes)'
+            % (name, peakNodes, peakBytes / 1024.0, maxNodes))
+
+def _predecessorStates(problem, state):
+    """
+    Get the (predecessor, action, stepCost) triples for a state,
+    i.e. the states that reach this state by taking the action.
+
+    Problems can supply this relation with a `predecessorStates` method.
+    Otherwise, the problem is assumed to be a grid problem like
+    `pacai.core.search.position.PositionSearchProblem`,
+    and the grid successor relation (using `problem.walls` and `problem.costFn`) is reversed.
+    """
+
+    if (hasattr(problem, 'predecessorStates')):
+        return problem.predecessorStates(state)
+
+    predecessors = []
+
+    for action in Directions.CARDINAL:
+        x, y = state
+        dx, dy = Actions.directionToVector(action)
+        prevx, prevy = int(x - dx), int(y - dy)
+
+        if (not problem.walls[prevx][prevy]):
+            predecessors.append(((prevx, prevy), action, problem.costFn(state)))
+
+    # Backwards expansions are still expansions.
+    problem._numExpanded += 1
+    return predecessors
+
+def _bidirectionalSearch(problem, heuristic = None):
+    """
+    The engine behind `bidirectionalSearch` and `bidirectionalAStarSearch`.
+
+    Two best-first searches are run, one forward from the start and one backward from
+    `problem.goal` (over `_predecessorStates`), always expanding the side with the smaller fringe.
+    Every time one side reaches a state the other side has already reached,
+    the best full path (through the meeting state) is updated.
+    The search stops once the two fringes can no longer produce a cheaper path.
+
+    With a heuristic, each side uses the average of the forward and backward estimates,
+    p(s) = (h(s, goal) - h(s, start)) / 2, as its potential (and the other side uses -p(s)).
+    This keeps both sides consistent, so the stopping rule above is still exact.
+    """
+
+    startState = problem.startingState()
+    if (problem.isGoal(startState)):
+        return []
+
+    goalState = problem.goal
+
+    # The heuristic towards the start is the heuristic on a problem whose goal is the start.
+    backwardProblem = copy.copy(problem)
+    backwardProblem.goal = startState
+
+    potentials = {}
+
+    def potential(state):
+        if (heuristic is None):
+            return 0
+
+        if (state not in potentials):
+            potentials[state] = (heuristic(state, problem)
+                    - heuristic(state, backwardProblem)) / 2.0
+
+        return potentials[state]
+
+    counter = itertools.count()
+
+    # Index 0 is the forward search, index 1 is the backward search.
+    # For the backward search, the parent of a state is the next state on the way to the goal.
+    costs = ({startState: 0}, {goalState: 0})
+    parents = ({startState: None}, {goalState: None})
+    explored = (set(), set())
+    fringes = ([(potential(startState), next(counter), startState)],
+            [(-potential(goalState), next(counter), goalState)])
+
+    bestCost = math.inf
+    meetingState = None
+
+    while (fringes[0] and fringes[1]):
+        if (fringes[0][0][0] + fringes[1][0][0] >= bestCost):
+            break
+
+        side = 0
+        if (len(fringes[1]) < len(fringes[0])):
+            side = 1
+
+        state = heapq.heappop(fringes[side])[2]
+        if (state in explored[side]):
+            continue
+
+        explored[side].add(state)
+        cost = costs[side][state]
+
+        if (side == 0):
+            neighbors = problem.successorStates(state)
+        else:
+            neighbors = _predecessorStates(problem, state)
+
+        for (neighbor, direction, stepCost) in neighbors:
+            newCost = cost + stepCost
+            if (neighbor in costs[side] and newCost >= costs[side][neighbor]):
+                continue
+
+            costs[side][neighbor] = newCost
+            parents[side][neighbor] = (state, direction)
+
+            estimate = newCost + potential(neighbor)
+            if (side == 1):
+                estimate = newCost - potential(neighbor)
+
+            heapq.heappush(fringes[side], (estimate, next(counter), neighbor))
+
+            if (neighbor in costs[1 - side] and newCost + costs[1 - side][neighbor] < bestCost):
+                bestCost = newCost + costs[1 - side][neighbor]
+                meetingState = neighbor
+
+    if (meetingState is None):
+        print("No path found: ")
+        return []
+
+    path = []
+
+    link = parents[0][meetingState]
+    while (link is not None):
+        path.append(link[1])
+        link = parents[0][link[0]]
+
+    path.reverse()
+
+    link = parents[1][meetingState]
+    while (link is not None):
+        path.append(link[1])
+        link = parents[1][link[0]]
+
+    return path
+
+def bidirectionalSearch(problem):
+    """
+    Search from both the start and the goal at the same time (meeting in the middle).
+    For unit costs this is bidirectional breadth first search,
+    otherwise it is bidirectional uniform cost search.
+
+    The problem needs a single explicit goal in `problem.goal`,
+    like `pacai.core.search.position.PositionSearchProblem`.
+    """
+
+    return _bidirectionalSearch(problem)
+
+def bidirectionalAStarSearch(problem, heuristic):
+    """
+    Bidirectional A*, see `_bidirectionalSearch`.
+
+    The problem needs a single explicit goal in `problem.goal`,
+    and the heuristic must estimate the distance to `problem.goal`
+    (like `pacai.core.search.heuristic.manhattan`).
+    """
+
+    return _bidirectionalSearch(problem, heuristic)
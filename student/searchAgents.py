@@ -5,16 +5,20 @@ You will complete their implementations.
 Good luck and happy searching!
 """
 
+import collections
 import logging
 
 from pacai.core.actions import Actions
 from pacai.core import distance
+from pacai.student import mazeDistances
 from pacai.student import search
+from pacai.core.search.food import FoodSearchProblem
 from pacai.core.search.position import PositionSearchProblem
 from pacai.core.search.problem import SearchProblem
 from pacai.agents.base import BaseAgent
 from pacai.agents.search.base import SearchAgent
 from pacai.core.directions import Directions
+from pacai.core.grid import Grid
 
 class CornersProblem(SearchProblem):
     """
@@ -68,7 +72,8 @@ class CornersProblem(SearchProblem):
         # *** Your Code Here ***
     def startingState(self):
         # state represents the position and corners visited so far.
-        emptySet = set()
+        # The corners are a frozenset so that states can be hashed into an explored set.
+        emptySet = frozenset()
         return (self.startingPosition, emptySet)
 
     def isGoal(self, state):
@@ -137,6 +142,81 @@ def cornersHeuristic(state, problem):
 
     return runningPerimeter
 
+class BitsetCornersProblem(CornersProblem):
+    """
+    A `CornersProblem` where each state is packed into a single int:
+    `(positionIndex << 4) | visitedCorners`,
+    where `positionIndex = x * height + y` and bit i of `visitedCorners` is set
+    once `CornersProblem.corners[i]` has been visited.
+
+    Int states are cheap to hash and compare, and take a single word per node.
+    Use `BitsetCornersProblem.decodeState` to get back a regular `CornersProblem` state.
+    """
+
+    def __init__(self, startingGameState):
+        super().__init__(startingGameState)
+
+        self._height = self.walls.getHeight()
+        self._allCorners = (1 << len(self.corners)) - 1
+
+    def encodeState(self, position, visitedCorners):
+        """
+        Pack a position and a collection of visited corners into an int state.
+        """
+
+        mask = 0
+        for (i, corner) in enumerate(self.corners):
+            if (corner in visitedCorners):
+                mask |= (1 << i)
+
+        x, y = position
+        return ((x * self._height + y) << 4) | mask
+
+    def decodeState(self, state):
+        """
+        Unpack an int state into a `CornersProblem` state: (position, frozenset of corners).
+        """
+
+        position = divmod(state >> 4, self._height)
+        visited = frozenset([corner for (i, corner) in enumerate(self.corners)
+                if (state & (1 << i))])
+
+        return (position, visited)
+
+    def startingState(self):
+        return self.encodeState(self.startingPosition, ())
+
+    def isGoal(self, state):
+        return ((state & self._allCorners) == self._allCorners)
+
+    def successorStates(self, state):
+        successors = []
+
+        mask = state & self._allCorners
+        x, y = divmod(state >> 4, self._height)
+
+        for action in Directions.CARDINAL:
+            dx, dy = Actions.directionToVector(action)
+            nextx, nexty = int(x + dx), int(y + dy)
+            if (self.walls[nextx][nexty]):
+                continue
+
+            nextMask = mask
+            if ((nextx, nexty) in self.corners):
+                nextMask |= (1 << self.corners.index((nextx, nexty)))
+
+            successors.append((((nextx * self._height + nexty) << 4) | nextMask, action, 1))
+
+        self._numExpanded += 1
+        return successors
+
+def bitsetCornersHeuristic(state, problem):
+    """
+    `cornersHeuristic` for the int states of a `BitsetCornersProblem`.
+    """
+
+    return cornersHeuristic(problem.decodeState(state), problem)
+
 def foodHeuristic(state, problem):
     """
     Your heuristic for the FoodSearchProblem goes here.
@@ -164,6 +244,9 @@ def foodHeuristic(state, problem):
     problem.heuristicInfo['wallCount'] = problem.walls.count()
     ```
     Subsequent calls to this heuristic can access problem.heuristicInfo['wallCount'].
+
+    See `foodMaxDistanceHeuristic` for the same bound on a precomputed distance table,
+    and `foodMSTHeuristic` for a tighter one.
     """
 
     # choose the max distance to any food
@@ -180,18 +263,250 @@ def foodHeuristic(state, problem):
     # *** Your Code Here ***
     # return heuristic.null(state, problem)  # Default to the null heuristic.
 
+def foodMaxDistanceHeuristic(state, problem):
+    """
+    A consistent heuristic for the FoodSearchProblem:
+    the maze distance to the farthest food.
+    """
+
+    position, foodGrid = state
+    distances = _getMazeDistances(problem)
+
+    maxDist = 0
+    for food in foodGrid.asList():
+        distance = distances.getDistanceOnGrid(position, food)
+        if distance > maxDist:
+            maxDist = distance
+
+    return maxDist
+
+def foodMSTHeuristic(state, problem):
+    """
+    A consistent heuristic for the FoodSearchProblem:
+    the maze distance to the nearest food plus the weight of a
+    minimum spanning tree (over maze distances) of all the remaining food.
+
+    Any path that eats all the food has to reach some food first,
+    and then has to connect all the food (which costs at least the MST),
+    so this never overestimates.
+    Eating a food can only shrink the MST by the distance from that food to the rest,
+    so it is consistent as well.
+
+    Many states share the same food (they only differ by pacman's position),
+    so MST weights are memoized in `problem.heuristicInfo['foodMST']`,
+    keyed on a bitset of the remaining food.
+
+    This dominates `foodHeuristic`, and can be picked with a search agent's heuristic argument,
+    e.g. `heuristic=pacai.student.searchAgents.foodMSTHeuristic`.
+    """
+
+    position, foodGrid = state
+    distances = _getMazeDistances(problem)
+
+    foodIds = [distances.getCellId(food) for food in foodGrid.asList()]
+
+    foodBits = 0
+    for foodId in foodIds:
+        foodBits |= (1 << foodId)
+
+    return _foodMSTBound(distances.getCellId(position), foodIds, foodBits, problem)
+
+def _foodMSTBound(positionId, foodIds, foodBits, problem):
+    """
+    The bound behind `foodMSTHeuristic`, on cell ids from `_getMazeDistances`.
+    """
+
+    if (len(foodIds) == 0):
+        return 0
+
+    distances = _getMazeDistances(problem)
+
+    mstWeights = problem.heuristicInfo.setdefault('foodMST', {})
+    if (foodBits not in mstWeights):
+        mstWeights[foodBits] = _mstWeight(foodIds, distances)
+
+    nearest = min([distances.getDistanceById(positionId, foodId) for foodId in foodIds])
+
+    return nearest + mstWeights[foodBits]
+
+def _getMazeDistances(problem):
+    """
+    The maze distances are precomputed once per layout (and cached on disk).
+    """
+
+    if ('mazeDistances' not in problem.heuristicInfo):
+        problem.heuristicInfo['mazeDistances'] = mazeDistances.getMazeDistances(problem.walls)
+
+    return problem.heuristicInfo['mazeDistances']
+
+def _mstWeight(cellIds, distances):
+    """
+    Get the weight of a minimum spanning tree over the given cells (using Prim's algorithm).
+    """
+
+    # The cheapest edge from each cell not yet in the tree to the tree.
+    remaining = {cellId: distances.getDistanceById(cellIds[0], cellId) for cellId in cellIds[1:]}
+    weight = 0
+
+    while (len(remaining) > 0):
+        closest = min(remaining, key = remaining.get)
+        weight += remaining.pop(closest)
+
+        for (cellId, edge) in remaining.items():
+            dist = distances.getDistanceById(closest, cellId)
+            if (dist < edge):
+                remaining[cellId] = dist
+
+    return weight
+
+class BitsetFoodSearchProblem(FoodSearchProblem):
+    """
+    A `pacai.core.search.food.FoodSearchProblem` where each state is packed into a single int:
+    `(foodBits << positionBits) | positionId`.
+
+    Both the position and the food use the dense open cell ids from
+    `pacai.student.mazeDistances.MazeDistances`:
+    bit i of `foodBits` is set when cell i still has food on it.
+    So instead of a `pacai.core.grid.Grid` copy per node, a state is a single (big) int,
+    and search only ever hashes and compares ints.
+    Use `BitsetFoodSearchProblem.decodeState` to get back a regular (position, foodGrid) state.
+    """
+
+    def __init__(self, startingGameState):
+        super().__init__(startingGameState)
+
+        graph = _getMazeDistances(self).getGraph()
+        self._cells = graph.cells
+        self._positionBits = len(self._cells).bit_length()
+        self._positionMask = (1 << self._positionBits) - 1
+
+        # The (neighborId, action) pairs for each cell.
+        self._neighbors = graph.neighbors
+
+        position, foodGrid = super().startingState()
+        self.startingPosition = position
+        self._startingState = self.encodeState(position, foodGrid)
+
+    def encodeState(self, position, foodGrid):
+        """
+        Pack a position and a food `pacai.core.grid.Grid` into an int state.
+        """
+
+        distances = _getMazeDistances(self)
+
+        foodBits = 0
+        for food in foodGrid.asList():
+            foodBits |= (1 << distances.getCellId(food))
+
+        return (foodBits << self._positionBits) | distances.getCellId(position)
+
+    def decodeState(self, state):
+        """
+        Unpack an int state into a `pacai.core.search.food.FoodSearchProblem` state:
+        (position, foodGrid).
+        """
+
+        foodGrid = Grid(self.walls.getWidth(), self.walls.getHeight())
+        for foodId in _bitsToIds(state >> self._positionBits):
+            x, y = self._cells[foodId]
+            foodGrid[x][y] = True
+
+        return (self._cells[state & self._positionMask], foodGrid)
+
+    def getPositionId(self, state):
+        return state & self._positionMask
+
+    def getFoodBits(self, state):
+        return state >> self._positionBits
+
+    def startingState(self):
+        return self._startingState
+
+    def isGoal(self, state):
+        return ((state >> self._positionBits) == 0)
+
+    def successorStates(self, state):
+        successors = []
+        self._numExpanded += 1
+
+        foodBits = state >> self._positionBits
+        for (neighborId, action) in self._neighbors[state & self._positionMask]:
+            nextFood = foodBits & ~(1 << neighborId)
+            successors.append(((nextFood << self._positionBits) | neighborId, action, 1))
+
+        return successors
+
+    def actionsCost(self, actions):
+        x, y = self.startingPosition
+        cost = 0
+
+        for action in actions:
+            dx, dy = Actions.directionToVector(action)
+            x, y = int(x + dx), int(y + dy)
+            if (self.walls[x][y]):
+                return 999999
+
+            cost += 1
+
+        return cost
+
+def bitsetFoodHeuristic(state, problem):
+    """
+    `foodMSTHeuristic` for the int states of a `BitsetFoodSearchProblem`.
+    The food ids are read straight off the bits, no grid is ever built.
+    """
+
+    foodBits = problem.getFoodBits(state)
+    return _foodMSTBound(problem.getPositionId(state), _bitsToIds(foodBits), foodBits, problem)
+
+def _bitsToIds(bits):
+    """
+    Get the indexes of all the set bits in an int.
+    """
+
+    ids = []
+    while (bits):
+        lowest = bits & -bits
+        ids.append(lowest.bit_length() - 1)
+        bits ^= lowest
+
+    return ids
+
 class ClosestDotSearchAgent(SearchAgent):
     """
     Search for all food using a sequence of searches.
+
+    There are two ways of planning the path (chosen with the `pathing` argument):
+
+    'floodfill' (the default):
+    Precompute the maze adjacency once, and then for each segment run a single
+    breadth first flood fill from pacman's cell until it reaches a cell with food.
+    Between segments, only pacman's cell and a bitset of the remaining food are advanced.
+
+    'simulate':
+    Run `ClosestDotSearchAgent.findPathToClosestDot` on a new `AnyFoodSearchProblem`
+    for each segment, and follow the segment with real game state successors.
+
+    Both produce the same tour.
     """
 
-    def __init__(self, index, **kwargs):
+    def __init__(self, index, pathing = 'floodfill', **kwargs):
         super().__init__(index)
 
+        if (pathing not in ('floodfill', 'simulate')):
+            raise ValueError('Unknown pathing mode for ClosestDotSearchAgent: %s.' % (pathing))
+
+        self.pathing = pathing
+
     def registerInitialState(self, state):
         self._actions = []
         self._actionIndex = 0
 
+        if (self.pathing == 'floodfill'):
+            self._actions = self._floodFillTour(state)
+            logging.info('Path found with cost %d.' % len(self._actions))
+            return
+
         currentState = state
 
         while (currentState.getFood().count() > 0):
@@ -208,6 +523,74 @@ class ClosestDotSearchAgent(SearchAgent):
 
         logging.info('Path found with cost %d.' % len(self._actions))
 
+    def _floodFillTour(self, state):
+        """
+        Plan the full closest dot tour without generating any game states.
+
+        The flood fill visits neighbors in the same order as
+        `pacai.core.search.position.PositionSearchProblem.successorStates`
+        and stops at the first food it generates (just like `search.breadthFirstSearch`),
+        so every segment matches the one the search would have found.
+        """
+
+        graph = mazeDistances.MazeGraph(state.getWalls())
+        cells = graph.cells
+        cellIds = graph.cellIds
+        neighbors = graph.neighbors
+
+        foodBits = 0
+        for food in state.getFood().asList():
+            foodBits |= (1 << cellIds[food])
+
+        # These arrays are reused by every flood fill.
+        # A cell has been reached by the current fill if its mark equals the fill's number.
+        marks = [0] * len(cells)
+        parents = [None] * len(cells)
+        fillNumber = 0
+
+        position = cellIds[state.getPacmanPosition()]
+        actions = []
+
+        while (foodBits):
+            fillNumber += 1
+            marks[position] = fillNumber
+
+            target = None
+            fringe = collections.deque([position])
+            while (fringe and target is None):
+                current = fringe.popleft()
+
+                for (neighbor, action) in neighbors[current]:
+                    if (marks[neighbor] == fillNumber):
+                        continue
+
+                    marks[neighbor] = fillNumber
+                    parents[neighbor] = (current, action)
+
+                    if (foodBits & (1 << neighbor)):
+                        target = neighbor
+                        break
+
+                    fringe.append(neighbor)
+
+            if (target is None):
+                raise ValueError('Pacman cannot reach the remaining food from %s.' %
+                        (str(cells[position])))
+
+            segment = []
+            current = target
+            while (current != position):
+                current, action = parents[current]
+                segment.append(action)
+
+            segment.reverse()
+            actions += segment
+
+            position = target
+            foodBits &= ~(1 << target)
+
+        return actions
+
     def findPathToClosestDot(self, gameState):
         """
         Returns a path (a list of actions) to the closest dot, starting from gameState.
@@ -1,4 +1,5 @@
 from pacai.agents.learning.value import ValueEstimationAgent
+from pacai.student import planners
 from pacai.util import counter
 
 class ValueIterationAgent(ValueEstimationAgent):
@@ -29,25 +30,115 @@ class ValueIterationAgent(ValueEstimationAgent):
     You may break ties any way you see fit.
     Note that if there are no legal actions, which is the case at the terminal state,
     you should return None.
+
+    With `vectorized` set, the MDP is compiled once into arrays (see `pacai.student.compiledMDP`)
+    and every sweep is a handful of NumPy operations over all the states,
+    after which values, q-values, and policies are all looked up in arrays.
+    In either mode, iteration stops early once a sweep changes no value by more than `tolerance`.
+
+    Instead of synchronous sweeps, the values can also come from one of the in-place `planner`s
+    in `pacai.student.planners` (Gauss-Seidel, prioritized sweeping, or RTDP).
+    Those get the same budget as `iters` sweeps (`iters` times the number of states in backups).
+    Whatever the planner, `numBackups` and `residual` (the largest change one more backup
+    would make to a value) are kept so that planners can be compared.
     """
 
-    def __init__(self, index, mdp, discountRate = 0.9, iters = 100, **kwargs):
+    def __init__(self, index, mdp, discountRate = 0.9, iters = 100, vectorized = False,
+            tolerance = 0.0, planner = planners.PLANNER_SYNC, **kwargs):
         super().__init__(index)
 
         self.mdp = mdp
         self.discountRate = discountRate
         self.iters = iters
+        self.tolerance = float(tolerance)
         self.values = counter.Counter()  # A Counter is a dict with default 0
 
+        # The number of sweeps actually run (fewer than iters if the values converged).
+        self.numSweeps = 0
+        self.numBackups = 0
+        self.residual = 0.0
+
+        # The arrays for vectorized mode (see _computeVectorized()).
+        self._compiled = None
+        self._qValues = None
+        self._bestRows = None
+
+        if (planner not in planners.PLANNERS):
+            raise ValueError('Unknown planner: %s.' % (planner))
+
+        if (planner != planners.PLANNER_SYNC):
+            if (vectorized):
+                raise ValueError('Only the %s planner can be vectorized.' % (planners.PLANNER_SYNC))
+
+            self._computePlanned(planner)
+            return
+
+        if (vectorized):
+            self._computeVectorized()
+            return
+
         # Compute the values here.
-        # FIXME: can be more efficient, getQValue is called twice.
         for i in range(iters):
             newVals = counter.Counter()
+            change = 0.0
+
             for state in mdp.getStates():
-                bestAction = self.getAction(state)
-                if bestAction is not None:
-                    newVals[state] = self.getQValue(state, bestAction)
-            self.values = newVals.copy()
+                actions = mdp.getPossibleActions(state)
+                if (len(actions) > 0):
+                    newVals[state] = max([self.getQValue(state, action) for action in actions])
+                    self.numBackups += 1
+
+                change = max(change, abs(newVals[state] - self.values[state]))
+
+            self.values = newVals
+            self.numSweeps += 1
+
+            if (change <= self.tolerance):
+                break
+
+        for state in mdp.getStates():
+            actions = mdp.getPossibleActions(state)
+            if (len(actions) > 0):
+                value = max([self.getQValue(state, action) for action in actions])
+                self.residual = max(self.residual, abs(value - self.values[state]))
+
+    def _computePlanned(self, planner):
+        model = planners.PlannerModel(self.mdp)
+        maxBackups = self.iters * len(model.states)
+
+        if (planner == planners.PLANNER_GAUSS_SEIDEL):
+            values, self.numBackups, self.residual = planners.gaussSeidel(model,
+                    self.discountRate, self.iters, self.tolerance)
+        elif (planner == planners.PLANNER_PRIORITIZED):
+            values, self.numBackups, self.residual = planners.prioritizedSweeping(model,
+                    self.discountRate, maxBackups, self.tolerance)
+        else:
+            startIndex = model.stateIndexes[self.mdp.getStartState()]
+            values, self.numBackups, self.residual = planners.rtdp(model,
+                    self.discountRate, startIndex, maxBackups, self.tolerance)
+
+        for (state, value) in zip(model.states, values):
+            self.values[state] = value
+
+    def _computeVectorized(self):
+        # NumPy is only needed for vectorized mode.
+        from pacai.student.compiledMDP import CompiledMDP
+
+        self._compiled = CompiledMDP(self.mdp)
+
+        values, self.numSweeps, change = self._compiled.valueIteration(self.discountRate,
+                self.iters, self.tolerance)
+        self.numBackups = self.numSweeps * self._compiled.numActiveStates
+
+        # Q-values (and so policies) come from the final values, just like in the scalar mode.
+        self._qValues = self._compiled.getQValues(values, self.discountRate)
+        self._bestRows = self._compiled.getBestRows(self._qValues)
+
+        nextValues = self._compiled.getStateValues(self._qValues)
+        self.residual = float(abs(nextValues - values).max(initial = 0.0))
+
+        for (state, value) in zip(self._compiled.states, values.tolist()):
+            self.values[state] = value
 
     def getValue(self, state):
         """
@@ -57,16 +148,27 @@ class ValueIterationAgent(ValueEstimationAgent):
         return self.values[state]
 
     def getPolicy(self, state):
-        # FIXME: not sure if this is even needed
         if self.mdp.isTerminal(state):
             return None
 
+        if (self._compiled is not None):
+            bestRow = self._bestRows[self._compiled.stateIndexes[state]]
+            if (bestRow < 0):
+                return None
+
+            return self._compiled.rowActions[bestRow]
+
         memo = counter.Counter()
         for action in self.mdp.getPossibleActions(state):
             memo[action] = self.getQValue(state, action)
         return memo.argMax()
 
     def getQValue(self, state, action):
+        if (self._compiled is not None):
+            row = self._compiled.getRow(state, action)
+            if (row is not None):
+                return float(self._qValues[row])
+
         expectedUtil = 0
         for transition in self.mdp.getTransitionStatesAndProbs(state, action):
             expectedUtil += transition[1] * (self.mdp.getReward(state, action, transition[0])
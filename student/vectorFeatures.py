@@ -0,0 +1,397 @@
+"""
+Linear Q-functions over feature matrices, for `pacai.student.qlearningAgents.ApproximateQAgent`.
+
+A vectorized extractor declares all of its features up front (`getFeatureNames`),
+which fixes the column of every feature (and so the index of its weight).
+The features of all the legal actions of a state are then one NumPy matrix
+(a row per action, a column per feature),
+so the Q-values of a state are a single matrix-vector product with the weights,
+and a TD update is a single vector operation on the feature row of the action taken.
+
+Extractors can build the matrix themselves (`getFeatureMatrix`),
+otherwise it is filled in from their usual per-action feature counters.
+Either way, the matrix of a state is only built once:
+the last couple of states are remembered, since the matrix of a state is needed
+when picking an action, again when updating on the transition into the next state,
+and the matrix of that next state is needed again to pick the next action.
+"""
+
+import collections
+import random
+
+import numpy
+
+from pacai.core.actions import Actions
+from pacai.util import counter
+
+# The number of recent states whose feature matrices are kept.
+FEATURE_CACHE_SIZE = 2
+
+# The default number of food distance maps and feature matrices kept (by VectorSimpleExtractor)
+# before the oldest are dropped.
+DEFAULT_MAX_FOOD_DISTANCES = 1000
+DEFAULT_MAX_MATRICES = 10000
+
+class LinearQFunction(object):
+    """
+    `Q(state, action) = weights * features(state, action)` over a fixed set of features.
+    """
+
+    def __init__(self, extractor, actionFn):
+        if (not hasattr(extractor, 'getFeatureNames')):
+            raise ValueError('Vectorized features need an extractor that declares its features'
+                    + ' (with getFeatureNames()): %s.' % (type(extractor).__name__))
+
+        self._extractor = extractor
+        self._actionFn = actionFn
+        self._featureNames = list(extractor.getFeatureNames())
+        self._featureIndexes = {name: index for (index, name) in enumerate(self._featureNames)}
+
+        self._weights = numpy.zeros(len(self._featureNames))
+
+        # [(state, actions, feature matrix), ...], most recent first.
+        self._cache = []
+
+    def getFeatureNames(self):
+        return self._featureNames
+
+    def getWeights(self):
+        """
+        Get the weights as a Counter keyed by feature name.
+        """
+
+        weights = counter.Counter()
+        for (name, weight) in zip(self._featureNames, self._weights.tolist()):
+            weights[name] = weight
+
+        return weights
+
+    def setWeights(self, weights):
+        """
+        Set the weights from a dict (or Counter) keyed by feature name (missing features get zero).
+        """
+
+        self._weights = numpy.array([weights.get(name, 0.0) for name in self._featureNames],
+                dtype = float)
+
+    def getFeatureMatrix(self, state):
+        """
+        Get the legal actions of a state along with their feature matrix (a row per action).
+        A state that was recently asked about keeps its actions and matrix.
+        """
+
+        for (cachedState, actions, matrix) in self._cache:
+            if (cachedState is state):
+                return actions, matrix
+
+        actions = list(self._actionFn(state))
+        matrix = self._buildMatrix(state, actions)
+
+        self._cache.insert(0, (state, actions, matrix))
+        del self._cache[FEATURE_CACHE_SIZE:]
+
+        return actions, matrix
+
+    def getQValue(self, state, action):
+        return float(self._getFeatureRow(state, action).dot(self._weights))
+
+    def getQValues(self, state):
+        """
+        Get the legal actions of a state along with their Q-values (as a list).
+        """
+
+        actions, matrix = self.getFeatureMatrix(state)
+        return actions, matrix.dot(self._weights).tolist()
+
+    def getValue(self, state):
+        """
+        Get the best Q-value over the legal actions (0.0 if there are no actions).
+        """
+
+        actions, qValues = self.getQValues(state)
+        if (len(qValues) == 0):
+            return 0.0
+
+        return max(qValues)
+
+    def getPolicy(self, state):
+        """
+        Get the legal action with the best Q-value (ties are broken randomly),
+        None if there are no actions.
+        """
+
+        actions, qValues = self.getQValues(state)
+        if (len(actions) == 0):
+            return None
+
+        bestValue = max(qValues)
+        return random.choice([action for (action, qValue) in zip(actions, qValues)
+                if qValue == bestValue])
+
+    def update(self, state, action, target, alpha):
+        """
+        Move Q(state, action) towards the target by the learning rate:
+        `weights += alpha * (target - Q(state, action)) * features(state, action)`.
+        """
+
+        features = self._getFeatureRow(state, action)
+        error = target - float(features.dot(self._weights))
+
+        self._weights += (alpha * error) * features
+
+    def encodeTransition(self, state, action, nextState, reward):
+        """
+        Encode a transition as just the features it needs for an update:
+        (features of the action taken, feature matrix of the next state, reward).
+        """
+
+        return (self._getFeatureRow(state, action).copy(), self.getFeatureMatrix(nextState)[1],
+                reward)
+
+    def updateEncoded(self, encoded, discountRate, alpha):
+        """
+        Update on a transition encoded by `LinearQFunction.encodeTransition`.
+        """
+
+        features, nextMatrix, reward = encoded
+
+        target = reward
+        if (len(nextMatrix) > 0):
+            target += discountRate * nextMatrix.dot(self._weights).max()
+
+        error = target - float(features.dot(self._weights))
+        self._weights += (alpha * error) * features
+
+    def updateBatch(self, transitions, weights, discountRate, alpha):
+        """
+        Update on a batch of (state, action, nextState, reward) transitions at once,
+        with each transition's update scaled by its weight.
+        This is the same as updating on each transition in turn,
+        except that every TD error comes from the weights from before the batch.
+        Returns the TD error of each transition.
+        Replayed states are not remembered (they would push out the states of the current game).
+        """
+
+        if (len(transitions) == 0):
+            return []
+
+        features = numpy.zeros((len(transitions), len(self._featureNames)))
+        targets = numpy.zeros(len(transitions))
+
+        for (row, (state, action, nextState, reward)) in enumerate(transitions):
+            features[row] = self._getFeatureRow(state, action)
+
+            targets[row] = reward
+
+            nextQValues = self._getMatrix(nextState)[1].dot(self._weights)
+            if (len(nextQValues) > 0):
+                targets[row] += discountRate * nextQValues.max()
+
+        errors = targets - features.dot(self._weights)
+        self._weights += alpha * (errors * numpy.array(weights)).dot(features)
+
+        return errors.tolist()
+
+    def _getMatrix(self, state):
+        """
+        Like `LinearQFunction.getFeatureMatrix`, but without remembering a new state.
+        """
+
+        for (cachedState, actions, matrix) in self._cache:
+            if (cachedState is state):
+                return actions, matrix
+
+        actions = list(self._actionFn(state))
+        return actions, self._buildMatrix(state, actions)
+
+    def _getFeatureRow(self, state, action):
+        for (cachedState, actions, matrix) in self._cache:
+            if (cachedState is state and action in actions):
+                return matrix[actions.index(action)]
+
+        return self._buildMatrix(state, [action])[0]
+
+    def _buildMatrix(self, state, actions):
+        if (hasattr(self._extractor, 'getFeatureMatrix')):
+            return self._extractor.getFeatureMatrix(state, actions)
+
+        matrix = numpy.zeros((len(actions), len(self._featureNames)))
+        for (row, action) in enumerate(actions):
+            for (name, value) in self._extractor.getFeatures(state, action).items():
+                if (name not in self._featureIndexes):
+                    raise ValueError('Extractor returned an undeclared feature: %s.' % (name))
+
+                matrix[row, self._featureIndexes[name]] = value
+
+        return matrix
+
+class VectorSimpleExtractor(object):
+    """
+    The features of `pacai.core.featureExtractors.SimpleExtractor`
+    (a bias, the number of ghosts one step away, whether food gets eaten,
+    and the scaled distance to the closest food, all divided by 10),
+    built for all the actions of a state at once.
+
+    The distance to the closest food is most of the work.
+    The neighbors of every open cell are looked up once per layout (walls),
+    and the distance from a cell to the closest food is remembered per set of food
+    (keyed by `pacai.bin.pacman.PacmanGameState.getFoodZobristHash`),
+    so the states of a game (and of every training episode) that share their food
+    also share their searches.
+    Training also keeps coming back to the same states,
+    so whole matrices are remembered per state
+    (keyed by `pacai.bin.pacman.PacmanGameState.getZobristHash` and the actions).
+    Matrices are shared, so they must not be modified.
+    """
+
+    FEATURES = ['bias', '#-of-ghosts-1-step-away', 'eats-food', 'closest-food']
+
+    def __init__(self, maxFoodDistances = DEFAULT_MAX_FOOD_DISTANCES,
+            maxMatrices = DEFAULT_MAX_MATRICES):
+        self._maxFoodDistances = maxFoodDistances
+        self._maxMatrices = maxMatrices
+
+        # {food hash: {cell: distance to the closest food}}, for the current walls.
+        self._foodDistances = {}
+
+        # {(state hash, actions): feature matrix}, for the current walls.
+        self._matrices = {}
+
+        self._walls = None
+        self._neighbors = {}
+
+    def getFeatureNames(self):
+        return VectorSimpleExtractor.FEATURES
+
+    def getFeatures(self, state, action):
+        features = counter.Counter()
+
+        row = self.getFeatureMatrix(state, [action])[0].tolist()
+        for (name, value) in zip(VectorSimpleExtractor.FEATURES, row):
+            features[name] = value
+
+        return features
+
+    def getFeatureMatrix(self, state, actions):
+        self._checkLayout(state.getWalls())
+
+        # States without a hash (e.g. capture states) just don't share matrices.
+        if (not hasattr(state, 'getZobristHash')):
+            return self._buildMatrix(state, actions)
+
+        key = (state.getZobristHash(), tuple(actions))
+        matrix = self._matrices.get(key)
+
+        if (matrix is None):
+            if (len(self._matrices) >= self._maxMatrices):
+                del self._matrices[next(iter(self._matrices))]
+
+            matrix = self._buildMatrix(state, actions)
+            self._matrices[key] = matrix
+
+        return matrix
+
+    def _buildMatrix(self, state, actions):
+        walls = state.getWalls()
+        food = state.getFood()
+        foodDistances = self._getFoodDistances(state)
+        area = float(walls.getWidth() * walls.getHeight())
+
+        # The number of ghosts that can reach each cell in one step.
+        ghostNeighbors = collections.Counter()
+        for (ghostX, ghostY) in state.getGhostPositions():
+            # Like Actions.getLegalNeighbors(), a ghost between cells counts from the closest one.
+            ghostCell = (int(ghostX + 0.5), int(ghostY + 0.5))
+            if (ghostCell in self._neighbors):
+                ghostNeighbors.update(self._neighbors[ghostCell])
+            else:
+                ghostNeighbors.update(Actions.getLegalNeighbors((ghostX, ghostY), walls))
+
+        x, y = state.getPacmanPosition()
+
+        rows = []
+        for action in actions:
+            dx, dy = Actions.directionToVector(action)
+            nextPosition = (int(x + dx), int(y + dy))
+
+            numGhosts = ghostNeighbors[nextPosition]
+
+            eatsFood = 0.0
+            if (numGhosts == 0 and food[nextPosition[0]][nextPosition[1]]):
+                eatsFood = 1.0
+
+            if (nextPosition not in foodDistances):
+                foodDistances[nextPosition] = self._findClosestFood(nextPosition, food)
+
+            closestFood = 0.0
+            if (foodDistances[nextPosition] is not None):
+                closestFood = foodDistances[nextPosition] / area
+
+            rows.append([1.0, numGhosts, eatsFood, closestFood])
+
+        # Reshaped so that no actions still gives a matrix with a column per feature.
+        matrix = numpy.array(rows, dtype = float)
+        return matrix.reshape((len(actions), len(VectorSimpleExtractor.FEATURES))) / 10.0
+
+    def _checkLayout(self, walls):
+        if (walls is self._walls):
+            return
+
+        self._walls = walls
+        self._foodDistances.clear()
+        self._matrices.clear()
+
+        self._neighbors = {}
+        for x in range(walls.getWidth()):
+            for y in range(walls.getHeight()):
+                if (not walls[x][y]):
+                    self._neighbors[(x, y)] = Actions.getLegalNeighbors((x, y), walls)
+
+    def _getFoodDistances(self, state):
+        # States without a food hash (e.g. capture states) just don't share distances.
+        if (not hasattr(state, 'getFoodZobristHash')):
+            return {}
+
+        key = state.getFoodZobristHash()
+        distances = self._foodDistances.get(key)
+
+        if (distances is None):
+            if (len(self._foodDistances) >= self._maxFoodDistances):
+                del self._foodDistances[next(iter(self._foodDistances))]
+
+            distances = {}
+            self._foodDistances[key] = distances
+
+        return distances
+
+    def _findClosestFood(self, position, food):
+        """
+        Breadth-first search out from a cell until it finds food.
+        Returns the distance to the closest food, None if no food can be reached.
+        """
+
+        if (food[position[0]][position[1]]):
+            return 0
+
+        seen = set([position])
+        frontier = [position]
+        distance = 0
+
+        while (len(frontier) > 0):
+            distance += 1
+
+            nextFrontier = []
+            for cell in frontier:
+                for neighbor in self._neighbors.get(cell, []):
+                    if (neighbor in seen):
+                        continue
+
+                    if (food[neighbor[0]][neighbor[1]]):
+                        return distance
+
+                    seen.add(neighbor)
+                    nextFrontier.append(neighbor)
+
+            frontier = nextFrontier
+
+        return None
@@ -0,0 +1,209 @@
+"""
+Many gridworld episodes stepped at once with NumPy.
+
+A `VectorGridworldEnv` compiles a `pacai.bin.gridworld.Gridworld` once
+(see `pacai.student.compiledMDP.CompiledMDP`) into sparse rows of transitions
+(one row per legal state and action), and holds the current state of every one of its environments
+in a single array.
+So a call to `VectorGridworldEnv.step` moves every environment
+with a handful of array operations (sampling all the next states at once from their rows),
+instead of rebuilding the successors of each state on every step like `GridworldEnvironment`.
+
+`batchQLearning` runs an independent tabular Q-learner in each environment.
+This makes parameter studies (like the ones in `pacai.student.analysis`) cheap,
+e.g. how often 50 episodes of Q-learning find the optimal policy of the bridge grid:
+```
+env = VectorGridworldEnv(gridworld, 1000)
+qValues, returns = batchQLearning(env, 50, 0.9, alpha = 0.5, epsilon = 0.3)
+policies = env.getGreedyActions(qValues)
+```
+Every learner can also get its own learning rate and epsilon (as arrays with one value per env),
+so a whole grid of parameters can be run in a single batch.
+"""
+
+import random
+
+import numpy
+
+from pacai.student.compiledMDP import CompiledMDP
+
+class VectorGridworldEnv(object):
+    """
+    `numEnvs` copies of a gridworld, each with its own current state (by state index).
+    States and actions are referred to by index: `states[i]` and `actions[j]`.
+    Random numbers come from `random` (a NumPy generator),
+    seeded from Python's `random` unless a seed is given.
+    """
+
+    def __init__(self, gridworld, numEnvs, seed = None):
+        if (numEnvs < 1):
+            raise ValueError('A vector environment needs at least one environment.')
+
+        compiled = CompiledMDP(gridworld)
+        self._compiled = compiled
+
+        self.states = compiled.states
+        self.stateIndexes = compiled.stateIndexes
+
+        # Actions are numbered in the order they are first seen.
+        self.actions = list(dict.fromkeys(compiled.rowActions))
+        self.actionIndexes = {action: index for (index, action) in enumerate(self.actions)}
+
+        self.numStates = len(self.states)
+        self.numActions = len(self.actions)
+        self.numEnvs = numEnvs
+
+        rowActions = numpy.array([self.actionIndexes[action] for action in compiled.rowActions],
+                dtype = int)
+
+        # rows[state, action] is the compiled row of the pair (-1 for illegal actions).
+        self._rows = numpy.full((self.numStates, self.numActions), -1, dtype = int)
+        self._rows[compiled.rowStates, rowActions] = numpy.arange(compiled.numRows)
+
+        # legalActions[state, action]
+        self.legalActions = (self._rows >= 0)
+
+        # The states without any actions (where episodes end).
+        self.terminalStates = ~self.legalActions.any(axis = 1)
+
+        self.startState = self.stateIndexes[gridworld.getStartState()]
+
+        if (seed is None):
+            seed = random.getrandbits(32)
+
+        self.random = numpy.random.default_rng(seed)
+
+        self._stateIds = numpy.full(numEnvs, self.startState, dtype = int)
+
+    def getStates(self):
+        """
+        Get the current state of every environment (a copy).
+        """
+
+        return self._stateIds.copy()
+
+    def isTerminal(self, states):
+        return self.terminalStates[states]
+
+    def reset(self, envs = None):
+        """
+        Put the environments (all of them by default) back in the start state.
+        """
+
+        if (envs is None):
+            self._stateIds[:] = self.startState
+        else:
+            self._stateIds[envs] = self.startState
+
+    def step(self, actions, envs = None):
+        """
+        Take an action (by index) in each of the environments (all of them by default).
+        Returns a tuple: (next states, rewards), as arrays with a value for each environment.
+        """
+
+        if (envs is None):
+            envs = numpy.arange(self.numEnvs)
+
+        states = self._stateIds[envs]
+        actions = numpy.asarray(actions, dtype = int)
+
+        if (not self.legalActions[states, actions].all()):
+            raise ValueError('Illegal action!')
+
+        rows = self._rows[states, actions]
+        transitions = self._compiled.sampleTransitions(rows, self.random.random(len(states)))
+        nextStates = self._compiled.transitionStates[transitions]
+
+        self._stateIds[envs] = nextStates
+
+        return nextStates, self._compiled.transitionRewards[transitions]
+
+    def getValues(self, states, qValues):
+        """
+        Get the value of each of the states (its best legal q-value, zero for terminal states)
+        given their q-values (with the actions as the last dimension).
+        """
+
+        values = numpy.where(self.legalActions[states], qValues, -numpy.inf).max(axis = -1)
+        return numpy.where(self.terminalStates[states], 0.0, values)
+
+    def getGreedyActions(self, qValues):
+        """
+        Get the best legal action of every state (the first one on ties, -1 for terminal states)
+        from q-values with the states and actions as their last two dimensions.
+        """
+
+        actions = numpy.where(self.legalActions, qValues, -numpy.inf).argmax(axis = -1)
+        return numpy.where(self.terminalStates, -1, actions)
+
+    def chooseActions(self, states, qValues, epsilon):
+        """
+        Choose an epsilon-greedy legal action for each of the states, given their q-values
+        (a row per state).
+        Like `pacai.student.qlearningAgents.QLearningAgent`,
+        a random action is taken with probability epsilon (which can differ per state),
+        and ties between the best actions are broken randomly.
+        """
+
+        legal = self.legalActions[states]
+        noise = self.random.random(legal.shape)
+
+        randomActions = numpy.where(legal, noise, -1.0).argmax(axis = 1)
+
+        bestValues = numpy.where(legal, qValues, -numpy.inf).max(axis = 1)
+        isBest = legal & (qValues == bestValues[:, numpy.newaxis])
+        bestActions = numpy.where(isBest, noise, -1.0).argmax(axis = 1)
+
+        explore = self.random.random(len(states)) < epsilon
+        return numpy.where(explore, randomActions, bestActions)
+
+def batchQLearning(env, numEpisodes, discountRate, alpha = 0.5, epsilon = 0.3):
+    """
+    Run `numEpisodes` episodes of tabular Q-learning in every environment,
+    each environment with its own learner (starting from all zero q-values).
+    The learning rate and epsilon can be single values or arrays with one value per environment.
+    Returns a tuple: (q-values indexed by [env, state, action],
+    discounted returns of every episode indexed by [env, episode]).
+    """
+
+    numEnvs = env.numEnvs
+
+    alpha = numpy.broadcast_to(numpy.asarray(alpha, dtype = float), (numEnvs, ))
+    epsilon = numpy.broadcast_to(numpy.asarray(epsilon, dtype = float), (numEnvs, ))
+
+    qValues = numpy.zeros((numEnvs, env.numStates, env.numActions))
+    returns = numpy.zeros((numEnvs, numEpisodes))
+
+    episodes = numpy.zeros(numEnvs, dtype = int)
+    discounts = numpy.ones(numEnvs)
+
+    env.reset()
+
+    # The environments that still have episodes to run.
+    active = numpy.arange(numEnvs)
+    if (numEpisodes <= 0):
+        active = active[:0]
+
+    while (len(active) > 0):
+        states = env.getStates()[active]
+        actions = env.chooseActions(states, qValues[active, states], epsilon[active])
+
+        nextStates, rewards = env.step(actions, active)
+
+        targets = rewards + discountRate * env.getValues(nextStates,
+                qValues[active, nextStates])
+        qValues[active, states, actions] += alpha[active] * (targets
+                - qValues[active, states, actions])
+
+        returns[active, episodes[active]] += rewards * discounts[active]
+        discounts[active] *= discountRate
+
+        doneEnvs = active[env.isTerminal(nextStates)]
+        if (len(doneEnvs) > 0):
+            episodes[doneEnvs] += 1
+            discounts[doneEnvs] = 1.0
+            env.reset(doneEnvs)
+
+            active = active[episodes[active] < numEpisodes]
+
+    return qValues, returns
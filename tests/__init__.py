@@ -0,0 +1,4 @@
+"""
+Unit tests for pacai.
+Run them all with `python3 -m unittest discover -s tests -t .` (from the root of the package).
+"""
@@ -0,0 +1,70 @@
+"""
+Random (but reproducible) games to test with.
+"""
+
+import collections
+import random
+
+from pacai.core.actions import Actions
+
+# How often pacman heads for the closest capsule (so that ghosts get scared)
+# instead of making a random move.
+CAPSULE_CHANCE = 0.8
+
+def playRandomGame(state, seed, maxMoves):
+    """
+    Play random moves (for every agent, in turn) from the state
+    until the game is over or `maxMoves` moves have been made.
+    Returns the (agentIndex, action) moves and every state of the game (starting with `state`).
+    """
+
+    rng = random.Random(seed)
+
+    moves = []
+    states = [state]
+
+    agentIndex = 0
+    while (not state.isOver() and len(moves) < maxMoves):
+        actions = state.getLegalActions(agentIndex)
+        if (len(actions) > 0):
+            action = _chooseAction(state, agentIndex, actions, rng)
+            moves.append((agentIndex, action))
+
+            state = state.generateSuccessor(agentIndex, action)
+            states.append(state)
+
+        agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+    return moves, states
+
+def _chooseAction(state, agentIndex, actions, rng):
+    capsules = state.getCapsules()
+    if (agentIndex != 0 or len(capsules) == 0 or rng.random() >= CAPSULE_CHANCE):
+        return rng.choice(actions)
+
+    distances = _capsuleDistances(state.getWalls(), capsules)
+    x, y = state.getAgentPosition(agentIndex)
+
+    def capsuleDistance(action):
+        dx, dy = Actions.directionToVector(action)
+        return distances.get((int(x + dx), int(y + dy)), float('inf'))
+
+    return min(actions, key = capsuleDistance)
+
+def _capsuleDistances(walls, capsules):
+    """
+    Get the maze distance from every open position to its closest capsule.
+    """
+
+    distances = {capsule: 0 for capsule in capsules}
+    fringe = collections.deque(capsules)
+
+    while (len(fringe) > 0):
+        x, y = fringe.popleft()
+        for (dx, dy) in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+            neighbor = (x + dx, y + dy)
+            if (not walls[neighbor[0]][neighbor[1]] and neighbor not in distances):
+                distances[neighbor] = distances[(x, y)] + 1
+                fringe.append(neighbor)
+
+    return distances
@@ -0,0 +1,90 @@
+import itertools
+import unittest
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from pacai.core.search.food import FoodSearchProblem
+from pacai.student.searchAgents import BitsetCornersProblem
+from pacai.student.searchAgents import BitsetFoodSearchProblem
+from pacai.student.searchAgents import CornersProblem
+
+MAX_FOOD_STATES = 500
+
+class BitsetCornersProblemTest(unittest.TestCase):
+    def setUp(self):
+        gameState = PacmanGameState(getLayout('tinyCorners'))
+        self._problem = BitsetCornersProblem(gameState)
+        self._reference = CornersProblem(gameState)
+
+    def testRoundTrip(self):
+        walls = self._problem.walls
+        corners = self._problem.corners
+
+        for position in _openPositions(walls):
+            for size in range(len(corners) + 1):
+                for visited in itertools.combinations(corners, size):
+                    state = self._problem.encodeState(position, visited)
+                    self.assertEqual(self._problem.decodeState(state),
+                            (position, frozenset(visited)))
+
+    def testStartingState(self):
+        self.assertEqual(self._problem.decodeState(self._problem.startingState()),
+                self._reference.startingState())
+
+    def testSuccessors(self):
+        for position in _openPositions(self._problem.walls):
+            for visited in [(), self._problem.corners[:2], self._problem.corners]:
+                state = self._problem.encodeState(position, visited)
+                successors = self._problem.successorStates(state)
+
+                self.assertEqual(
+                        [(self._problem.decodeState(nextState), action, cost)
+                                for (nextState, action, cost) in successors],
+                        self._reference.successorStates(self._problem.decodeState(state)))
+
+                self.assertEqual(self._problem.isGoal(state),
+                        self._reference.isGoal(self._problem.decodeState(state)))
+
+class BitsetFoodSearchProblemTest(unittest.TestCase):
+    def setUp(self):
+        gameState = PacmanGameState(getLayout('tinySearch'))
+        self._problem = BitsetFoodSearchProblem(gameState)
+        self._reference = FoodSearchProblem(gameState)
+
+    def testStartingState(self):
+        self.assertEqual(self._problem.decodeState(self._problem.startingState()),
+                self._reference.startingState())
+
+    def testRoundTrip(self):
+        # Walk the states reachable from the start, checking them against the regular problem.
+        start = self._problem.startingState()
+        seen = set([start])
+        fringe = [start]
+
+        while (len(fringe) > 0 and len(seen) < MAX_FOOD_STATES):
+            state = fringe.pop()
+
+            position, foodGrid = self._problem.decodeState(state)
+            self.assertEqual(self._problem.encodeState(position, foodGrid), state)
+            self.assertEqual(self._problem.isGoal(state),
+                    self._reference.isGoal((position, foodGrid)))
+
+            successors = self._problem.successorStates(state)
+            expected = self._reference.successorStates((position, foodGrid))
+            self.assertEqual(
+                    _sortSuccessors([(self._problem.decodeState(nextState), action, cost)
+                            for (nextState, action, cost) in successors]),
+                    _sortSuccessors(expected))
+
+            for (nextState, action, cost) in successors:
+                if (nextState not in seen):
+                    seen.add(nextState)
+                    fringe.append(nextState)
+
+def _openPositions(walls):
+    return [(x, y) for x in range(walls.getWidth()) for y in range(walls.getHeight())
+            if (not walls[x][y])]
+
+def _sortSuccessors(successors):
+    return sorted([(position, sorted(foodGrid.asList()), action, cost)
+            for ((position, foodGrid), action, cost) in successors])
@@ -0,0 +1,112 @@
+import collections
+import random
+import unittest
+
+from pacai.agents.learning.experience import ExperienceReplay
+from pacai.agents.learning.experience import PRIORITY_OFFSET
+from pacai.agents.learning.experience import SumTree
+
+CAPACITIES = [1, 2, 5, 8, 13]
+NUM_SAMPLES = 20000
+TOLERANCE = 0.01
+
+class SumTreeTest(unittest.TestCase):
+    def testTotal(self):
+        for capacity in CAPACITIES:
+            tree, priorities = _buildTree(capacity)
+
+            self.assertAlmostEqual(tree.getTotal(), sum(priorities))
+            for (index, priority) in enumerate(priorities):
+                self.assertEqual(tree.getPriority(index), priority)
+
+    def testSamplingProportions(self):
+        for capacity in CAPACITIES:
+            tree, priorities = _buildTree(capacity)
+            self._checkProportions(tree, priorities)
+
+    def testZeroPriorities(self):
+        tree, priorities = _buildTree(13)
+        total = tree.getTotal()
+
+        # Not even the ends of the range find an item that can not be sampled.
+        for value in [0.0, total * (1.0 - 1e-12), total]:
+            self.assertGreater(priorities[tree.find(value)], 0.0)
+
+    def testUpdate(self):
+        tree, priorities = _buildTree(5)
+
+        for (index, priority) in [(2, 10.0), (1, 0.0), (0, 0.5), (2, 3.0)]:
+            tree.update(index, priority)
+            priorities[index] = priority
+
+            self.assertAlmostEqual(tree.getTotal(), sum(priorities))
+            self._checkProportions(tree, priorities)
+
+    def _checkProportions(self, tree, priorities):
+        total = tree.getTotal()
+
+        # Evenly spaced values, so every item should be found
+        # (up to one value) in proportion to its priority.
+        counts = collections.Counter([tree.find((i + 0.5) * total / NUM_SAMPLES)
+                for i in range(NUM_SAMPLES)])
+
+        for (index, priority) in enumerate(priorities):
+            self.assertLessEqual(abs(counts[index] - NUM_SAMPLES * priority / total), 1.0)
+
+class ExperienceReplayTest(unittest.TestCase):
+    def testRingBuffer(self):
+        replay = ExperienceReplay(5)
+        for i in range(12):
+            replay.add(('state', i), 'North' if (i % 2) else 'South', ('state', i + 1), float(i))
+
+        self.assertEqual(replay.getSize(), 5)
+        self.assertEqual(sorted([replay.get(index)[3] for index in range(5)]),
+                [7.0, 8.0, 9.0, 10.0, 11.0])
+        self.assertEqual(replay.get(0), (('state', 10), 'South', ('state', 11), 10.0))
+
+    def testPrioritizedProportions(self):
+        random.seed(0)
+
+        replay = ExperienceReplay(6, prioritized = True, priorityExponent = 1.0)
+        for i in range(6):
+            replay.add(i, 'North', i + 1, 0.0)
+
+        errors = [0.0, 1.0, 2.0, 3.0, 0.5, 10.0]
+        replay.updatePriorities(range(6), errors)
+
+        priorities = [abs(error) + PRIORITY_OFFSET for error in errors]
+        total = sum(priorities)
+
+        counts = collections.Counter(replay.sample(NUM_SAMPLES))
+        for (index, priority) in enumerate(priorities):
+            self.assertAlmostEqual(counts[index] / NUM_SAMPLES, priority / total,
+                    delta = TOLERANCE)
+
+        # The least likely transitions get the largest (importance-sampling) weights.
+        weights = replay.getImportanceWeights(range(6))
+        self.assertEqual(max(weights), weights[0])
+        self.assertEqual(max(weights), 1.0)
+        for (weight, priority) in zip(weights, priorities):
+            self.assertAlmostEqual(weight, priorities[0] / priority)
+
+    def testUniformWeights(self):
+        replay = ExperienceReplay(4)
+        replay.add(0, 'North', 1, 0.0)
+
+        self.assertEqual(replay.getImportanceWeights([0, 0]), [1.0, 1.0])
+
+def _buildTree(capacity):
+    """
+    Build a tree where every third item has no priority.
+    """
+
+    tree = SumTree(capacity)
+
+    priorities = [(index % 3) * (index + 1) / 2.0 for index in range(capacity)]
+    if (capacity == 1):
+        priorities = [1.0]
+
+    for (index, priority) in enumerate(priorities):
+        tree.update(index, priority)
+
+    return tree, priorities
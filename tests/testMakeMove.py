@@ -0,0 +1,66 @@
+import unittest
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from tests.randomGames import playRandomGame
+
+LAYOUT = 'smallClassic'
+MAX_MOVES = 200
+NUM_GAMES = 5
+
+class MakeMoveTest(unittest.TestCase):
+    def testMatchesSuccessors(self):
+        for seed in range(NUM_GAMES):
+            # The reference states are only ever built with generateSuccessor()
+            # and are never hashed before their successors are made,
+            # so each of them is hashed from scratch.
+            moves, references = playRandomGame(PacmanGameState(getLayout(LAYOUT)), seed,
+                    MAX_MOVES)
+            descriptions = [_describe(reference) for reference in references]
+
+            state = PacmanGameState(getLayout(LAYOUT))
+            hashes = []
+
+            for ((agentIndex, action), reference) in zip(moves, references):
+                before = _describe(state)
+                hashes.append(state.getZobristHash())
+
+                # Make and unmake every sibling move first.
+                for sibling in state.getLegalActions(agentIndex):
+                    successor = reference.generateSuccessor(agentIndex, sibling)
+
+                    state.makeMove(agentIndex, sibling)
+                    self.assertEqual(_describe(state), _describe(successor))
+                    self.assertEqual(state.getZobristHash(), successor.getZobristHash())
+
+                    state.unmakeMove()
+                    self.assertEqual(_describe(state), before)
+                    self.assertEqual(state.getZobristHash(), hashes[-1])
+
+                state.makeMove(agentIndex, action)
+
+            self.assertEqual(_describe(state), descriptions[-1])
+            self.assertEqual(state.getZobristHash(), references[-1].getZobristHash())
+
+            # Take every move back.
+            for turn in reversed(range(len(moves))):
+                state.unmakeMove()
+                self.assertEqual(_describe(state), descriptions[turn])
+                self.assertEqual(state.getZobristHash(), hashes[turn])
+
+            # Making moves never changes any other state.
+            for (reference, description) in zip(references, descriptions):
+                self.assertEqual(_describe(reference), description)
+
+    def testUnmakeWithoutMove(self):
+        state = PacmanGameState(getLayout(LAYOUT))
+        self.assertRaises(RuntimeError, state.unmakeMove)
+
+def _describe(state):
+    agents = [(state.getAgentState(index).getPosition(),
+            state.getAgentState(index).getDirection(),
+            state.getAgentState(index).getScaredTimer())
+            for index in range(state.getNumAgents())]
+
+    return (agents, sorted(state.getFood().asList()), sorted(state.getCapsules()),
+            state.getScore(), state.isOver(), state.isWin())
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pacai.bin import capture
+from pacai.bin import pacman
+from pacai.bin import replay
+from pacai.core.layout import getLayout
+from tests.randomGames import playRandomGame
+
+SNAPSHOT_INTERVAL = 7
+MAX_MOVES = 300
+
+class _NullView(object):
+    """
+    A view that shows nothing (the snapshot view around it is all that matters).
+    """
+
+    def initialize(self, state):
+        pass
+
+    def update(self, state):
+        pass
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, 'games.replay')
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def testPacmanRoundTrip(self):
+        layout = getLayout('smallClassic')
+        with replay.ReplayWriter(self._path, SNAPSHOT_INTERVAL) as writer:
+            games = [self._playGame(writer, replay.GAME_PACMAN, layout,
+                    pacman.PacmanGameState(layout), seed) for seed in range(3)]
+
+        self._checkGames(games)
+
+    def testCaptureRoundTrip(self):
+        layout = capture.loadCaptureLayout('testCapture')
+        with replay.ReplayWriter(self._path, SNAPSHOT_INTERVAL) as writer:
+            games = [self._playGame(writer, replay.GAME_CAPTURE, layout,
+                    capture.CaptureGameState(layout, MAX_MOVES), 0, {'length': MAX_MOVES})]
+
+        self._checkGames(games)
+
+    def testAppend(self):
+        layout = getLayout('smallClassic')
+
+        with replay.ReplayWriter(self._path, SNAPSHOT_INTERVAL) as writer:
+            games = [self._playGame(writer, replay.GAME_PACMAN, layout,
+                    pacman.PacmanGameState(layout), 0)]
+
+        # A partial record (from an interrupted run) is dropped before appending.
+        with open(self._path, 'ab') as file:
+            file.write(bytes([replay.RECORD_GAME, 0x90, 0x03]) + b'abc')
+
+        with replay.ReplayWriter(self._path, SNAPSHOT_INTERVAL) as writer:
+            games.append(self._playGame(writer, replay.GAME_PACMAN, layout,
+                    pacman.PacmanGameState(layout), 1))
+
+        self._checkGames(games)
+
+    def _playGame(self, writer, gameType, layout, state, seed, info = None):
+        """
+        Play a random game from the state (showing every state to a snapshotted view)
+        and write it.
+        Returns the moves and every state of the game.
+        """
+
+        moves, states = playRandomGame(state, seed, MAX_MOVES)
+
+        snapshotView = writer.getSnapshotView(_NullView(), gameType)
+        snapshotView.initialize(states[0])
+        for state in states[1:]:
+            snapshotView.update(state)
+
+        writer.writeGame(gameType, layout, moves, info,
+                snapshots = snapshotView.getSnapshots())
+
+        return (moves, states)
+
+    def _checkGames(self, games):
+        with open(self._path, 'rb') as file:
+            replayGames = list(replay.ReplayReader(file))
+
+        self.assertEqual(len(replayGames), len(games))
+
+        for ((moves, states), replayGame) in zip(games, replayGames):
+            self.assertEqual(replayGame.getNumMoves(), len(moves))
+            self.assertEqual(list(replayGame.getMoves()), moves)
+            self.assertEqual(list(replayGame.getMoves(5)), moves[5:])
+
+            for (turn, state) in enumerate(replayGame.getStates()):
+                self._checkState(state, states[turn])
+
+            # Seeking to a turn only plays the moves since the closest snapshot.
+            for turn in reversed(range(len(states))):
+                self._checkState(replayGame.getState(turn), states[turn])
+
+            snapshotTurn = replayGame._getSnapshot(len(moves))[0]
+            self.assertLessEqual(len(moves) - snapshotTurn, SNAPSHOT_INTERVAL)
+
+    def _checkState(self, state, expected):
+        self.assertEqual(state, expected)
+        self.assertEqual(state.getScore(), expected.getScore())
+        self.assertEqual(state.isOver(), expected.isOver())
+        self.assertEqual(state.isWin(), expected.isWin())
+        self.assertEqual(state._lastAgentMoved, expected._lastAgentMoved)
+
+        for agentIndex in range(expected.getNumAgents()):
+            agentState = state.getAgentState(agentIndex)
+            expectedAgentState = expected.getAgentState(agentIndex)
+
+            self.assertEqual(agentState.isPacman(), expectedAgentState.isPacman())
+            self.assertEqual(agentState.getScaredTimer(), expectedAgentState.getScaredTimer())
@@ -0,0 +1,52 @@
+import unittest
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from pacai.student.rootParallel import packState
+from pacai.student.rootParallel import unpackState
+from tests.randomGames import playRandomGame
+
+MAX_MOVES = 200
+NUM_GAMES = 3
+
+class PackStateTest(unittest.TestCase):
+    def testRoundTrip(self):
+        layout = getLayout('smallClassic')
+
+        for seed in range(NUM_GAMES):
+            moves, states = playRandomGame(PacmanGameState(layout), seed, MAX_MOVES)
+
+            for (turn, state) in enumerate(states):
+                unpacked = unpackState(packState(state), layout)
+                self._checkState(unpacked, state)
+
+                # The unpacked state plays on just like the original.
+                if (turn < len(moves)):
+                    agentIndex, action = moves[turn]
+                    self._checkState(unpacked.generateSuccessor(agentIndex, action),
+                            states[turn + 1])
+
+    def testMadeMoves(self):
+        layout = getLayout('smallClassic')
+        moves, states = playRandomGame(PacmanGameState(layout), 0, MAX_MOVES)
+
+        state = PacmanGameState(layout)
+        for (agentIndex, action) in moves[:10]:
+            state.makeMove(agentIndex, action)
+
+        # Moves made in this process can not be unmade from a packed state.
+        unpacked = unpackState(packState(state), layout)
+        self._checkState(unpacked, states[10])
+        self.assertRaises(RuntimeError, unpacked.unmakeMove)
+
+    def _checkState(self, state, expected):
+        self.assertEqual(state, expected)
+        self.assertEqual(state.getFood(), expected.getFood())
+        self.assertEqual(state.getCapsules(), expected.getCapsules())
+        self.assertEqual(state.getScore(), expected.getScore())
+        self.assertEqual(state.isOver(), expected.isOver())
+        self.assertEqual(state.getZobristHash(), expected.getZobristHash())
+
+        for agentIndex in range(expected.getNumAgents()):
+            self.assertEqual(state.getAgentState(agentIndex).getScaredTimer(),
+                    expected.getAgentState(agentIndex).getScaredTimer())
@@ -0,0 +1,79 @@
+import unittest
+
+from pacai.bin import gridworld
+from pacai.student.valueIterationAgent import ValueIterationAgent
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GRIDS = [
+    gridworld.BOOK_GRID,
+    gridworld.BRIDGE_GRID,
+    gridworld.CLIFF_GRID,
+    gridworld.DISCOUNT_GRID,
+    gridworld.MAZE_GRID,
+]
+
+# (noise, living reward)
+SETTINGS = [(0.2, 0.0), (0.0, 0.0), (0.3, -0.5)]
+
+ITERATIONS = [0, 1, 5, 100]
+DISCOUNT = 0.9
+EPSILON = 1e-9
+
+@unittest.skipIf(numpy is None, 'Vectorized value iteration needs NumPy.')
+class VectorizedValueIterationTest(unittest.TestCase):
+    def testMatchesScalar(self):
+        for mdp in _getMDPs():
+            for iters in ITERATIONS:
+                scalar = ValueIterationAgent(0, mdp, DISCOUNT, iters)
+                vectorized = ValueIterationAgent(0, mdp, DISCOUNT, iters, vectorized = True)
+
+                self._checkAgents(mdp, scalar, vectorized, EPSILON)
+                self.assertAlmostEqual(vectorized.residual, scalar.residual, delta = EPSILON)
+
+    def testTolerance(self):
+        tolerance = 1e-4
+
+        for mdp in _getMDPs():
+            scalar = ValueIterationAgent(0, mdp, DISCOUNT, 1000, tolerance = tolerance)
+            vectorized = ValueIterationAgent(0, mdp, DISCOUNT, 1000, vectorized = True,
+                    tolerance = tolerance)
+
+            # Both stop once a sweep changes no value by more than the tolerance.
+            self.assertLess(vectorized.numSweeps, 1000)
+            self.assertLessEqual(abs(vectorized.numSweeps - scalar.numSweeps), 1)
+            self.assertLessEqual(vectorized.residual, tolerance)
+
+            for state in mdp.getStates():
+                self.assertAlmostEqual(vectorized.getValue(state), scalar.getValue(state),
+                        delta = 10 * tolerance)
+
+    def _checkAgents(self, mdp, expected, agent, delta):
+        for state in mdp.getStates():
+            self.assertAlmostEqual(agent.getValue(state), expected.getValue(state), delta = delta)
+
+            actions = mdp.getPossibleActions(state)
+            for action in actions:
+                self.assertAlmostEqual(agent.getQValue(state, action),
+                        expected.getQValue(state, action), delta = delta)
+
+            # Ties can be broken either way, but the policy has to be one of the best actions.
+            policy = agent.getPolicy(state)
+            if (expected.getPolicy(state) is None):
+                self.assertIsNone(policy)
+            else:
+                bestValue = max([expected.getQValue(state, action) for action in actions])
+                self.assertAlmostEqual(expected.getQValue(state, policy), bestValue,
+                        delta = delta)
+
+def _getMDPs():
+    for grid in GRIDS:
+        for (noise, livingReward) in SETTINGS:
+            mdp = gridworld.Gridworld(grid)
+            mdp.setNoise(noise)
+            mdp.setLivingReward(livingReward)
+
+            yield mdp